@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+时钟抽象
+监控 worker、历史记录管理器、每日统计和 UI 不直接调用 time.time()/datetime.now()/date.today()，
+而是通过进程内的时钟取时间、等待：
+- RealClock:   真实时间 (默认)
+- FrozenClock: 固定时间，只能手动 set()/advance()，用于复现跨午夜等边界
+- ScaledClock: 从指定时刻开始按倍速流逝，sleep 相应缩短，用于浸泡测试 (几分钟跑完数周)
+- ReplayClock: 虚拟时间只随 sleep() 推进，回放焦点轨迹时使用，结果与倍速无关
+
+FLOW_CLOCK 环境变量决定各进程默认使用的时钟 (主进程与子进程读取同一配置，时间一致)：
+    real | frozen:2024-06-01T23:59:00 | scaled:60 | scaled:60@2024-06-01T09:00:00
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+
+
+class Clock:
+    """时钟接口：time() 返回 epoch 秒，sleep() 等待 (或推进) 指定秒数"""
+
+    def time(self):
+        raise NotImplementedError
+
+    def sleep(self, seconds):
+        raise NotImplementedError
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+    def today(self):
+        return self.now().date()
+
+
+class RealClock(Clock):
+    """真实时间"""
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class FrozenClock(Clock):
+    """固定时间；sleep() 立即返回，时间只在 set()/advance() 时改变"""
+
+    def __init__(self, at=None):
+        self._now = time.time() if at is None else float(at)
+        self._lock = threading.Lock()
+
+    def time(self):
+        with self._lock:
+            return self._now
+
+    def sleep(self, seconds):
+        pass
+
+    def set(self, at):
+        with self._lock:
+            self._now = float(at)
+
+    def advance(self, seconds):
+        with self._lock:
+            self._now += seconds
+
+
+class ScaledClock(Clock):
+    """
+    倍速时钟：time() = start + (真实经过时间) * speed，sleep(s) 实际等待 s / speed 秒。
+    anchor 为开始计时的真实 epoch 时间，多个进程传入同一 anchor 时读到的时间一致。
+    """
+
+    def __init__(self, speed, start=None, anchor=None):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.speed = float(speed)
+        self.anchor = time.time() if anchor is None else float(anchor)
+        self.start = self.anchor if start is None else float(start)
+
+    def time(self):
+        return self.start + (time.time() - self.anchor) * self.speed
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+
+class ReplayClock(Clock):
+    """
+    回放时钟：虚拟时间从 start 开始，只在 sleep() 时前进恰好 seconds 秒，与实际耗时无关。
+    speed > 0 时每次 sleep 实际等待 seconds / speed 秒 (1x 为实时，1000x 约 86 秒回放一天)；
+    speed = 0 时不等待，尽可能快。虚拟时间到达 stop_at 时调用一次 on_stop (如清除 worker 的运行标志)。
+    """
+
+    def __init__(self, start, speed=0.0, stop_at=None, on_stop=None):
+        self.start = float(start)
+        self.speed = float(speed or 0)
+        self.stop_at = stop_at
+        self.on_stop = on_stop
+        self._now = self.start
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def time(self):
+        with self._lock:
+            return self._now
+
+    def elapsed(self):
+        """相对 start 的虚拟秒数"""
+        return self.time() - self.start
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        if self.speed > 0:
+            time.sleep(seconds / self.speed)
+        with self._lock:
+            self._now += seconds
+            reached = self.stop_at is not None and self._now >= self.stop_at and not self._stopped
+            if reached:
+                self._stopped = True
+        if reached and self.on_stop:
+            self.on_stop()
+
+
+def _parse_moment(text):
+    """epoch 秒或 ISO 时间 (本地时区)"""
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+
+def create_clock(spec=None):
+    """
+    按描述创建时钟，spec 为空时读取 FLOW_CLOCK (默认 real)。
+    scaled 的计时起点取 FLOW_CLOCK_ANCHOR (run.py 在启动子进程前写入)，未设置时为当前时间。
+    """
+    from app.core import config
+    spec = (spec if spec is not None else config.CLOCK) or "real"
+    kind, _, arg = spec.partition(":")
+    kind = kind.strip().lower()
+    if kind == "real":
+        return RealClock()
+    if kind == "frozen":
+        return FrozenClock(_parse_moment(arg) if arg else None)
+    if kind == "scaled":
+        speed, _, start = arg.partition("@")
+        anchor = os.environ.get("FLOW_CLOCK_ANCHOR")
+        return ScaledClock(float(speed or 1), start=_parse_moment(start) if start else None,
+                           anchor=float(anchor) if anchor else None)
+    raise ValueError(f"Unknown clock: {spec}")
+
+
+_clock = None
+_clock_lock = threading.Lock()
+
+
+def install_clock(clock):
+    """安装进程内时钟 (在启动 worker 之前调用)；传 None 恢复按 FLOW_CLOCK 创建"""
+    global _clock
+    with _clock_lock:
+        _clock = clock
+    return get_clock()
+
+
+def get_clock():
+    """进程内时钟；首次调用时按 FLOW_CLOCK 创建"""
+    global _clock
+    if _clock is None:
+        with _clock_lock:
+            if _clock is None:
+                _clock = create_clock()
+    return _clock
@@ -1 +1,167 @@
 # Configuration settings
+# 所有可调参数集中在这里，均可通过同名环境变量 (FLOW_ 前缀) 覆盖
+import os
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_model_map(name):
+    """解析 "model_a=2,model_b=1" 形式的环境变量"""
+    result = {}
+    for part in os.getenv(name, "").split(","):
+        if "=" not in part:
+            continue
+        model, value = part.rsplit("=", 1)
+        try:
+            result[model.strip()] = int(value)
+        except ValueError:
+            continue
+    return result
+
+
+# ============ 窗口采集 ============
+
+# 焦点窗口来源：auto (按平台选择) / win32 / x11 / replay
+WINDOW_SOURCE = os.getenv("FLOW_WINDOW_SOURCE", "auto")
+# 前台窗口采样间隔 (秒)：每个进程只有一个采样器查询系统，其它模块读取其快照
+FOCUS_SAMPLE_INTERVAL = _env_float("FLOW_FOCUS_SAMPLE_INTERVAL", 1.0)
+
+# ============ 输入活动 (鼠标/键盘) ============
+
+# 是否监听鼠标/键盘 (只做计数聚合，供空闲检测与 input_minutes 使用)
+INPUT_TRACKING = _env_int("FLOW_INPUT_TRACKING", 1)
+# 按秒聚合的环形缓冲长度 (秒)，内存固定，不保留原始事件
+INPUT_RING_SECONDS = _env_int("FLOW_INPUT_RING_SECONDS", 3600)
+# 每分钟输入强度写入 input_minutes 的批量间隔 (秒)
+INPUT_FLUSH_INTERVAL = _env_int("FLOW_INPUT_FLUSH_INTERVAL", 300)
+
+# ============ 截图 ============
+
+# 是否定期截取前台窗口 (后台线程采集/编码，默认关闭)
+SCREENSHOT_ENABLED = _env_int("FLOW_SCREENSHOTS", 0)
+# 截图目录，默认数据库目录下的 screenshots/
+SCREENSHOT_DIR = os.getenv("FLOW_SCREENSHOT_DIR", "")
+# 同一窗口两次截图的最小间隔 (秒)
+SCREENSHOT_INTERVAL = _env_float("FLOW_SCREENSHOT_INTERVAL", 30.0)
+# 缩放后最长边 (像素)，0 表示不缩放
+SCREENSHOT_MAX_SIDE = _env_int("FLOW_SCREENSHOT_MAX_SIDE", 1280)
+# 编码格式：webp / jpeg (Pillow 不支持 WebP 时自动改用 JPEG)
+SCREENSHOT_FORMAT = os.getenv("FLOW_SCREENSHOT_FORMAT", "webp")
+SCREENSHOT_QUALITY = _env_int("FLOW_SCREENSHOT_QUALITY", 70)
+# 与该窗口上一张截图的感知哈希汉明距离不超过此值视为画面未变化，不保存
+SCREENSHOT_DEDUPE_DISTANCE = _env_int("FLOW_SCREENSHOT_DEDUPE_DISTANCE", 4)
+# 磁盘配额 (MB)，超出后按最近访问时间 (LRU) 删除旧截图
+SCREENSHOT_QUOTA_MB = _env_int("FLOW_SCREENSHOT_QUOTA_MB", 500)
+
+# ============ 空闲检测 ============
+
+# 是否根据鼠标/键盘输入 (及系统空闲时间) 检测离开，离开期间暂停分类并记录为 idle
+IDLE_DETECTION = _env_int("FLOW_IDLE_DETECTION", 1)
+# 多少秒无输入视为离开
+IDLE_THRESHOLD = _env_int("FLOW_IDLE_THRESHOLD", 300)
+
+# ============ 时钟 ============
+
+# 各进程使用的时钟：real / frozen:<ISO 时间或 epoch> / scaled:<倍速>[@<起始时间>] (见 app/core/clock.py)
+CLOCK = os.getenv("FLOW_CLOCK", "real")
+
+# ============ LLM 调度 ============
+
+# 每个模型默认允许同时进行的请求数 (本地 Ollama 通常一次只能高效处理一个)
+LLM_MAX_CONCURRENCY = _env_int("FLOW_LLM_MAX_CONCURRENCY", 1)
+# 按模型单独覆盖并发上限，例如 FLOW_LLM_MODEL_CONCURRENCY="gpt-oss:20b-cloud=4,qwen2.5:3b=1"
+LLM_MODEL_CONCURRENCY = _env_model_map("FLOW_LLM_MODEL_CONCURRENCY")
+# 各优先级排队的最长等待时间 (秒)，超时则放弃本次调用
+LLM_QUEUE_TIMEOUT_REALTIME = _env_float("FLOW_LLM_QUEUE_TIMEOUT_REALTIME", 30)
+LLM_QUEUE_TIMEOUT_INTERACTIVE = _env_float("FLOW_LLM_QUEUE_TIMEOUT_INTERACTIVE", 120)
+LLM_QUEUE_TIMEOUT_BATCH = _env_float("FLOW_LLM_QUEUE_TIMEOUT_BATCH", 600)
+# 低优先级请求被高优先级插队多少次后强制获得下一个名额 (防饿死)
+LLM_STARVATION_LIMIT = _env_int("FLOW_LLM_STARVATION_LIMIT", 3)
+
+# ============ 分析节奏 (monitor_service) ============
+
+# 同一窗口结果稳定时的重新分析间隔：从基础间隔开始按倍数退避，直到上限
+ANALYSIS_BASE_INTERVAL = _env_float("FLOW_ANALYSIS_BASE_INTERVAL", 60)
+ANALYSIS_MAX_INTERVAL = _env_float("FLOW_ANALYSIS_MAX_INTERVAL", 1800)
+ANALYSIS_BACKOFF_FACTOR = _env_float("FLOW_ANALYSIS_BACKOFF_FACTOR", 2.0)
+# 新窗口至少停留多久才分析 (去抖)；快速切换时逐步放大，直到上限
+ANALYSIS_DEBOUNCE = _env_float("FLOW_ANALYSIS_DEBOUNCE", 5)
+ANALYSIS_MAX_DEBOUNCE = _env_float("FLOW_ANALYSIS_MAX_DEBOUNCE", 30)
+# 一分钟内切换超过该次数视为快速切换
+ANALYSIS_RAPID_SWITCHES = _env_int("FLOW_ANALYSIS_RAPID_SWITCHES", 4)
+# 期望的模型延迟 (秒)，实测延迟超过它时按比例拉长分析间隔
+ANALYSIS_LATENCY_TARGET = _env_float("FLOW_ANALYSIS_LATENCY_TARGET", 5)
+# 实时分析每小时最多调用 LLM 的次数，0 表示不限制
+LLM_CALLS_PER_HOUR = _env_int("FLOW_LLM_CALLS_PER_HOUR", 120)
+
+# ============ 模型熔断 / 降级 ============
+
+# 连续失败多少次后熔断 (慢于 BREAKER_SLOW_CALL_SECONDS 的调用也算失败)
+BREAKER_FAILURE_THRESHOLD = _env_int("FLOW_BREAKER_FAILURE_THRESHOLD", 3)
+BREAKER_SLOW_CALL_SECONDS = _env_float("FLOW_BREAKER_SLOW_CALL_SECONDS", 60)
+# 熔断后多久放行一次半开探测；探测失败则等待时间翻倍，直到上限
+BREAKER_RECOVERY_TIMEOUT = _env_float("FLOW_BREAKER_RECOVERY_TIMEOUT", 15)
+BREAKER_MAX_RECOVERY_TIMEOUT = _env_float("FLOW_BREAKER_MAX_RECOVERY_TIMEOUT", 300)
+# 后台就绪检测的轮询间隔 (秒)
+OLLAMA_PROBE_INTERVAL = _env_float("FLOW_OLLAMA_PROBE_INTERVAL", 10)
+
+# ============ 实时检测延迟 SLO / 模型降级 ============
+
+# 实时分类的 p95 延迟预算 (秒)；主模型滚动 p95 超过它时改用备用模型
+DETECTOR_LATENCY_SLO = _env_float("FLOW_DETECTOR_LATENCY_SLO", 10)
+# 备用 (更小更快的) 模型，留空表示不降级，只统计
+DETECTOR_FALLBACK_MODEL = os.getenv("FLOW_DETECTOR_FALLBACK_MODEL", "")
+# 计算滚动 p95 的窗口 (最近多少次调用) 与最少样本数
+DETECTOR_SLO_WINDOW = _env_int("FLOW_DETECTOR_SLO_WINDOW", 20)
+DETECTOR_SLO_MIN_SAMPLES = _env_int("FLOW_DETECTOR_SLO_MIN_SAMPLES", 5)
+# 回切滞后：降级期间每隔多久让一次调用走主模型作为探测，
+# 探测的 p95 低于 SLO × 该比例才切回主模型，避免在预算附近来回抖动
+DETECTOR_SLO_PROBE_INTERVAL = _env_float("FLOW_DETECTOR_SLO_PROBE_INTERVAL", 120)
+DETECTOR_SLO_RECOVER_RATIO = _env_float("FLOW_DETECTOR_SLO_RECOVER_RATIO", 0.7)
+DETECTOR_SLO_RECOVER_SAMPLES = _env_int("FLOW_DETECTOR_SLO_RECOVER_SAMPLES", 3)
+
+# ============ 预测性预分类 ============
+
+# 模型空闲时，按历史窗口切换频率预先分类最可能切换到的窗口
+SPECULATION_ENABLED = _env_int("FLOW_SPECULATION_ENABLED", 1)
+# 每次最多预分类多少个候选窗口，以及候选的最低转移概率
+SPECULATION_TOP_K = _env_int("FLOW_SPECULATION_TOP_K", 2)
+SPECULATION_MIN_PROB = _env_float("FLOW_SPECULATION_MIN_PROB", 0.15)
+# 预分类结果的有效期 (秒)，过期未用即计为浪费
+SPECULATION_TTL = _env_float("FLOW_SPECULATION_TTL", 900)
+# 构建转移频率时读取的历史天数
+SPECULATION_HISTORY_DAYS = _env_int("FLOW_SPECULATION_HISTORY_DAYS", 14)
+# 每小时最多的预分类调用次数，与实时分析的预算分开计算
+SPECULATION_MAX_PER_HOUR = _env_int("FLOW_SPECULATION_MAX_PER_HOUR", 60)
+# 后台线程检查模型是否空闲的间隔 (秒)
+SPECULATION_INTERVAL = _env_float("FLOW_SPECULATION_INTERVAL", 5)
+
+# ============ 启动预热 ============
+
+# 模型在 Ollama 中常驻的时间 (随每次请求发送)，避免分析间隔拉长后每次都冷加载
+OLLAMA_KEEP_ALIVE = os.getenv("FLOW_OLLAMA_KEEP_ALIVE", "30m")
+# 启动时等待 Ollama 就绪的最长时间 (秒)，超时则跳过预热
+STARTUP_READY_TIMEOUT = _env_float("FLOW_STARTUP_READY_TIMEOUT", 15)
+# 预热请求的超时 (秒)，大模型冷加载可能需要较长时间
+STARTUP_WARMUP_TIMEOUT = _env_float("FLOW_STARTUP_WARMUP_TIMEOUT", 120)
+
+# ============ 聊天上下文检索 ============
+
+# /api/chat 注入到提示词中的历史上下文预算 (估算 token 数)
+CHAT_CONTEXT_TOKEN_BUDGET = _env_int("FLOW_CHAT_CONTEXT_TOKEN_BUDGET", 1500)
+# 最多引用多少条 (合并后的) 相关会话
+CHAT_CONTEXT_TOP_K = _env_int("FLOW_CHAT_CONTEXT_TOP_K", 30)
+# 最多引用多少天的每日摘要
+CHAT_CONTEXT_MAX_DAYS = _env_int("FLOW_CHAT_CONTEXT_MAX_DAYS", 7)
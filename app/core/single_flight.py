@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+进程内 single-flight：同一指纹的计算同时只执行一次，
+并发到达的相同请求等待这一次的结果并共享 (不缓存，完成后下一次请求会重新计算)。
+"""
+
+import json
+import hashlib
+import threading
+
+
+def fingerprint(*parts):
+    """把请求参数序列化为稳定的短指纹"""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按 key 合并并发中的相同计算"""
+
+    def __init__(self, name="single-flight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared_count = 0   # 被合并 (未重复执行) 的调用次数
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        执行 fn(*args, **kwargs)；若相同 key 正在执行，则等待并返回其结果。
+        Returns:
+            (result, shared)，shared 为 True 表示复用了其它调用的结果
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+                self.shared_count += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        if call.waiters:
+            print(f"[{self.name}] {call.waiters} identical request(s) shared one computation")
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+窗口标题规范化与近似重复聚类 (MinHash + LSH)
+"(3) Inbox - Outlook" 与 "(4) Inbox - Outlook"、带计数的浏览器标签、带未保存标记的 IDE 标题
+实际是同一件事。这里先去掉已知噪音得到规范标题，再对字符 3-gram 做 MinHash，
+按 LSH 分桶找候选，估算相似度超过阈值即视为同一簇。持久化见 app/data/dao/cluster_dao.py。
+
+哈希全部基于 blake2b，与进程无关 (不依赖 Python 内置 hash 的随机种子)，各进程算出的签名一致。
+"""
+
+import re
+import random
+import hashlib
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS        # 每个 band 4 行，约在相似度 0.6 附近开始成为候选
+SIMILARITY_THRESHOLD = 0.8      # 候选签名的估算相似度达到该值才并入同一簇
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+# 按顺序应用的噪音规则 (标题已转小写)
+_NOISE_PATTERNS = [
+    re.compile(r'^\s*[(\[]\d+\+?[)\]]\s*'),                      # 开头的通知数 (3) [12]
+    re.compile(r'\s*[(\[]\d+\+?[)\]]\s*$'),                      # 结尾的通知数
+    re.compile(r'^\s*[●•*]\s*'),                                 # 未保存标记 ● main.py / *main.py
+    re.compile(r'\s*[●•*]\s*$'),
+    re.compile(r'\s+和另外\s*\d+\s*个页面'),                     # Edge 多标签后缀
+    re.compile(r'\s+and \d+ more pages?'),
+    re.compile(r'\s+-\s+[^-]{1,20}\s+-\s+microsoft\W*edge$'),   # "- 个人 - Microsoft Edge"
+    re.compile(r'\s+-\s+(microsoft\W*edge|google chrome|mozilla firefox)$'),
+]
+_SPACE_RE = re.compile(r'\s+')
+_DIGIT_RE = re.compile(r'\d+')
+
+
+def canonicalize_title(title):
+    """去掉通知数、未保存标记、浏览器后缀等噪音，返回小写的规范标题"""
+    t = (title or "").lower()
+    for pattern in _NOISE_PATTERNS:
+        t = pattern.sub('', t)
+    return _SPACE_RE.sub(' ', t).strip()
+
+
+def shingles(canonical):
+    """规范标题的字符 3-gram 集合；数字统一为 #，编号不同的同类标题更容易聚到一起"""
+    text = _DIGIT_RE.sub('#', canonical)
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def minhash(shingle_set):
+    """返回长度为 NUM_PERM 的 MinHash 签名"""
+    hashes = [_hash64(s) for s in shingle_set] or [0]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_keys(signature, process_name=""):
+    """LSH 分桶键；进程名参与分桶，不同应用的标题不会聚到一起"""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        raw = f"{(process_name or '').lower()}|{band}|{','.join(map(str, rows))}"
+        keys.append(hashlib.blake2b(raw.encode('utf-8'), digest_size=8).hexdigest())
+    return keys
+
+
+def similarity(sig_a, sig_b):
+    """两个签名的估算 Jaccard 相似度"""
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def encode_signature(signature):
+    return ",".join(map(str, signature))
+
+
+def decode_signature(text):
+    return [int(v) for v in text.split(",")] if text else []
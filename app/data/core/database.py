@@ -5,7 +5,8 @@ from contextlib import contextmanager
 # 数据库文件路径
 # 使用绝对路径，确保在不同工作目录下（如 Flask 线程中）也能正确找到数据库
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-DB_DIR = os.path.join(BASE_DIR, 'app', 'data', 'dao', 'storage')
+# FLOW_DB_DIR 可指定其它目录 (如回放焦点轨迹时使用独立的数据库，不污染真实数据)
+DB_DIR = os.getenv('FLOW_DB_DIR') or os.path.join(BASE_DIR, 'app', 'data', 'dao', 'storage')
 if not os.path.exists(DB_DIR):
     os.makedirs(DB_DIR)
 DB_PATH = os.path.join(DB_DIR, 'focus_app.db')
@@ -118,6 +119,89 @@ def init_db():
             pass
             
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_timestamp ON activity_logs(timestamp)')
+
+        # 应用设置 (键值对，例如上次使用的模型)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS app_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        # 启动耗时记录 (冷启动各阶段毫秒数)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS startup_timings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at DATETIME DEFAULT (datetime('now', 'localtime')),
+                model TEXT,
+                ready_ms INTEGER,    -- 进程启动到 Ollama 可连接
+                tags_ms INTEGER,     -- 获取模型列表耗时
+                warmup_ms INTEGER,   -- 预热 (加载模型) 耗时
+                warmed INTEGER DEFAULT 0,
+                error TEXT
+            )
+        ''')
+        # 检测模型离线基准结果 (app/scripts/bench_models.py 写入，模型选择窗口读取)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS model_benchmarks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_at DATETIME DEFAULT (datetime('now', 'localtime')),
+                model TEXT,
+                samples INTEGER,
+                errors INTEGER,
+                p50 REAL,            -- 延迟分位数 (秒)
+                p95 REAL,
+                p99 REAL,
+                tokens_per_s REAL,
+                json_valid_rate REAL,
+                agreement REAL       -- 与会话标签的一致率
+            )
+        ''')
+
+        # 每分钟键鼠输入强度 (只有计数，不含原始事件)；按时间范围与 window_sessions 关联
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS input_minutes (
+                minute INTEGER PRIMARY KEY,     -- 分钟起始 epoch 秒
+                moves INTEGER DEFAULT 0,        -- 鼠标移动事件数
+                distance INTEGER DEFAULT 0,     -- 鼠标移动距离 (像素)
+                clicks INTEGER DEFAULT 0,
+                scrolls INTEGER DEFAULT 0,
+                keys INTEGER DEFAULT 0,
+                active_seconds INTEGER DEFAULT 0 -- 有输入的秒数 (0-60)
+            ) WITHOUT ROWID
+        ''')
+
+        # 截图索引 (文件在截图目录下)；按时间范围与 window_sessions 关联，last_access 用于按 LRU 清理
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS screenshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                captured_at REAL NOT NULL,      -- 截图时间 epoch 秒
+                path TEXT NOT NULL,             -- 相对截图目录的路径
+                bytes INTEGER NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                phash TEXT,                     -- 感知哈希 (dHash，16 位十六进制)
+                window_title TEXT,
+                process_name TEXT,
+                last_access REAL NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_screenshots_time ON screenshots(captured_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_screenshots_access ON screenshots(last_access)')
+
+        # 标题簇：近似重复的窗口标题归为一簇，会话写入时记录 cluster_id；首次升级时补齐已有会话
+        try:
+            cursor.execute('ALTER TABLE window_sessions ADD COLUMN cluster_id INTEGER')
+        except sqlite3.OperationalError:
+            pass # 字段已存在
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_cluster ON window_sessions(cluster_id)')
+        from app.data.dao.cluster_dao import TitleClusterDAO
+        TitleClusterDAO.create_tables(conn)
+        TitleClusterDAO.catch_up(conn)
+
+        # 会话全文索引 (FTS5)，供 /api/chat 检索历史；首次创建时补齐已有会话
+        from app.data.dao.search_dao import SessionSearchDAO
+        if SessionSearchDAO.create_table(conn):
+            SessionSearchDAO.catch_up(conn)
         conn.commit()
 
     # 2. 初始化 Core Events 数据库
@@ -191,6 +275,50 @@ def init_db():
         except sqlite3.OperationalError: pass
 
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_period_stats_date ON period_stats(date)')
+
+        # 7. 报告缓存表 (Report Cache)
+        # 按 (日期范围, 数据版本, 模型) 保存已生成的报告，数据未变化时重复请求直接返回
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS report_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                start_date DATE,
+                end_date DATE,
+                data_version TEXT,  -- 源数据指纹 (window_sessions + daily_stats)
+                model TEXT,
+                report TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(start_date, end_date, data_version, model)
+            )
+        ''')
+
+        # 8. 每日 AI 核心事项表 (Daily AI Summary)
+        # 保存每天的“核心事项”短句及其输入，报告只为新的/核心事件有变化的日期调用 AI
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_ai_summary (
+                date DATE PRIMARY KEY,
+                core_items TEXT,     -- AI 生成的核心事项短句
+                items_context TEXT,  -- 生成时使用的当日活动记录 (AI 输入)
+                events_hash TEXT,    -- 当日核心事件指纹，核心事件变化则失效
+                prompt_hash TEXT,    -- 提示词 + 模型指纹，提示词或模型变化则失效
+                model TEXT,
+                updated_at DATETIME
+            )
+        ''')
+
+        # 9. 报告寄语表 (Report Encouragement)
+        # 保存每个日期范围的“致追梦者”寄语及其输入，提示词 (含输入) + 模型未变时直接复用
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS report_encouragement (
+                start_date DATE,
+                end_date DATE,
+                inputs TEXT,         -- 生成时使用的输入 (JSON：活动摘要/常用软件/指标线索)
+                prompt_hash TEXT,    -- 完整提示词 + 模型指纹
+                model TEXT,
+                encouragement TEXT,
+                updated_at DATETIME,
+                PRIMARY KEY (start_date, end_date)
+            )
+        ''')
         conn.commit()
         
     print(f"[Database] Initialized databases at {DB_DIR}")
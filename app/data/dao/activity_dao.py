@@ -1,7 +1,17 @@
 # -*- coding: utf-8 -*-
 from app.data.core.database import get_db_connection, get_period_stats_db_connection
+from app.data.dao.search_dao import SessionSearchDAO
+from app.data.dao.cluster_dao import TitleClusterDAO
+from app.core.clock import get_clock
 
-from datetime import datetime
+from datetime import datetime, timedelta
+
+
+def _today_bounds():
+    """按进程时钟取“今天”：(日期字符串, 当日 00:00:00, 次日 00:00:00)"""
+    today = get_clock().today()
+    return (today.strftime('%Y-%m-%d'), f"{today:%Y-%m-%d} 00:00:00",
+            f"{today + timedelta(days=1):%Y-%m-%d} 00:00:00")
 
 class ActivityDAO:
     """活动日志数据访问对象"""
@@ -107,40 +117,35 @@ class WindowSessionDAO:
             # 简单起见，我们存储 start_time, end_time, duration
             # end_time = datetime.now()
             
-            conn.execute(
+            cluster_id = TitleClusterDAO.assign(conn, window_title, process_name)
+            cursor = conn.execute(
                 '''INSERT INTO window_sessions 
-                   (window_title, process_name, start_time, end_time, duration, status, summary) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                (window_title, process_name, start_ts, start_ts, duration, status, summary)
+                   (window_title, process_name, start_time, end_time, duration, status, summary, cluster_id) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                (window_title, process_name, start_ts, start_ts, duration, status, summary, cluster_id)
             )
+            SessionSearchDAO.index_session(conn, cursor.lastrowid, window_title, summary, process_name)
             conn.commit()
 
     @staticmethod
     def update_session_duration(session_id, additional_duration, end_timestamp=None):
         """更新会话时长和结束时间"""
         with get_db_connection() as conn:
-            # 更新 duration 和 end_time
-            if end_timestamp:
-                if isinstance(end_timestamp, (float, int)):
-                    end_ts_str = datetime.fromtimestamp(end_timestamp).strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    end_ts_str = end_timestamp
-                
-                conn.execute(
-                    '''UPDATE window_sessions 
-                       SET duration = duration + ?, 
-                           end_time = ?
-                       WHERE id = ?''',
-                    (additional_duration, end_ts_str, session_id)
-                )
+            # 更新 duration 和 end_time (未指定结束时间时取进程时钟的当前时间)
+            if not end_timestamp:
+                end_timestamp = get_clock().time()
+            if isinstance(end_timestamp, (float, int)):
+                end_ts_str = datetime.fromtimestamp(end_timestamp).strftime("%Y-%m-%d %H:%M:%S")
             else:
-                conn.execute(
-                    '''UPDATE window_sessions 
-                       SET duration = duration + ?, 
-                           end_time = datetime('now', 'localtime')
-                       WHERE id = ?''',
-                    (additional_duration, session_id)
-                )
+                end_ts_str = end_timestamp
+            
+            conn.execute(
+                '''UPDATE window_sessions 
+                   SET duration = duration + ?, 
+                       end_time = ?
+                   WHERE id = ?''',
+                (additional_duration, end_ts_str, session_id)
+            )
             conn.commit()
 
     @staticmethod
@@ -153,23 +158,55 @@ class WindowSessionDAO:
                    WHERE id = ?''',
                 (summary, session_id)
             )
+            SessionSearchDAO.reindex_sessions(conn, [session_id])
             conn.commit()
 
     @staticmethod
     def get_today_sessions():
         """获取今天的会话记录 (用于日报时间轴)"""
-        from datetime import date
-        today_str = date.today().strftime('%Y-%m-%d')
-        start_time = f"{today_str} 00:00:00"
+        _, start_time, end_time = _today_bounds()
         
         with get_db_connection() as conn:
             # 按开始时间正序排列
             rows = conn.execute(
-                'SELECT * FROM window_sessions WHERE start_time >= ? ORDER BY start_time ASC',
-                (start_time,)
+                'SELECT * FROM window_sessions WHERE start_time >= ? AND start_time < ? ORDER BY start_time ASC',
+                (start_time, end_time)
             ).fetchall()
             return [dict(row) for row in rows]
 
+    @staticmethod
+    def get_recent_sessions(limit=20):
+        """获取最近的会话记录 (按开始时间倒序)"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT * FROM window_sessions ORDER BY start_time DESC LIMIT ?', (limit,)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def get_sessions_between(start_time_str, end_time_str, include_manual=False):
+        """获取时间段内的会话记录 (用于批量重分类/回溯)"""
+        query = 'SELECT * FROM window_sessions WHERE start_time BETWEEN ? AND ?'
+        if not include_manual:
+            query += " AND process_name != 'Manual'"
+        with get_db_connection() as conn:
+            rows = conn.execute(query + ' ORDER BY start_time ASC', (start_time_str, end_time_str)).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def update_sessions_classification(updates):
+        """批量更新会话的状态与摘要
+        Args:
+            updates: [(status, summary, session_id), ...]
+        """
+        with get_db_connection() as conn:
+            conn.executemany(
+                'UPDATE window_sessions SET status = ?, summary = ? WHERE id = ?',
+                updates
+            )
+            SessionSearchDAO.reindex_sessions(conn, [u[2] for u in updates])
+            conn.commit()
+
     @staticmethod
     def check_overlap(start_time_str, end_time_str):
         """检查时间段是否与现有会话重叠"""
@@ -193,12 +230,14 @@ class WindowSessionDAO:
         duration = int((t2 - t1).total_seconds())
         
         with get_db_connection() as conn:
-            conn.execute(
+            cluster_id = TitleClusterDAO.assign(conn, summary, "Manual")
+            cursor = conn.execute(
                 '''INSERT INTO window_sessions 
-                   (window_title, process_name, start_time, end_time, duration, status, summary) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                (summary, "Manual", start_time_str, end_time_str, duration, status, summary)
+                   (window_title, process_name, start_time, end_time, duration, status, summary, cluster_id) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                (summary, "Manual", start_time_str, end_time_str, duration, status, summary, cluster_id)
             )
+            SessionSearchDAO.index_session(conn, cursor.lastrowid, summary, summary, "Manual")
             conn.commit()
 
     @staticmethod
@@ -206,6 +245,7 @@ class WindowSessionDAO:
         """删除会话记录"""
         with get_db_connection() as conn:
             conn.execute('DELETE FROM window_sessions WHERE id = ?', (session_id,))
+            SessionSearchDAO.remove_session(conn, session_id)
             conn.commit()
 
     @staticmethod
@@ -312,8 +352,7 @@ class StatsDAO:
     @staticmethod
     def get_today_stats():
         """获取今日的统计数据 (便捷方法)"""
-        from datetime import date
-        return StatsDAO.get_daily_summary(date.today())
+        return StatsDAO.get_daily_summary(get_clock().today())
 
     @staticmethod
     def get_recent_stats(days=7):
@@ -328,16 +367,14 @@ class StatsDAO:
     @staticmethod
     def recompute_today_from_sessions():
         """一刀切：从今日00:00开始统计，重算并回写 daily_stats"""
-        from datetime import date
-        today_str = date.today().strftime('%Y-%m-%d')
-        start_time = f"{today_str} 00:00:00"
+        today_str, start_time, end_time = _today_bounds()
         focus_sum = 0
         ent_sum = 0
         with get_db_connection() as conn:
             # 聚合今日开始的会话
             for row in conn.execute(
-                "SELECT status, SUM(duration) AS total_sec FROM window_sessions WHERE start_time >= ? GROUP BY status",
-                (start_time,)
+                "SELECT status, SUM(duration) AS total_sec FROM window_sessions WHERE start_time >= ? AND start_time < ? GROUP BY status",
+                (start_time, end_time)
             ):
                 status = (row["status"] or "").lower()
                 total_sec = int(row["total_sec"] or 0)
@@ -386,9 +423,7 @@ class StatsDAO:
     @staticmethod
     def recompute_today_period_from_sessions():
         """一刀切：从今日00:00开始统计，重算并写入 period_stats"""
-        from datetime import date
-        today_str = date.today().strftime('%Y-%m-%d')
-        start_time = f"{today_str} 00:00:00"
+        today_str, start_time, end_time = _today_bounds()
         focus_sum = 0
         ent_sum = 0
         max_streak = 0
@@ -398,8 +433,8 @@ class StatsDAO:
         with get_db_connection() as conn:
             # 聚合总时长
             for row in conn.execute(
-                "SELECT status, SUM(duration) AS total_sec FROM window_sessions WHERE start_time >= ? GROUP BY status",
-                (start_time,)
+                "SELECT status, SUM(duration) AS total_sec FROM window_sessions WHERE start_time >= ? AND start_time < ? GROUP BY status",
+                (start_time, end_time)
             ):
                 status = (row["status"] or "").lower()
                 total_sec = int(row["total_sec"] or 0)
@@ -409,14 +444,14 @@ class StatsDAO:
                     ent_sum += total_sec
             # 计算最长心流 (取当日 focus/work 会话的最大 duration)
             r = conn.execute(
-                "SELECT MAX(duration) AS max_dur FROM window_sessions WHERE start_time >= ? AND status IN ('focus','work')",
-                (start_time,)
+                "SELECT MAX(duration) AS max_dur FROM window_sessions WHERE start_time >= ? AND start_time < ? AND status IN ('focus','work')",
+                (start_time, end_time)
             ).fetchone()
             max_streak = int((r or {}).get("max_dur") or 0)
             # 计算意志力胜利次数：统计娱乐 -> (focus/work) 的切换次数
             rows = conn.execute(
-                "SELECT status FROM window_sessions WHERE start_time >= ? ORDER BY start_time ASC",
-                (start_time,)
+                "SELECT status FROM window_sessions WHERE start_time >= ? AND start_time < ? ORDER BY start_time ASC",
+                (start_time, end_time)
             ).fetchall()
             last_status = None
             for rr in rows or []:
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+窗口标题簇的持久化
+- title_clusters:        簇 (进程、代表标题、MinHash 签名、成员数)
+- title_cluster_members: (进程, 规范标题) → 簇，已见过的标题直接命中
+- title_cluster_bands:   LSH 分桶键 → 簇，新标题据此找候选簇
+window_sessions.cluster_id 在创建会话时写入；分类缓存、会话合并和核心事件聚合都以簇为键。
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from app.core.title_cluster import (
+    canonicalize_title, shingles, minhash, band_keys, similarity,
+    encode_signature, decode_signature, SIMILARITY_THRESHOLD,
+)
+from app.data.core.database import get_db_connection
+
+
+class TitleClusterDAO:
+    """标题聚类：写入会话时分配簇 id，其它地方只读查找"""
+
+    CACHE_SIZE = 4096
+    _cache = OrderedDict()      # (进程, 规范标题) -> 簇 id (进程内缓存)
+    _keys = OrderedDict()       # (进程, 规范标题) -> key_for 的结果 (进程内缓存)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def create_tables(conn):
+        """在 init_db 中调用"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS title_clusters (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                process_name TEXT,
+                representative_title TEXT,  -- 第一次出现的原始标题
+                signature TEXT,             -- 代表标题的 MinHash 签名
+                member_count INTEGER DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS title_cluster_members (
+                process_name TEXT,
+                canonical_title TEXT,
+                cluster_id INTEGER,
+                PRIMARY KEY (process_name, canonical_title)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS title_cluster_bands (
+                band_key TEXT,
+                cluster_id INTEGER,
+                PRIMARY KEY (band_key, cluster_id)
+            ) WITHOUT ROWID
+        ''')
+
+    @classmethod
+    def _remember(cls, key, cluster_id):
+        with cls._lock:
+            cls._cache[key] = cluster_id
+            cls._cache.move_to_end(key)
+            if len(cls._cache) > cls.CACHE_SIZE:
+                cls._cache.popitem(last=False)
+
+    @classmethod
+    def assign(cls, conn, window_title, process_name):
+        """
+        返回标题所属的簇 id，没有相近的簇则新建 (调用方负责 commit)。
+        """
+        process = process_name or ""
+        canonical = canonicalize_title(window_title)
+        key = (process, canonical)
+        with cls._lock:
+            cached = cls._cache.get(key)
+        if cached is not None:
+            return cached
+
+        member = cls._member(conn, process, canonical)
+        if member is not None:
+            cls._remember(key, member)
+            return member
+
+        best_id, signature, bands = cls._nearest(conn, process, canonical)
+        if best_id is None:
+            cursor = conn.execute(
+                'INSERT INTO title_clusters (process_name, representative_title, signature) VALUES (?, ?, ?)',
+                (process, window_title or "", encode_signature(signature))
+            )
+            best_id = cursor.lastrowid
+            conn.executemany(
+                'INSERT OR IGNORE INTO title_cluster_bands (band_key, cluster_id) VALUES (?, ?)',
+                [(b, best_id) for b in bands]
+            )
+
+        conn.execute(
+            'INSERT OR IGNORE INTO title_cluster_members (process_name, canonical_title, cluster_id) VALUES (?, ?, ?)',
+            (process, canonical, best_id)
+        )
+        # 其它进程可能同时写入了同一规范标题，以库中记录为准
+        row = conn.execute(
+            'SELECT cluster_id FROM title_cluster_members WHERE process_name = ? AND canonical_title = ?', key
+        ).fetchone()
+        cluster_id = row['cluster_id'] if row else best_id
+        if cluster_id == best_id:
+            conn.execute('UPDATE title_clusters SET member_count = member_count + 1 WHERE id = ?', (cluster_id,))
+        cls._remember(key, cluster_id)
+        return cluster_id
+
+    @staticmethod
+    def _member(conn, process, canonical):
+        row = conn.execute(
+            'SELECT cluster_id FROM title_cluster_members WHERE process_name = ? AND canonical_title = ?',
+            (process, canonical)
+        ).fetchone()
+        return row['cluster_id'] if row else None
+
+    @staticmethod
+    def _nearest(conn, process, canonical):
+        """按 LSH 候选找最相近的簇，返回 (簇 id 或 None, 签名, 分桶键)"""
+        signature = minhash(shingles(canonical))
+        bands = band_keys(signature, process)
+        placeholders = ','.join(['?'] * len(bands))
+        candidates = conn.execute(f'''
+            SELECT DISTINCT c.id, c.signature FROM title_cluster_bands b
+            JOIN title_clusters c ON c.id = b.cluster_id
+            WHERE b.band_key IN ({placeholders})
+        ''', bands).fetchall()
+
+        best_id, best_sim = None, 0.0
+        for cand in candidates:
+            sim = similarity(signature, decode_signature(cand['signature']))
+            if sim > best_sim:
+                best_id, best_sim = cand['id'], sim
+        return (best_id if best_sim >= SIMILARITY_THRESHOLD else None), signature, bands
+
+    @classmethod
+    def find(cls, conn, window_title, process_name):
+        """只读查找标题所属的簇 id (已见过的标题或相近的簇)，找不到返回 None"""
+        process = process_name or ""
+        canonical = canonicalize_title(window_title)
+        member = cls._member(conn, process, canonical)
+        if member is not None:
+            return member
+        return cls._nearest(conn, process, canonical)[0]
+
+    @classmethod
+    def key_for(cls, window_title, process_name):
+        """
+        分类缓存/分析节奏使用的窗口键 (只读，不创建簇)：已有的簇 id；
+        没有对应的簇或数据库不可用时为 (进程, 规范标题)。
+        簇只在写入会话时分配 (assign)；同一进程内同一标题的键保持不变，
+        避免会话写入后键从元组变成簇 id，被分析节奏当作一次窗口切换。
+        """
+        key = (process_name or "", canonicalize_title(window_title))
+        with cls._lock:
+            if key in cls._keys:
+                cls._keys.move_to_end(key)
+                return cls._keys[key]
+        try:
+            with get_db_connection() as conn:
+                cluster_id = cls.find(conn, window_title, process_name)
+        except sqlite3.Error:
+            cluster_id = None
+        result = cluster_id if cluster_id is not None else key
+        with cls._lock:
+            cls._keys[key] = result
+            if len(cls._keys) > cls.CACHE_SIZE:
+                cls._keys.popitem(last=False)
+        return result
+
+    @classmethod
+    def cluster_for(cls, window_title, process_name):
+        """会话写入路径使用：返回簇 id，没有则分配新簇并提交"""
+        with get_db_connection() as conn:
+            cluster_id = cls.assign(conn, window_title, process_name)
+            conn.commit()
+            return cluster_id
+
+    @classmethod
+    def catch_up(cls, conn):
+        """为尚未分配簇的会话补齐 cluster_id (首次升级时)。返回补齐条数。"""
+        rows = conn.execute(
+            'SELECT id, window_title, process_name FROM window_sessions WHERE cluster_id IS NULL'
+        ).fetchall()
+        for row in rows:
+            cluster_id = cls.assign(conn, row['window_title'], row['process_name'])
+            conn.execute('UPDATE window_sessions SET cluster_id = ? WHERE id = ?', (cluster_id, row['id']))
+        if rows:
+            conn.commit()
+            print(f"[TitleCluster] Assigned clusters to {len(rows)} existing sessions")
+        return len(rows)
+
+    @staticmethod
+    def get_cluster(cluster_id):
+        with get_db_connection() as conn:
+            row = conn.execute('SELECT * FROM title_clusters WHERE id = ?', (cluster_id,)).fetchone()
+            return dict(row) if row else None
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from app.data.core.database import get_db_connection, get_core_events_db_connection, init_db
+from app.data.dao.report_dao import DailySummaryDAO
 
 def clean_title(title, app_name):
     """
@@ -75,6 +76,8 @@ def clean_title(title, app_name):
     # 4. 通用去噪
     # 去除通知数 (1)
     t = re.sub(r'^\(\d+\)\s*', '', t)
+    # 去除未保存标记 (● main.py / *main.py)
+    t = re.sub(r'^[●•*]\s*', '', t)
     
     # 4. 去除多余空格
     t = t.strip()
@@ -98,6 +101,14 @@ def extract_core_events(target_date):
         cursor_main = conn_main.cursor()
         cursor_core = conn_core.cursor()
         
+        # 记录旧的核心事件，用于判断当天的 AI 核心事项是否需要失效
+        cursor_core.execute('''
+            SELECT category, app_name, clean_title FROM core_events WHERE date = ?
+            ORDER BY CASE category WHEN 'focus' THEN 0 ELSE 1 END, rank
+        ''', (target_date,))
+        old_events = [tuple(row) for row in cursor_core.fetchall()]
+        new_events = []
+
         # 先清除当天的旧数据 (支持重跑)
         cursor_core.execute("DELETE FROM core_events WHERE date = ?", (target_date,))
 
@@ -112,7 +123,7 @@ def extract_core_events(target_date):
             # --- Step 1: 硬过滤 ---
             # 查 status IN (...) 且 duration > 30 (放宽到 30s)
             query = f'''
-                SELECT process_name, window_title, duration 
+                SELECT process_name, window_title, duration, cluster_id 
                 FROM window_sessions
                 WHERE start_time BETWEEN ? AND ?
                 AND status IN ({status_placeholder})
@@ -127,7 +138,7 @@ def extract_core_events(target_date):
                 # [兜底逻辑] 如果 Focus 没找到，尝试找 Unknown 或其他状态中最长的
                 print(f"  [Fallback] No explicit focus found, searching for ANY significant activity...")
                 fallback_query = '''
-                    SELECT process_name, window_title, duration 
+                    SELECT process_name, window_title, duration, cluster_id 
                     FROM window_sessions
                     WHERE start_time BETWEEN ? AND ?
                     AND duration > 60
@@ -147,7 +158,8 @@ def extract_core_events(target_date):
                  continue
 
             # --- Step 2: 全局聚合 (New Logic) ---
-            # 不再依赖相邻合并，而是将全天所有的 (App, Cleaned Title) 进行累加
+            # 不再依赖相邻合并，而是将全天所有的 (App, 标题簇) 进行累加；
+            # 没有簇的旧数据退回 (App, Cleaned Title)。展示标题取簇内时长最长的清洗标题
             events_map = {}
             
             for row in rows:
@@ -158,22 +170,24 @@ def extract_core_events(target_date):
                 # 清洗标题
                 ct = clean_title(raw_title, app)
                 
-                # 组合键 (App, Cleaned Title)
-                key = (app, ct)
+                # 组合键 (App, 簇)
+                key = (app, row['cluster_id'] if row['cluster_id'] is not None else ct)
                 
                 if key not in events_map:
-                    events_map[key] = {'duration': 0, 'count': 0}
+                    events_map[key] = {'duration': 0, 'count': 0, 'titles': {}}
                 
                 # 累加时长和次数
                 events_map[key]['duration'] += dur
                 events_map[key]['count'] += 1
+                events_map[key]['titles'][ct] = events_map[key]['titles'].get(ct, 0) + dur
                 
             # --- Step 3: 排序 Top-N ---
             event_list = []
-            for (app, title), stats in events_map.items():
+            for (app, _), stats in events_map.items():
+                titles = stats['titles']
                 event_list.append({
                     'app': app,
-                    'title': title,
+                    'title': max(titles, key=titles.get),
                     'duration': stats['duration'],
                     'count': stats['count']
                 })
@@ -199,10 +213,17 @@ def extract_core_events(target_date):
                     rank,
                     cat
                 ))
+                new_events.append((cat, event['app'], event['title']))
                 print(f"  [{cat.upper()}] Rank {rank}: [{event['app']}] {event['title']} ({int(event['duration']/60)}m)")
-            
+
         conn_core.commit()
-        print("Done.")
+
+    if new_events != old_events:
+        try:
+            DailySummaryDAO.invalidate(target_date)
+        except Exception as e:
+            print(f"  Failed to invalidate AI summary for {target_date}: {e}")
+    print("Done.")
 
 def run_backfill(days=3):
     """回溯最近 N 天的数据"""
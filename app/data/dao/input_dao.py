@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+每分钟键鼠输入强度 (input_minutes)
+minute 为分钟起始的 epoch 秒；window_sessions 的时间是本地时间字符串，
+关联时用 strftime('%s', start_time, 'utc') 换算为 epoch 秒。
+"""
+
+from app.data.core.database import get_db_connection
+
+COUNTERS = ("moves", "distance", "clicks", "scrolls", "keys", "active_seconds")
+
+# 会话时间范围 [start, end] 覆盖的分钟 (包含会话开始所在的那一分钟)
+_SESSION_JOIN = '''
+    m.minute > CAST(strftime('%s', s.start_time, 'utc') AS INTEGER) - 60
+    AND m.minute <= CAST(strftime('%s', s.end_time, 'utc') AS INTEGER)
+'''
+
+
+class InputMinuteDAO:
+    """每分钟输入强度"""
+
+    @staticmethod
+    def save_batch(rows):
+        """
+        批量写入 [{"minute", moves, distance, clicks, scrolls, keys, active_seconds}, ...]。
+        同一分钟已存在时累加 (进程重启前后各写了半分钟的情况)。
+        """
+        if not rows:
+            return 0
+        with get_db_connection() as conn:
+            conn.executemany(f'''
+                INSERT INTO input_minutes (minute, {", ".join(COUNTERS)})
+                VALUES (?, {", ".join("?" for _ in COUNTERS)})
+                ON CONFLICT(minute) DO UPDATE SET
+                    {", ".join(f"{c} = {c} + excluded.{c}" for c in COUNTERS[:-1])},
+                    active_seconds = MIN(60, active_seconds + excluded.active_seconds)
+            ''', [(int(r["minute"]), *(int(round(r.get(c) or 0)) for c in COUNTERS)) for r in rows])
+            conn.commit()
+        return len(rows)
+
+    @staticmethod
+    def get_range(start_epoch, end_epoch):
+        """[start_epoch, end_epoch) 内的分钟记录，按时间升序"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT * FROM input_minutes WHERE minute >= ? AND minute < ? ORDER BY minute',
+                (int(start_epoch), int(end_epoch))
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def get_session_minutes(session_id):
+        """某个窗口会话期间的分钟记录"""
+        with get_db_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT m.* FROM window_sessions s
+                JOIN input_minutes m ON {_SESSION_JOIN}
+                WHERE s.id = ?
+                ORDER BY m.minute
+            ''', (session_id,)).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def get_session_totals(start_time_str, end_time_str):
+        """
+        时间段内每个会话的输入合计：{session_id: {moves, ..., active_seconds, minutes}}，
+        没有输入记录的会话不出现在结果中。
+        """
+        sums = ", ".join(f"SUM(m.{c}) AS {c}" for c in COUNTERS)
+        with get_db_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT s.id AS session_id, {sums}, COUNT(m.minute) AS minutes
+                FROM window_sessions s
+                JOIN input_minutes m ON {_SESSION_JOIN}
+                WHERE s.start_time >= ? AND s.start_time < ?
+                GROUP BY s.id
+            ''', (start_time_str, end_time_str)).fetchall()
+            return {row['session_id']: {k: row[k] for k in row.keys() if k != 'session_id'} for row in rows}
+
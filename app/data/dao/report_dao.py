@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import json
+import hashlib
+
+from app.data.core.database import get_db_connection, get_period_stats_db_connection
+
+
+class ReportCacheDAO:
+    """已生成报告的持久化缓存"""
+
+    # 每个日期范围保留的历史版本数
+    MAX_VERSIONS_PER_RANGE = 3
+
+    @staticmethod
+    def data_version(start_date, end_date):
+        """
+        计算日期范围内源数据的指纹。
+        报告的所有派生数据 (core_events / period_stats) 都由 window_sessions 与 daily_stats 重新计算，
+        因此只要这两张表在该范围内没有变化，报告内容就不会变化。
+        max_focus_streak 不计入：它由会话重算 (prepare_report_data 会回写)，会话已在指纹中，
+        否则同一份数据在准备前后的指纹不同，生成的报告永远命中不了缓存。
+        """
+        start_ts = f"{start_date} 00:00:00"
+        end_ts = f"{end_date} 23:59:59"
+        with get_db_connection() as conn:
+            sessions = conn.execute('''
+                SELECT COUNT(*), MAX(id), SUM(duration), MAX(end_time),
+                       GROUP_CONCAT(status || ':' || COALESCE(summary, ''), '|')
+                FROM window_sessions
+                WHERE start_time BETWEEN ? AND ?
+            ''', (start_ts, end_ts)).fetchone()
+            stats = conn.execute('''
+                SELECT GROUP_CONCAT(date || ':' || total_focus_time || ':'
+                                    || willpower_wins || ':' || efficiency_score, '|')
+                FROM daily_stats
+                WHERE date BETWEEN ? AND ?
+            ''', (start_date, end_date)).fetchone()
+        raw = repr(tuple(sessions)) + repr(tuple(stats))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def get_report(start_date, end_date, data_version, model):
+        with get_period_stats_db_connection() as conn:
+            row = conn.execute('''
+                SELECT report, created_at FROM report_cache
+                WHERE start_date = ? AND end_date = ? AND data_version = ? AND model = ?
+            ''', (str(start_date), str(end_date), data_version, model)).fetchone()
+            return dict(row) if row else None
+
+    @staticmethod
+    def save_report(start_date, end_date, data_version, model, report):
+        with get_period_stats_db_connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO report_cache (start_date, end_date, data_version, model, report)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (str(start_date), str(end_date), data_version, model, report))
+            # 同一日期范围只保留最近几个版本
+            conn.execute('''
+                DELETE FROM report_cache
+                WHERE start_date = ? AND end_date = ? AND id NOT IN (
+                    SELECT id FROM report_cache WHERE start_date = ? AND end_date = ?
+                    ORDER BY id DESC LIMIT ?
+                )
+            ''', (str(start_date), str(end_date), str(start_date), str(end_date),
+                  ReportCacheDAO.MAX_VERSIONS_PER_RANGE))
+            conn.commit()
+
+
+class DailySummaryDAO:
+    """
+    每日 AI 核心事项缓存 (period_stats.db / daily_ai_summary)。
+    以当天核心事件的指纹 (events_hash) 和提示词+模型指纹 (prompt_hash) 校验有效性，
+    核心事件变化时由 extract_core_events 主动失效。
+    """
+
+    @staticmethod
+    def events_hash(events):
+        """核心事件指纹：只看排名中的 (类别, 应用, 标题)，时长的小幅增长不会导致失效"""
+        keys = [(e.get('category') or '', e.get('app_name') or '', e.get('clean_title') or '') for e in events]
+        return hashlib.sha1(repr(keys).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def get_summaries(dates, prompt_hash):
+        """返回 {date: row}，只包含 prompt_hash 一致的记录 (events_hash 由调用方比对)"""
+        dates = [str(d) for d in dates]
+        if not dates:
+            return {}
+        placeholders = ','.join(['?'] * len(dates))
+        with get_period_stats_db_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT date, core_items, items_context, events_hash, prompt_hash, model
+                FROM daily_ai_summary
+                WHERE date IN ({placeholders}) AND prompt_hash = ?
+            ''', dates + [prompt_hash]).fetchall()
+            return {str(row['date']): dict(row) for row in rows}
+
+    @staticmethod
+    def get_core_items(dates):
+        """返回 {date: 核心事项}，不校验指纹 (用于聊天上下文等只读场景)"""
+        dates = [str(d) for d in dates]
+        if not dates:
+            return {}
+        placeholders = ','.join(['?'] * len(dates))
+        with get_period_stats_db_connection() as conn:
+            rows = conn.execute(
+                f'SELECT date, core_items FROM daily_ai_summary WHERE date IN ({placeholders})', dates
+            ).fetchall()
+            return {str(row['date']): row['core_items'] for row in rows if row['core_items']}
+
+    @staticmethod
+    def save_summaries(rows):
+        """rows: [(date, core_items, items_context, events_hash, prompt_hash, model)]"""
+        if not rows:
+            return
+        with get_period_stats_db_connection() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO daily_ai_summary
+                    (date, core_items, items_context, events_hash, prompt_hash, model, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))
+            ''', [(str(r[0]),) + tuple(r[1:]) for r in rows])
+            conn.commit()
+
+    @staticmethod
+    def invalidate(date_str):
+        with get_period_stats_db_connection() as conn:
+            conn.execute('DELETE FROM daily_ai_summary WHERE date = ?', (str(date_str),))
+            conn.commit()
+
+
+class EncouragementDAO:
+    """
+    报告“致追梦者”寄语缓存 (period_stats.db / report_encouragement)。
+    每个日期范围保留最近一次的结果，prompt_hash (完整提示词 + 模型) 一致时复用。
+    """
+
+    @staticmethod
+    def prompt_hash(prompt, model):
+        return hashlib.sha1((prompt + (model or "")).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def get(start_date, end_date, prompt_hash):
+        """返回已保存的寄语；日期范围没有记录或 prompt_hash 不一致时返回 None"""
+        with get_period_stats_db_connection() as conn:
+            row = conn.execute('''
+                SELECT encouragement FROM report_encouragement
+                WHERE start_date = ? AND end_date = ? AND prompt_hash = ?
+            ''', (str(start_date), str(end_date), prompt_hash)).fetchone()
+            return row['encouragement'] if row and row['encouragement'] else None
+
+    @staticmethod
+    def save(start_date, end_date, inputs, prompt_hash, model, encouragement):
+        """inputs: dict，以 JSON 保存"""
+        with get_period_stats_db_connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO report_encouragement
+                    (start_date, end_date, inputs, prompt_hash, model, encouragement, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))
+            ''', (str(start_date), str(end_date), json.dumps(inputs, ensure_ascii=False),
+                  prompt_hash, model, encouragement))
+            conn.commit()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+截图索引 (screenshots)
+文件本身在截图目录下，这里只记录路径、大小、感知哈希和窗口信息；
+captured_at 为 epoch 秒，与 window_sessions 关联方式同 input_minutes。
+"""
+
+import time
+
+from app.data.core.database import get_db_connection
+
+# 会话时间范围 [start, end] 内的截图
+_SESSION_JOIN = '''
+    sc.captured_at >= CAST(strftime('%s', s.start_time, 'utc') AS INTEGER)
+    AND sc.captured_at < CAST(strftime('%s', s.end_time, 'utc') AS INTEGER) + 1
+'''
+
+
+class ScreenshotDAO:
+    """截图索引"""
+
+    @staticmethod
+    def insert(captured_at, path, size, width, height, phash, window_title, process_name):
+        with get_db_connection() as conn:
+            cursor = conn.execute('''
+                INSERT INTO screenshots (captured_at, path, bytes, width, height, phash,
+                                         window_title, process_name, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (captured_at, path, size, width, height, phash, window_title, process_name, captured_at))
+            conn.commit()
+            return cursor.lastrowid
+
+    @staticmethod
+    def total_bytes():
+        with get_db_connection() as conn:
+            return conn.execute('SELECT COALESCE(SUM(bytes), 0) FROM screenshots').fetchone()[0]
+
+    @staticmethod
+    def least_recently_used(limit=50):
+        """最久未访问的截图 [{id, path, bytes}, ...]"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT id, path, bytes FROM screenshots ORDER BY last_access, id LIMIT ?', (limit,)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def delete(ids):
+        if not ids:
+            return 0
+        with get_db_connection() as conn:
+            conn.executemany('DELETE FROM screenshots WHERE id = ?', [(i,) for i in ids])
+            conn.commit()
+        return len(ids)
+
+    @staticmethod
+    def touch(ids, at=None):
+        """标记为刚被访问 (查看截图时调用)，LRU 清理时最后删除"""
+        if not ids:
+            return
+        at = time.time() if at is None else at
+        with get_db_connection() as conn:
+            conn.executemany('UPDATE screenshots SET last_access = ? WHERE id = ?', [(at, i) for i in ids])
+            conn.commit()
+
+    @staticmethod
+    def get_range(start_epoch, end_epoch):
+        """[start_epoch, end_epoch) 内的截图，按时间升序"""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT * FROM screenshots WHERE captured_at >= ? AND captured_at < ? ORDER BY captured_at',
+                (start_epoch, end_epoch)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def get_session_screenshots(session_id, touch=True):
+        """某个窗口会话期间的截图；默认同时更新访问时间"""
+        with get_db_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT sc.* FROM window_sessions s
+                JOIN screenshots sc ON {_SESSION_JOIN}
+                WHERE s.id = ?
+                ORDER BY sc.captured_at
+            ''', (session_id,)).fetchall()
+            result = [dict(row) for row in rows]
+        if touch:
+            ScreenshotDAO.touch([r['id'] for r in result])
+        return result
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+会话全文检索 (SQLite FTS5 + BM25)
+FTS5 自带的 unicode61 分词会把整段中文当成一个词，这里在写入和查询时统一做切分：
+英文/数字按单词，中文按相邻二字 (bigram)，单字词保留原字。
+索引表 session_search 的 rowid 与 window_sessions.id 一致，由 WindowSessionDAO 在写入时同步。
+"""
+
+import re
+import sqlite3
+
+from app.data.core.database import get_db_connection
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+|[\u4e00-\u9fff\u3400-\u4dbf]+")
+
+# BM25 列权重：标题、摘要、进程名
+BM25_WEIGHTS = (1.0, 1.5, 0.5)
+
+# 提问中常见、对检索没有帮助的二字词
+STOP_TOKENS = {"我的", "什么", "怎么", "多少", "一下", "哪些", "是不", "不是", "了吗", "有没", "没有", "帮我"}
+
+
+def segment(text):
+    """把文本切分为空格分隔的检索词"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if run[0].isascii():
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def build_match_query(text):
+    """把用户问题转换为 FTS5 MATCH 表达式 (任一词命中即可，由 BM25 排序)"""
+    seen = []
+    for tok in segment(text):
+        if tok not in seen and tok not in STOP_TOKENS:
+            seen.append(tok)
+    return " OR ".join(f'"{tok}"' for tok in seen)
+
+
+class SessionSearchDAO:
+    """window_sessions 的全文索引"""
+
+    @staticmethod
+    def create_table(conn):
+        """在 init_db 中调用；SQLite 未编译 FTS5 时返回 False"""
+        try:
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS session_search
+                USING fts5(title, summary, process, tokenize='unicode61')
+            ''')
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"[SessionSearch] FTS5 unavailable, chat retrieval falls back to recent sessions: {e}")
+            return False
+
+    @staticmethod
+    def index_session(conn, session_id, window_title, summary, process_name):
+        """写入/覆盖一条会话的索引 (调用方负责 commit)"""
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO session_search (rowid, title, summary, process) VALUES (?, ?, ?, ?)',
+                (session_id, " ".join(segment(window_title)), " ".join(segment(summary)),
+                 " ".join(segment(process_name)))
+            )
+        except sqlite3.OperationalError:
+            pass  # 索引表不存在 (FTS5 不可用或尚未 init_db)
+
+    @staticmethod
+    def reindex_sessions(conn, session_ids):
+        """按 id 从 window_sessions 重新读取并索引"""
+        if not session_ids:
+            return
+        ids = list(session_ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join(['?'] * len(chunk))
+            rows = conn.execute(
+                f'SELECT id, window_title, summary, process_name FROM window_sessions WHERE id IN ({placeholders})',
+                chunk
+            ).fetchall()
+            for row in rows:
+                SessionSearchDAO.index_session(conn, row['id'], row['window_title'], row['summary'], row['process_name'])
+
+    @staticmethod
+    def remove_session(conn, session_id):
+        try:
+            conn.execute('DELETE FROM session_search WHERE rowid = ?', (session_id,))
+        except sqlite3.OperationalError:
+            pass
+
+    @staticmethod
+    def catch_up(conn):
+        """
+        补齐索引：把尚未索引的会话加入索引
+        (首次升级、或有脚本绕过 DAO 直接写库时)。只在 init_db 启动时调用，不在查询路径上执行。返回补齐条数。
+        """
+        try:
+            rows = conn.execute('''
+                SELECT id, window_title, summary, process_name FROM window_sessions
+                WHERE id NOT IN (SELECT rowid FROM session_search)
+            ''').fetchall()
+        except sqlite3.OperationalError:
+            return 0
+        for row in rows:
+            SessionSearchDAO.index_session(conn, row['id'], row['window_title'], row['summary'], row['process_name'])
+        if rows:
+            conn.commit()
+        return len(rows)
+
+    @staticmethod
+    def search(query, limit=200):
+        """
+        BM25 检索相关会话，按相关度排序。
+        Returns:
+            会话 dict 列表 (附带 score，越小越相关)；FTS5 不可用或无检索词时返回 []
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+        # 只读：索引由 DAO 写入时同步维护，缺失部分在 init_db 启动时补齐
+        with get_db_connection() as conn:
+            try:
+                rows = conn.execute(f'''
+                    SELECT ws.*, bm25(session_search, {", ".join(str(w) for w in BM25_WEIGHTS)}) AS score
+                    FROM session_search
+                    JOIN window_sessions ws ON ws.id = session_search.rowid
+                    WHERE session_search MATCH ?
+                    ORDER BY score
+                    LIMIT ?
+                ''', (match, limit)).fetchall()
+            except sqlite3.OperationalError as e:
+                print(f"[SessionSearch] Query failed: {e}")
+                return []
+            return [dict(row) for row in rows]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from app.data.core.database import get_db_connection
+
+
+class SettingsDAO:
+    """应用设置 (键值对)"""
+
+    @staticmethod
+    def get(key, default=None):
+        with get_db_connection() as conn:
+            row = conn.execute('SELECT value FROM app_settings WHERE key = ?', (key,)).fetchone()
+            return row['value'] if row else default
+
+    @staticmethod
+    def set(key, value):
+        with get_db_connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)', (key, value))
+            conn.commit()
+
+
+class StartupTimingDAO:
+    """启动耗时记录"""
+
+    @staticmethod
+    def record(model, ready_ms=None, tags_ms=None, warmup_ms=None, warmed=False, error=None):
+        with get_db_connection() as conn:
+            conn.execute(
+                '''INSERT INTO startup_timings (model, ready_ms, tags_ms, warmup_ms, warmed, error)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                (model, ready_ms, tags_ms, warmup_ms, int(bool(warmed)), error)
+            )
+            conn.commit()
+
+    @staticmethod
+    def get_recent(limit=20):
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT * FROM startup_timings ORDER BY id DESC LIMIT ?', (limit,)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+
+class ModelBenchmarkDAO:
+    """检测模型离线基准结果"""
+
+    @staticmethod
+    def save(result):
+        with get_db_connection() as conn:
+            conn.execute(
+                '''INSERT INTO model_benchmarks
+                   (model, samples, errors, p50, p95, p99, tokens_per_s, json_valid_rate, agreement)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (result['model'], result['samples'], result['errors'], result['p50'], result['p95'],
+                 result['p99'], result['tokens_per_s'], result['json_valid_rate'], result['agreement'])
+            )
+            conn.commit()
+
+    @staticmethod
+    def get_latest():
+        """每个模型最近一次的基准结果 {model: dict}"""
+        with get_db_connection() as conn:
+            rows = conn.execute('''
+                SELECT * FROM model_benchmarks
+                WHERE id IN (SELECT MAX(id) FROM model_benchmarks GROUP BY model)
+            ''').fetchall()
+            return {row['model']: dict(row) for row in rows}
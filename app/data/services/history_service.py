@@ -18,12 +18,14 @@ if project_root not in sys.path:
 
 from datetime import date, datetime
 from app.data.dao.activity_dao import ActivityDAO, StatsDAO, WindowSessionDAO
+from app.data.dao.cluster_dao import TitleClusterDAO
+from app.core.clock import get_clock
 import json
 
 class ActivityHistoryManager:
     """活动历史管理器"""
     
-    # 全局当前模式变量
+    # 全局当前模式变量 (每个进程各一份；AI 进程的由 UI 通过命令通道 CMD_SET_MODE 同步)
     _current_mode = "focus"  # 默认专注模式
     
     @classmethod
@@ -36,7 +38,9 @@ class ActivityHistoryManager:
         """获取当前模式"""
         return cls._current_mode
     
-    def __init__(self):
+    def __init__(self, clock=None):
+        # 时钟 (默认使用进程内安装的时钟，回放时为虚拟时间)
+        self.clock = clock or get_clock()
         self.current_status = None
         self.status_start_time = None
         self._last_summary = None
@@ -52,15 +56,24 @@ class ActivityHistoryManager:
         self._last_window_session = {
             'id': None,
             'title': None,
-            'process': None
+            'process': None,
+            'cluster': None
         }
         
+        # 启动后只在第一次写会话时尝试接续数据库中的最后一条 (跨日分割等主动切断后不再接续)
+        self._resume_checked = False
+        
         # 内存缓存，用于快速 UI 展示
         self._history_cache = [] 
     
-    def update(self, status: str, summary: str = None, raw_data: str = None):
-        """更新当前状态"""
-        current_time = time.time()
+    def update(self, status: str, summary: str = None, raw_data: str = None, at: float = None):
+        """
+        更新当前状态
+        at: 状态切换实际发生的时间 (如空闲开始于最后一次输入时)，默认为当前时间
+        """
+        current_time = self.clock.time() if at is None else at
+        if self.status_start_time is not None:
+            current_time = max(current_time, self.status_start_time)
         
         # 首次运行
         if self.current_status is None:
@@ -79,7 +92,8 @@ class ActivityHistoryManager:
                     if self._last_status_was_focus and 5 < duration_seconds < 300:
                         willpower_win_increment = 1
                 
-                self._save_record(self.current_status, duration_seconds, self._last_summary, self._last_raw_data, willpower_wins_increment=willpower_win_increment)
+                self._save_record(self.current_status, duration_seconds, self._last_summary, self._last_raw_data,
+                                  willpower_wins_increment=willpower_win_increment, end_ts=current_time)
                 self._update_cache(self.current_status, int(duration_seconds / 60), self.status_start_time)
             
             # 更新状态追踪 (为下一段做准备)
@@ -109,7 +123,7 @@ class ActivityHistoryManager:
                 duration_seconds = int(current_time - self.status_start_time)
                 # 即使时间很短，只要有 AI 分析结果，也值得保存
                 if duration_seconds > 0:
-                     self._save_record(self.current_status, duration_seconds, summary, raw_data)
+                     self._save_record(self.current_status, duration_seconds, summary, raw_data, end_ts=current_time)
                      self._update_cache(self.current_status, int(duration_seconds / 60), self.status_start_time)
                 
                 # 重置开始时间，相当于无缝开启下一段同状态的记录
@@ -124,9 +138,10 @@ class ActivityHistoryManager:
                 if raw_data:
                     self._last_raw_data = raw_data
     
-    def _save_record(self, status: str, duration: int, summary: str = None, raw_data: str = None, willpower_wins_increment: int = 0):
-        """调用 DAO 保存数据 (自动处理跨日分割)"""
-        current_ts = time.time()
+    def _save_record(self, status: str, duration: int, summary: str = None, raw_data: str = None,
+                     willpower_wins_increment: int = 0, end_ts: float = None):
+        """调用 DAO 保存数据 (自动处理跨日分割)；end_ts 为记录结束时间，默认为当前时间"""
+        current_ts = self.clock.time() if end_ts is None else end_ts
         start_ts = current_ts - duration
         
         start_dt = datetime.fromtimestamp(start_ts)
@@ -153,7 +168,8 @@ class ActivityHistoryManager:
             self._last_window_session = {
                 'id': None,
                 'title': None,
-                'process': None
+                'process': None,
+                'cluster': None
             }
             
             # 3. 计算第二段（今天）的时长
@@ -174,9 +190,9 @@ class ActivityHistoryManager:
         """实际执行 DAO 保存逻辑"""
         try:
             if record_date is None:
-                record_date = date.today()
+                record_date = self.clock.today()
             if session_end_ts is None:
-                session_end_ts = time.time()
+                session_end_ts = self.clock.time()
 
             # 1. 写入流水日志
             # 使用 session_end_ts 作为记录时间点
@@ -204,18 +220,25 @@ class ActivityHistoryManager:
                     window_title = rd.get('window', '')
                     process_name = rd.get('process', '')
                     
-                    if self._last_window_session['id'] is None:
+                    if self._last_window_session['id'] is None and not self._resume_checked:
+                        self._resume_checked = True
                         last_sess = WindowSessionDAO.get_last_session()
-                        if last_sess:
+                        # 只接续同一天开始的会话 (昨天的会话结束于今天 00:00:00，不能按结束时间判断)
+                        if last_sess and str(last_sess['start_time'])[:10] == str(record_date):
                             self._last_window_session = {
                                 'id': last_sess['id'],
                                 'title': last_sess['window_title'],
-                                'process': last_sess['process_name']
+                                'process': last_sess['process_name'],
+                                'cluster': last_sess.get('cluster_id')
                             }
                     
+                    # 同一标题簇视为同一会话 (如 "(3) Inbox" → "(4) Inbox"、IDE 未保存标记)
+                    cluster_id = TitleClusterDAO.cluster_for(window_title, process_name)
                     is_same_session = (
-                        self._last_window_session['id'] is not None and
-                        window_title == self._last_window_session['title']
+                        self._last_window_session['id'] is not None and (
+                            window_title == self._last_window_session['title'] or
+                            cluster_id == self._last_window_session['cluster']
+                        )
                     )
                     
                     session_status = status
@@ -243,7 +266,8 @@ class ActivityHistoryManager:
                             self._last_window_session = {
                                 'id': new_sess['id'],
                                 'title': new_sess['window_title'],
-                                'process': new_sess['process_name']
+                                'process': new_sess['process_name'],
+                                'cluster': new_sess.get('cluster_id')
                             }
                             
                 except Exception as e:
@@ -272,7 +296,7 @@ class ActivityHistoryManager:
     def get_current_duration(self) -> int:
         if self.status_start_time is None:
             return 0
-        return int((time.time() - self.status_start_time) / 60)
+        return int((self.clock.time() - self.status_start_time) / 60)
     
     def get_history(self) -> list:
         return self._history_cache
@@ -289,7 +313,7 @@ class ActivityHistoryManager:
     def get_daily_logs(self, day: date = None):
         """获取某日的详细活动日志"""
         if day is None:
-            day = date.today()
+            day = self.clock.today()
         try:
             return ActivityDAO.get_logs_by_date(day)
         except Exception as e:
@@ -299,7 +323,7 @@ class ActivityHistoryManager:
     def get_daily_summary(self, day: date = None):
         """获取统计摘要"""
         if day is None:
-            day = date.today()
+            day = self.clock.today()
         
         try:
             data = StatsDAO.get_daily_summary(day)
@@ -3,9 +3,15 @@ from datetime import datetime, timedelta, date
 from typing import Dict, List, Optional
 import json
 
+from app.core.single_flight import SingleFlight, fingerprint
+from app.core.clock import get_clock
 from app.data.core.database import get_db_connection, get_period_stats_db_connection, get_core_events_db_connection
+from app.data.dao.report_dao import DailySummaryDAO
 from app.data.web_report.templates import REPORT_TEMPLATE
 
+# 同一进程内相同参数的报告生成只跑一次 (多个标签页/重复点击)
+_report_flight = SingleFlight("ReportGenerator")
+
 class ReportGenerator:
     """
     负责生成“深度专注力复盘报告”。
@@ -19,15 +25,26 @@ class ReportGenerator:
     def __init__(self):
         pass
 
-    def generate_report(self, days: int = 3, ai_callback=None) -> str:
+    def generate_report(self, days: int = 3, ai_callback=None, summary_version: Optional[str] = None,
+                        model: Optional[str] = None) -> str:
         """
         生成报告的主入口。
         :param days: 统计最近多少天的数据（默认3天）
         :param ai_callback: 一个函数，接收 context(dict) 并返回 {core_items: dict, encouragement: str}
                             如果为 None，则使用默认的占位符文本。
+        :param summary_version: 核心事项提示词 + 模型的指纹。提供时先读取已保存的每日核心事项，
+                                只把没有记录或核心事件已变化的日期交给 ai_callback，新结果写回。
+        :param model: 生成核心事项使用的模型 (仅记录)
         :return: 渲染好的 Markdown 报告字符串
+
+        相同参数的并发调用只执行一次，其余调用等待并共享结果。
         """
-        end_date = date.today()
+        key = fingerprint("report", days, get_clock().today(), summary_version, model, ai_callback is not None)
+        report_md, _ = _report_flight.do(key, self._generate_report, days, ai_callback, summary_version, model)
+        return report_md
+
+    def _generate_report(self, days, ai_callback, summary_version, model) -> str:
+        end_date = get_clock().today()
         start_date = end_date - timedelta(days=days - 1)
         
         # 1. 获取基础数据
@@ -40,27 +57,68 @@ class ReportGenerator:
         ai_result = {"core_items": {}, "encouragement": "AI 正在思考中..."}
         if ai_callback:
             # 构造给 AI 的 Prompt Context
+            daily_logs = formatted_data["daily_logs_for_ai"]
+            stored_items = {}
+            if summary_version:
+                daily_logs, stored_items = self._apply_stored_summaries(daily_logs, summary_version)
             ai_context = {
                 "period": f"{start_date} to {end_date}",
+                "start_date": start_date,
+                "end_date": end_date,
                 "total_focus_hours": formatted_data["total_focus_hours"],
                 "willpower_wins": formatted_data["willpower_wins"],
                 "peak_day": formatted_data["peak_day_info"],
-                "daily_logs": formatted_data["daily_logs_for_ai"],
+                "daily_logs": daily_logs,
                 "period_stats_rows": formatted_data.get("period_stats_rows", []),
                 "top_apps": formatted_data.get("top_apps", "")
             }
             try:
                 ai_result = ai_callback(ai_context)
+                if summary_version:
+                    self._store_summaries(daily_logs, ai_result.get("core_items", {}), summary_version, model)
+                ai_result["core_items"] = {**stored_items, **ai_result.get("core_items", {})}
             except Exception as e:
                 print(f"[ReportGenerator] AI generation failed: {e}")
                 ai_result = {
-                    "core_items": {}, 
+                    "core_items": stored_items,
                     "encouragement": "致追梦者：数据表明你正在稳步前行。保持节奏，Flow State 就在前方。(AI 生成暂时不可用)"
                 }
 
         # 4. 最终渲染
         return self._render_template(formatted_data, ai_result)
 
+    def _apply_stored_summaries(self, daily_logs: List[Dict], summary_version: str):
+        """
+        读取已保存的每日核心事项：核心事件指纹一致的日期直接复用。
+        :return: (仍需 AI 生成的 daily_logs, {fmt_date: 核心事项})
+        """
+        try:
+            stored = DailySummaryDAO.get_summaries([log["date_key"] for log in daily_logs], summary_version)
+        except Exception as e:
+            print(f"[ReportGenerator] Failed to load stored summaries: {e}")
+            return daily_logs, {}
+
+        pending, reused = [], {}
+        for log in daily_logs:
+            row = stored.get(log["date_key"])
+            if row and row["core_items"] and row["events_hash"] == log["events_hash"]:
+                reused[log["date"]] = row["core_items"]
+            else:
+                pending.append(log)
+        print(f"[ReportGenerator] Core items reused for {len(reused)} day(s), {len(pending)} day(s) need AI")
+        return pending, reused
+
+    def _store_summaries(self, daily_logs: List[Dict], core_items: Dict, summary_version: str, model: Optional[str]):
+        rows = []
+        for log in daily_logs:
+            item = core_items.get(log["date"])
+            if item:
+                rows.append((log["date_key"], item, log["items_context"], log["events_hash"], summary_version, model))
+        try:
+            DailySummaryDAO.save_summaries(rows)
+        except Exception as e:
+            print(f"[ReportGenerator] Failed to store summaries: {e}")
+
     def _fetch_data(self, start_date: date, end_date: date) -> Dict:
         """从数据库拉取原始数据"""
         data = {
@@ -298,7 +356,9 @@ class ReportGenerator:
             
             daily_logs_for_ai.append({
                 "date": fmt_date,
+                "date_key": d_str,
                 "items_context": items_context_str, # 新字段：包含多条记录
+                "events_hash": DailySummaryDAO.events_hash(focus_items + ent_items),
                 "hours": row_data["hours"]
             })
 
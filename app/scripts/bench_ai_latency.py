@@ -0,0 +1,222 @@
+"""
+AI 链路压测：启动本地模拟 Ollama，在可控的延迟/错误率下驱动
+- detector: 监控 worker 的分析路径 (AdaptiveAnalysisPolicy + classify_window)，多个 worker 并发、按虚拟时间加速播放
+- report:   Web 进程的 /api/report/generate (Flask test client，并发提交并轮询任务到结束)
+输出吞吐、延迟分位数、超时和降级次数。
+数据库使用独立目录 (默认临时目录；report 场景复制一份真实数据)，不会写入真实数据。
+
+示例：
+    python app/scripts/bench_ai_latency.py detector --latency lognormal:0,0.6 --error-rate 0.1 --requests 200 --concurrency 4
+    python app/scripts/bench_ai_latency.py report --latency uniform:1,3 --concurrency 4 --requests 8
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+sys.path.insert(0, ROOT)
+from app.core.metrics import summarize_latencies
+from app.service.ai.mock_ollama import start_mock_server
+
+# 真实数据库目录 (与 app/data/core/database.py 的默认值一致)
+DEFAULT_STORAGE = os.path.join(ROOT, 'app', 'data', 'dao', 'storage')
+
+
+SAMPLE_WINDOWS = [
+    ("main.py - flow-state - Visual Studio Code", "Code.exe"),
+    ("Pull requests · GitHub - Google Chrome", "chrome.exe"),
+    ("哔哩哔哩 (゜-゜)つロ 干杯~-bilibili - Google Chrome", "chrome.exe"),
+    ("周报.docx - Word", "WINWORD.EXE"),
+    ("微信", "WeChat.exe"),
+    ("Windows PowerShell", "powershell.exe"),
+]
+
+
+def _configure_env(mock, args, db_dir):
+    """必须在导入 LangflowClient / app.data 相关模块之前设置"""
+    # 压测使用独立的数据库目录，不读写真实数据
+    os.environ['FLOW_DB_DIR'] = db_dir
+    os.environ['OLLAMA_BASE_URL'] = mock.base_url
+    os.environ['OLLAMA_MODEL'] = mock.models[0]
+    os.environ['OLLAMA_TIMEOUT'] = str(args.client_timeout)
+    os.environ['FLOW_LLM_MAX_CONCURRENCY'] = str(args.llm_concurrency)
+
+
+def _prepare_db_dir(args):
+    """--db-dir 或新建临时目录；report 场景默认复制一份真实数据库，让报告有数据可用"""
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix="flow_bench_")
+    os.makedirs(db_dir, exist_ok=True)
+    if args.scenario == "report" and not args.db_dir and not args.empty_db and os.path.isdir(DEFAULT_STORAGE):
+        for name in os.listdir(DEFAULT_STORAGE):
+            if name.endswith(".db"):
+                shutil.copy2(os.path.join(DEFAULT_STORAGE, name), db_dir)
+    return db_dir
+
+
+def bench_detector(args):
+    """
+    模拟 --concurrency 个监控 worker 同时运行：每个 worker 按虚拟时间在 --windows 个窗口间轮换，
+    每个窗口停留 --dwell 个虚拟秒 (默认比最大去抖时间长，保证能进入分析)，
+    策略给出 ANALYZE 时真实调用分类，各 worker 的调用并发进入调度器与模拟服务。
+    """
+    from app.service.detector.detector_logic import classify_window
+    from app.service.analysis_policy import AdaptiveAnalysisPolicy, DECISION_ANALYZE, DECISION_REUSE
+
+    visits_per_worker = max(1, args.requests // args.concurrency)
+    latencies, sources, decisions = [], {"llm": 0, "cache": 0, "rules": 0}, {}
+    lock = threading.Lock()
+
+    def run_worker(worker):
+        policy = AdaptiveAnalysisPolicy(hourly_budget=0)
+        dwell = args.dwell or policy.max_debounce + 1
+        now = 0.0
+        for visit in range(visits_per_worker):
+            index = visit % args.windows
+            title, process = SAMPLE_WINDOWS[index % len(SAMPLE_WINDOWS)]
+            title = f"{title} #{worker}-{index}"
+            # 逐秒推进，与 worker 每秒一轮的节奏一致；每个窗口停留期间可能分析多次
+            for _ in range(int(dwell)):
+                now += 1
+                policy.observe(title, process, now=now)
+                decision = policy.decide(title, process, now=now)
+                with lock:
+                    decisions[decision] = decisions.get(decision, 0) + 1
+                if decision == DECISION_REUSE:
+                    policy.mark_written(title, process)
+                if decision != DECISION_ANALYZE:
+                    continue
+                t0 = time.time()
+                data, source = classify_window(title, process, duration=dwell)
+                latency = time.time() - t0
+                with lock:
+                    latencies.append(latency)
+                    sources[source] += 1
+                if source == "llm":
+                    policy.record_result(title, process, (data.get("状态"), data.get("活动摘要")), data, latency, now=now)
+                else:
+                    policy.record_degraded(title, process, data, now=now)
+                # 与 worker 一致：结果写入历史后，停留期间不再重复复用
+                policy.mark_written(title, process)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run_worker, range(args.concurrency)))
+    elapsed = time.time() - start
+    return {
+        "scenario": "detector",
+        "elapsed": round(elapsed, 2),
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        "latency": summarize_latencies(latencies),
+        "sources": sources,
+        "decisions": decisions,
+        "timeouts": sum(1 for latency in latencies if latency >= args.client_timeout),
+    }
+
+
+def bench_report(args):
+    """并发提交报告任务并轮询到结束，统计端到端耗时、完成/失败/超时"""
+    from app.service.API.web_API import create_app
+
+    app = create_app()
+    results = []
+    lock = threading.Lock()
+
+    def one_request(_):
+        client = app.test_client()
+        t0 = time.time()
+        resp = client.post('/api/report/generate', json={"days": args.days})
+        submit_latency = time.time() - t0
+        body = resp.get_json(silent=True) or {}
+        # 202：任务已提交，轮询到 done/failed/cancelled；200：命中缓存直接完成
+        while resp.status_code == 202 and body.get("status") not in ("done", "failed", "cancelled"):
+            if time.time() - t0 >= args.job_timeout:
+                break
+            time.sleep(args.poll_interval)
+            resp = client.get(f"/api/report/jobs/{body['job_id']}")
+            body = resp.get_json(silent=True) or {}
+        with lock:
+            results.append({
+                "latency": time.time() - t0,
+                "submit_latency": submit_latency,
+                "status": body.get("status") or f"http_{resp.status_code}",
+                "report": "report" in body,
+                "cached": bool(body.get("cached")),
+            })
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one_request, range(args.requests)))
+    elapsed = time.time() - start
+
+    finished = [r for r in results if r["status"] in ("done", "failed", "cancelled")]
+    return {
+        "scenario": "report",
+        "elapsed": round(elapsed, 2),
+        "throughput_per_s": round(len(finished) / elapsed, 2) if elapsed else 0,
+        "latency": summarize_latencies([r["latency"] for r in finished]),
+        "submit_latency": summarize_latencies([r["submit_latency"] for r in results]),
+        "ok": sum(1 for r in results if r["status"] == "done" and r["report"]),
+        "cached": sum(1 for r in results if r["cached"]),
+        "errors": sum(1 for r in results if r["status"] not in ("done", "running", "queued")),
+        "timeouts": sum(1 for r in results if r["status"] in ("running", "queued")),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AI pipeline against a mock Ollama server")
+    parser.add_argument("scenario", choices=["detector", "report"])
+    parser.add_argument("--requests", type=int, default=50, help="detector: 窗口访问总数；report: 任务数")
+    parser.add_argument("--concurrency", type=int, default=2, help="并发的 worker 数 / 并发请求数")
+    parser.add_argument("--windows", type=int, default=50, help="detector 场景每个 worker 轮换的窗口数")
+    parser.add_argument("--dwell", type=float, default=None,
+                        help="detector 场景每个窗口停留的虚拟秒数，默认最大去抖时间 + 1")
+    parser.add_argument("--db-dir", help="压测使用的数据库目录，默认新建临时目录")
+    parser.add_argument("--empty-db", action="store_true", help="report 场景不复制真实数据库")
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--job-timeout", type=float, default=300.0, help="report 场景单个任务的最长等待 (秒)")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="report 场景轮询任务状态的间隔 (秒)")
+    parser.add_argument("--latency", default="lognormal:-0.7,0.6")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--client-timeout", type=float, default=10.0)
+    parser.add_argument("--llm-concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    mock = start_mock_server(latency=args.latency, error_rate=args.error_rate, hang_rate=args.hang_rate,
+                             hang_seconds=args.client_timeout * 2, seed=args.seed)
+    _configure_env(mock, args, _prepare_db_dir(args))
+    from app.data import init_db
+    init_db()
+    try:
+        result = bench_detector(args) if args.scenario == "detector" else bench_report(args)
+    finally:
+        mock.stop()
+    result["server"] = dict(mock.stats)
+
+    from app.service.ai.circuit_breaker import breaker_snapshots
+    result["breakers"] = breaker_snapshots()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        lat = result["latency"]
+        print(f"[{result['scenario']}] {lat['count']} calls in {result['elapsed']}s "
+              f"({result['throughput_per_s']}/s), timeouts={result['timeouts']}")
+        print(f"  latency p50={lat['p50']}s p95={lat['p95']}s p99={lat['p99']}s max={lat['max']}s")
+        for key in ("sources", "decisions", "submit_latency", "ok", "cached", "errors", "server", "breakers"):
+            if key in result:
+                print(f"  {key}: {result[key]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
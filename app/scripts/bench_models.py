@@ -0,0 +1,71 @@
+"""
+检测模型离线基准：用自己的 window_sessions 样本评测本地已安装的模型，
+输出延迟分位数、tokens/s、JSON 有效率和与标签的一致率，并保存到 model_benchmarks
+(模型选择窗口据此排序/预选)。
+
+示例：
+    python app/scripts/bench_models.py                       # 评测全部已安装模型
+    python app/scripts/bench_models.py --models qwen2.5:7b llama3.1:8b --samples 90
+    python app/scripts/bench_models.py --no-save --json
+"""
+
+import sys
+import os
+import json
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+
+def list_installed_models(base_url):
+    import requests
+    resp = requests.get(f"{base_url}/api/tags", timeout=5)
+    resp.raise_for_status()
+    return [m['name'] for m in resp.json().get('models', [])]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark installed Ollama models on labeled window sessions")
+    parser.add_argument("--models", nargs="*", help="要评测的模型，默认全部已安装模型")
+    parser.add_argument("--samples", type=int, default=60, help="样本数 (按状态分层)")
+    parser.add_argument("--days", type=int, default=30, help="只从最近 N 天的会话中抽样")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单次请求超时 (秒)")
+    parser.add_argument("--base-url", default=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'))
+    parser.add_argument("--no-save", action="store_true", help="不写入 model_benchmarks")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    from app.data import init_db
+    from app.data.dao.system_dao import ModelBenchmarkDAO
+    from app.service.ai.model_benchmark import load_labeled_samples, benchmark_model, rank_results, describe_result
+
+    init_db()
+    samples = load_labeled_samples(args.samples, args.days)
+    if not samples:
+        print("没有可用的已标注会话，请先运行一段时间或扩大 --days")
+        return 1
+    models = args.models or list_installed_models(args.base_url)
+    if not models:
+        print("没有可评测的模型")
+        return 1
+    print(f"样本 {len(samples)} 条，模型 {len(models)} 个")
+
+    results = []
+    for model in models:
+        print(f"评测 {model} ...")
+        result = benchmark_model(model, samples, base_url=args.base_url, timeout=args.timeout)
+        results.append(result)
+        if not args.no_save:
+            ModelBenchmarkDAO.save(result)
+
+    ranked = rank_results(results)
+    if args.json:
+        print(json.dumps(ranked, ensure_ascii=False, indent=2))
+    else:
+        for i, r in enumerate(ranked, 1):
+            print(f"{i}. {r['model']}: {describe_result(r)} (errors={r['errors']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+跨日分割回归检查
+用固定时钟从 23:50:30 起每分钟写入一次同一窗口的 work 记录，持续 40 分钟，
+在临时数据库中检查：
+- window_sessions 被午夜切为两条 (昨天的结束于 00:00:00，今天的从 00:00:00 开始)
+- daily_stats 两天的专注时长与会话时长一致
+失败时退出码为 1。
+
+    python app/scripts/check_midnight_split.py
+"""
+
+import os
+import sys
+import json
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+
+def run_check(start="2024-06-01 23:50:30", ticks=40):
+    from app.core.clock import FrozenClock
+    from app.data import init_db, get_db_connection
+    from app.data.services.history_service import ActivityHistoryManager
+
+    init_db()
+    clock = FrozenClock(datetime.strptime(start, "%Y-%m-%d %H:%M:%S").timestamp())
+    history = ActivityHistoryManager(clock=clock)
+    raw = json.dumps({"window": "main.py - VS Code", "process": "Code.exe"}, ensure_ascii=False)
+    for _ in range(ticks):
+        history.update("work", summary="编辑代码", raw_data=raw)
+        clock.advance(60)
+
+    with get_db_connection() as conn:
+        sessions = [dict(r) for r in conn.execute(
+            'SELECT start_time, end_time, duration FROM window_sessions ORDER BY id')]
+        daily = {str(r['date']): r['total_focus_time'] for r in conn.execute(
+            'SELECT date, total_focus_time FROM daily_stats ORDER BY date')}
+
+    errors = []
+    if len(sessions) != 2:
+        errors.append(f"expected 2 sessions, got {len(sessions)}: {sessions}")
+    else:
+        first, second = sessions
+        if not str(first['end_time']).endswith("00:00:00"):
+            errors.append(f"first session should end at midnight: {first}")
+        if str(second['start_time'])[:10] == str(first['start_time'])[:10]:
+            errors.append(f"second session should start on the next day: {second}")
+        for sess in sessions:
+            day = str(sess['start_time'])[:10]
+            if daily.get(day) != sess['duration']:
+                errors.append(f"daily_stats[{day}]={daily.get(day)} != session duration {sess['duration']}")
+    return sessions, daily, errors
+
+
+def main():
+    os.environ['FLOW_DB_DIR'] = tempfile.mkdtemp(prefix="flow_midnight_")
+    sessions, daily, errors = run_check()
+    for sess in sessions:
+        print(f"  {sess['start_time']} -> {sess['end_time']} ({sess['duration']}s)")
+    for day, focus in daily.items():
+        print(f"  {day} focus={focus}s")
+    if errors:
+        for e in errors:
+            print(f"FAIL: {e}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
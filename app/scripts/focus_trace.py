@@ -0,0 +1,175 @@
+"""
+焦点轨迹录制与回放
+- record: 在后台轮询前台窗口，把焦点切换写入轨迹文件 (NDJSON，.gz 结尾则压缩)，Ctrl+C 结束
+- replay: 启动本地模拟 Ollama，用 ReplayClock 驱动监控 worker 按虚拟时间跑完整条轨迹，
+          结果写入独立的数据库目录 (不影响真实数据)，最后输出会话/每日统计汇总和结果指纹。
+          指纹只取决于轨迹内容，与 --speed 无关，可用于对比改动前后的行为。
+
+示例：
+    python app/scripts/focus_trace.py record --out traces/2024-06-01.ndjson.gz
+    python app/scripts/focus_trace.py replay --trace traces/2024-06-01.ndjson.gz --speed 1000
+    python app/scripts/focus_trace.py replay --trace traces/2024-06-01.ndjson.gz --speed 0 --json
+"""
+
+import sys
+import os
+import json
+import time
+import queue
+import hashlib
+import argparse
+import tempfile
+import threading
+import contextlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+
+def record(args):
+    from app.service.detector.focus_trace import FocusTraceRecorder
+    recorder = FocusTraceRecorder(args.out, interval=args.interval).start()
+    print(f"Recording focus changes to {args.out} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.stop()
+    print(f"Recorded {recorder.count} events")
+    return 0
+
+
+def _configure_env(args, mock, db_dir):
+    """必须在导入 app.data / 检测器模块之前设置"""
+    os.environ['FLOW_DB_DIR'] = db_dir
+    os.environ['OLLAMA_BASE_URL'] = mock.base_url
+    os.environ['OLLAMA_MODEL'] = mock.models[0]
+    os.environ['FLOW_DETECTOR_FALLBACK_MODEL'] = ""
+    # 预分类依赖模型空闲的真实时间，回放时关闭以保证结果确定
+    os.environ['FLOW_SPECULATION_ENABLED'] = "0"
+    # 轨迹里没有键鼠输入：不监听真实输入，空闲检测也会把整段回放判为离开
+    os.environ['FLOW_INPUT_TRACKING'] = "0"
+    os.environ['FLOW_IDLE_DETECTION'] = "0"
+    os.environ['FLOW_SCREENSHOTS'] = "0"
+
+
+def _digest(conn):
+    """会话与每日统计的指纹 (按 id/日期排序)"""
+    h = hashlib.sha1()
+    for row in conn.execute('''SELECT start_time, end_time, window_title, process_name, status, duration, summary
+                               FROM window_sessions ORDER BY id'''):
+        h.update(repr(tuple(row)).encode('utf-8'))
+    for row in conn.execute('SELECT * FROM daily_stats ORDER BY date'):
+        h.update(repr(tuple(row)).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _summarize(clock_elapsed, wall, messages):
+    from app.data.core.database import get_db_connection
+    with get_db_connection() as conn:
+        by_status = {row['status']: {"sessions": row['n'], "duration": row['total']} for row in conn.execute(
+            'SELECT status, COUNT(*) AS n, SUM(duration) AS total FROM window_sessions GROUP BY status ORDER BY status')}
+        daily = [dict(row) for row in conn.execute(
+            'SELECT date, total_focus_time, total_entertainment_time, max_focus_streak, willpower_wins '
+            'FROM daily_stats ORDER BY date')]
+        for d in daily:
+            d['date'] = str(d['date'])
+        logs = conn.execute('SELECT COUNT(*) FROM activity_logs').fetchone()[0]
+        return {
+            "simulated_seconds": int(clock_elapsed),
+            "wall_seconds": round(wall, 2),
+            "ui_messages": messages,
+            "activity_logs": logs,
+            "sessions": by_status,
+            "daily_stats": daily,
+            "digest": _digest(conn),
+        }
+
+
+def replay(args):
+    from app.service.ai.mock_ollama import start_mock_server
+
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix="flow_replay_")
+    if os.path.exists(os.path.join(db_dir, 'focus_app.db')):
+        print(f"{db_dir} already contains focus_app.db, use an empty directory")
+        return 1
+    os.makedirs(db_dir, exist_ok=True)
+
+    canned = None
+    if args.canned:
+        with open(args.canned, encoding="utf-8") as f:
+            canned = json.load(f)
+    mock = start_mock_server(latency="const:0", canned=canned)
+    _configure_env(args, mock, db_dir)
+
+    from app.core.clock import ReplayClock, install_clock
+    from app.data import init_db
+    from app.service.detector.focus_trace import read_trace, replay_source
+    from app.service.monitor_service import ai_monitor_worker
+
+    header, events = read_trace(args.trace)
+    if not events:
+        print("Trace is empty")
+        return 1
+    started_at = header.get("started_at") or events[0]["t"]
+    started_at = min(started_at, events[0]["t"])
+
+    running = threading.Event()
+    running.set()
+    clock = ReplayClock(started_at, speed=args.speed, stop_at=events[-1]["t"] + args.tail, on_stop=running.clear)
+    install_clock(clock)
+    source = replay_source(events, clock, started_at=started_at)
+    msg_queue = queue.Queue()
+
+    init_db()
+    print(f"Replaying {len(events)} events ({int(events[-1]['t'] - started_at)}s) into {db_dir} at "
+          f"{'max' if not args.speed else f'{args.speed:g}x'} speed")
+    wall_start = time.time()
+    try:
+        # worker 每个虚拟秒都会打印日志，默认丢弃
+        with open(os.devnull, "w", encoding="utf-8") as devnull, \
+                contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            ai_monitor_worker(msg_queue, running, window_source=source)
+    finally:
+        mock.stop()
+    result = _summarize(clock.elapsed(), time.time() - wall_start, msg_queue.qsize())
+    result["db_dir"] = db_dir
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(f"Simulated {result['simulated_seconds']}s in {result['wall_seconds']}s, "
+              f"{result['activity_logs']} logs, {result['ui_messages']} UI messages")
+        for status, s in result["sessions"].items():
+            print(f"  {status:<14} {s['sessions']:>5} sessions {s['duration']:>7}s")
+        for d in result["daily_stats"]:
+            print(f"  {d['date']} focus={d['total_focus_time']}s entertainment={d['total_entertainment_time']}s "
+                  f"max_streak={d['max_focus_streak']}s willpower={d['willpower_wins']}")
+        print(f"  digest {result['digest']}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record or replay focus-change traces")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("record", help="录制焦点切换")
+    p.add_argument("--out", required=True, help="轨迹文件 (.ndjson 或 .ndjson.gz)")
+    p.add_argument("--interval", type=float, default=1.0, help="轮询间隔 (秒)")
+
+    p = sub.add_parser("replay", help="按虚拟时间回放轨迹")
+    p.add_argument("--trace", required=True)
+    p.add_argument("--speed", type=float, default=0.0, help="回放倍速 (1=实时，1000=千倍速，0=不等待)")
+    p.add_argument("--tail", type=float, default=60.0, help="最后一个事件之后继续运行的秒数")
+    p.add_argument("--db-dir", help="回放使用的数据库目录 (须为空)，默认新建临时目录")
+    p.add_argument("--canned", help="模拟 Ollama 的固定回复 JSON 文件：{\"提示词子串\": \"回复\"}")
+    p.add_argument("--verbose", action="store_true", help="输出 worker 日志")
+    p.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+
+    args = parser.parse_args(argv)
+    return record(args) if args.command == "record" else replay(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from app.data.dao.activity_dao import WindowSessionDAO
+from app.data.dao.stats_calculator import calculate_period_stats
+from app.service.detector.detector_logic import analyze_batch, map_status
+
+def reclassify_recent_sessions(days=30, dry_run=False):
+    """
+    使用批量分类接口重新分类最近 N 天的窗口会话。
+    相同 (进程, 标题) 的会话只分析一次，一个月的数据通常只需要几次 LLM 调用。
+    """
+    end_dt = datetime.now()
+    start_dt = (end_dt - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    sessions = WindowSessionDAO.get_sessions_between(
+        start_dt.strftime("%Y-%m-%d %H:%M:%S"), end_dt.strftime("%Y-%m-%d %H:%M:%S")
+    )
+    print(f"Found {len(sessions)} sessions between {start_dt.date()} and {end_dt.date()}")
+    if not sessions:
+        return
+
+    # 1. 按 (进程, 标题) 去重，时长取累计值
+    unique = {}
+    for s in sessions:
+        key = (s.get('process_name') or '', s.get('window_title') or '')
+        if key not in unique:
+            unique[key] = {"process_name": key[0], "window_title": key[1], "duration": 0, "ids": []}
+        unique[key]["duration"] += s.get('duration') or 0
+        unique[key]["ids"].append(s['id'])
+    items = list(unique.values())
+    print(f"Unique windows: {len(items)}")
+
+    # 2. 批量分类
+    results = analyze_batch(items)
+
+    # 3. 回写
+    updates = []
+    touched_dates = set()
+    failed = 0
+    by_id = {s['id']: s for s in sessions}
+    for item, res in zip(items, results):
+        if not res:
+            failed += 1
+            continue
+        status = map_status(res.get("状态", ""), item["window_title"])
+        summary = res.get("活动摘要") or f"使用 {item['process_name']}"
+        for sid in item["ids"]:
+            updates.append((status, summary, sid))
+            touched_dates.add(str(by_id[sid]['start_time'])[:10])
+
+    print(f"Classified {len(items) - failed}/{len(items)} windows, {len(updates)} sessions to update")
+    if dry_run or not updates:
+        return
+
+    WindowSessionDAO.update_sessions_classification(updates)
+    for d_str in sorted(touched_dates):
+        calculate_period_stats(d_str)
+    print("Reclassification complete.")
+
+if __name__ == "__main__":
+    reclassify_recent_sessions(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
@@ -3,10 +3,9 @@ import multiprocessing
 import time
 from flask import Flask, render_template, jsonify, request
 from flask_cors import CORS
-import concurrent.futures
 
 
-def create_app(ai_busy_flag=None):
+def create_app(llm_scheduler=None):
     current_dir = os.path.dirname(os.path.abspath(__file__))
     base_dir = os.path.abspath(os.path.join(current_dir, '../../../app'))
     template_dir = os.path.join(base_dir, 'web', 'templates')
@@ -14,7 +13,16 @@ def create_app(ai_busy_flag=None):
 
     app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
     CORS(app)
-    app.config['AI_BUSY_FLAG'] = ai_busy_flag
+    if llm_scheduler is not None:
+        from app.service.ai.llm_scheduler import install_scheduler
+        install_scheduler(llm_scheduler)
+
+    # Web 进程只做探测，不负责拉起 Ollama (由主进程负责)
+    from app.service.ai.readiness import OllamaReadiness
+    ollama_readiness = OllamaReadiness(auto_start=False).start()
+
+    from app.core.single_flight import SingleFlight, fingerprint
+    chat_flight = SingleFlight("chat")
 
     @app.route('/')
     def index():
@@ -24,6 +32,24 @@ def create_app(ai_busy_flag=None):
     def health_check():
         return jsonify({'status': 'ok', 'message': 'Flow State Web Server is running'})
 
+    @app.route('/api/ai/status')
+    def ai_status():
+        """模型服务状态：后台就绪检测 + 熔断器 + 调度队列"""
+        from app.service.ai.circuit_breaker import get_circuit_breaker, breaker_snapshots
+        from app.service.ai.llm_scheduler import get_scheduler
+        model = os.getenv('OLLAMA_MODEL', 'gpt-oss:20b-cloud')
+        breaker = get_circuit_breaker(model).snapshot()
+        readiness = ollama_readiness.snapshot()
+        return jsonify({
+            "mode": "normal" if readiness["ready"] and breaker["state"] == "closed" else "degraded",
+            "model": model,
+            "readiness": readiness,
+            "breaker": breaker,
+            # 每个模型独立熔断 (含备用模型)
+            "breakers": breaker_snapshots(),
+            "scheduler": get_scheduler().status()
+        })
+
     @app.route('/api/history/scroll')
     def get_history_scroll():
         try:
@@ -108,8 +134,8 @@ def create_app(ai_busy_flag=None):
     def get_today_stats():
         try:
             from app.data.dao.activity_dao import StatsDAO
-            from datetime import date
-            summary = StatsDAO.get_daily_summary(date.today())
+            from app.core.clock import get_clock
+            summary = StatsDAO.get_daily_summary(get_clock().today())
             if not summary:
                 return jsonify({
                     "total_focus": 0,
@@ -132,140 +158,62 @@ def create_app(ai_busy_flag=None):
 
     @app.route('/api/report/generate', methods=['POST'])
     def generate_report_api():
+        """
+        提交报告任务，立即返回任务状态 (含 job_id)。
+        数据未变化时命中缓存，直接返回 status=done 和 report。
+        """
         data = request.json or {}
         days = data.get('days', 3)
-        flag = app.config.get('AI_BUSY_FLAG')
-        if flag:
-            flag.value = True
         try:
-            from app.data.web_report.report_generator import ReportGenerator
-            from app.data.dao.core_events_extractor import extract_core_events
-            from app.data.dao.stats_calculator import calculate_period_stats
-            from datetime import date, timedelta
-            try:
-                end_d = date.today()
-                start_d = end_d - timedelta(days=days - 1)
-                cur = start_d
-                while cur <= end_d:
-                    d_str = cur.strftime('%Y-%m-%d')
-                    extract_core_events(d_str)
-                    calculate_period_stats(d_str)
-                    cur += timedelta(days=1)
-            except Exception:
-                pass
-
-            from app.service.ai.langflow_client import LangflowClient
-            client = LangflowClient()
-
-            def ai_callback(context):
-                core_items = {}
-                def process_log(log):
-                    date_str = log['date']
-                    items_info = log.get('items_context', '')
-                    if not items_info and log.get('top_app'):
-                         items_info = f"[工作] {log['top_app']} - {log['title']}"
-                    if not items_info or len(items_info) <= 5:
-                        return None
-                    prompt_event = f"""
-Role: 你是一个极其敏锐的数据分析师。
-Task: 阅读用户在 {date_str} 的主要活动记录，输出当天核心事项的中文短句，使用中文逗号“，”分隔。
-Data Context:
-{items_info}
-
-Constraints:
-- 只输出一行短句，由 2~3 个短语组成，使用“，”分隔。
-- 覆盖最重要的 1-2 项工作；如有[娱乐]也要简述，但不要使用括号，直接以短语表达，例如“看B站”。
-- 不要使用句号、分号或项目符号；不要加多余说明。
-- 总字数 ≤ 30。
-- 示例："编写后端代码，调试脚本，看B站"
-"""
-                    try:
-                        res = client.call_flow('summary', prompt_event)
-                        return (date_str, res) if res else None
-                    except Exception:
-                        return None
-                with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                    for fut in concurrent.futures.as_completed([executor.submit(process_log, log) for log in context['daily_logs']]):
-                        try:
-                            r = fut.result()
-                            if r:
-                                core_items[r[0]] = r[1]
-                        except Exception:
-                            pass
-
-                peak_info = context['peak_day']
-                rows = context.get('period_stats_rows', [])
-                top_apps = context.get('top_apps', '')
-                total_focus_hours = context['total_focus_hours']
-                wins = context['willpower_wins']
-                peak_hours = []
-                summaries = []
-                frag_vals = []
-                switch_vals = []
-                for r in rows:
-                    peak_hours.append(r.get('peak_hour') or 0)
-                    s = r.get('daily_summary') or ''
-                    if s: summaries.append(s)
-                    if r.get('focus_fragmentation_ratio') is not None:
-                        frag_vals.append(r.get('focus_fragmentation_ratio'))
-                    if r.get('context_switch_freq') is not None:
-                        switch_vals.append(r.get('context_switch_freq'))
-                days_len = max(1, len(rows))
-                from collections import Counter
-                best_hour = Counter(peak_hours).most_common(1)[0][0] if peak_hours else 0
-                avg_frag = round(sum(frag_vals)/len(frag_vals), 2) if frag_vals else 0
-                avg_switch = round(sum(switch_vals)/len(switch_vals), 1) if switch_vals else 0
-                summary_join = '；'.join(summaries[:3])
-                avg_per_day = round(total_focus_hours / days_len, 1)
-                frag_state = '专注占优' if avg_frag >= 1.2 else ('碎片偏多' if avg_frag < 0.8 else '相对平衡')
-                switch_state = '切换较频繁' if avg_switch > 18 else ('切换略多' if avg_switch > 12 else '切换控制良好')
-                metrics_hint = (
-                    f"近{days_len}天平均每天专注约{avg_per_day}小时，克制分心{wins}次。"
-                    f"黄金时段多在{best_hour}点，{frag_state}；每小时切换约{avg_switch}次，尽量控制在十几次以内。"
-                )
-                prompt_enc = f"""
-Role: 你是一位洞察力敏锐且富有同理心的成长教练。
-Task: 根据用户的行为数据，写一段“致追梦者”的复盘寄语。
-Data Context:
-- 近期活动摘要：{summary_join}
-- 主要阵地（常用软件）：{top_apps}
-- 核心指标线索：{metrics_hint}
-
-请遵循以下写作指南：
-1. **看见本质**：不要机械地罗列软件名称，而是尝试解读这些工具背后的创造性活动（例如，看到 IDE 是在“构建逻辑之塔”，看到设计软件是在“描绘想象”）。
-2. **启发式反馈**：不要生硬地给建议（如“建议你...”），而是用启发式的口吻指出数据背后的改进空间或优势（例如“如果能减少碎片化的切换，你的心流体验或许会更深沉”）。
-3. **激励结语**：用一句温暖有力的话作为结尾，肯定他的每一分努力。
-
-Style:
-- 语气要自然流畅，像朋友间的深度对话，严禁使用“建议1：”、“综上所述”等公文式措辞。
-- 篇幅控制在 150 字以内。
-"""
-                encouragement = client.call_flow('enc', prompt_enc) or "AI 暂时繁忙，但数据见证了你的努力。继续加油！"
-                return {"core_items": core_items, "encouragement": encouragement}
-
-            from app.data.web_report.report_generator import ReportGenerator
-            generator = ReportGenerator()
-            report_md = generator.generate_report(days=days, ai_callback=ai_callback)
-            return jsonify({"report": report_md})
+            days = max(1, int(days))
+            from app.service.report_service import get_report_jobs
+            job = get_report_jobs().submit(days)
+            snapshot = job.snapshot()
+            return jsonify(snapshot), (200 if snapshot["status"] == "done" else 202)
         except Exception as e:
             import traceback
             traceback.print_exc()
             return jsonify({"error": str(e)}), 500
-        finally:
-            if flag:
-                flag.value = False
+
+    @app.route('/api/report/jobs/<job_id>')
+    def report_job_status(job_id):
+        """查询报告任务的进度与阶段性结果 (核心事项、寄语)，完成后包含 report"""
+        from app.service.report_service import get_report_jobs
+        job = get_report_jobs().get(job_id)
+        if job is None:
+            return jsonify({"error": "job not found"}), 404
+        return jsonify(job.snapshot())
 
     @app.route('/api/generate_report_old', methods=['POST'])
     def generate_report_old():
-        flag = app.config.get('AI_BUSY_FLAG')
-        if flag:
-            flag.value = True
-        try:
-            time.sleep(3)
-            return jsonify({"report": "今日专注效率很高，专注时长2小时..."})
-        finally:
-            if flag:
-                flag.value = False
+        time.sleep(3)
+        return jsonify({"report": "今日专注效率很高，专注时长2小时..."})
+
+    def _chat_prompt(user_msg):
+        """按问题检索全部历史中的相关会话与每日摘要 (控制在 token 预算内)，返回 (context, system_prompt)"""
+        from app.service.chat_context import build_chat_context
+        context_str = build_chat_context(user_msg)
+        system_prompt = f"""
+你是一个 Flow State 效率助手。用户正在询问关于他的工作/学习情况。
+以下是从用户历史中检索到的相关记录（作为参考）：
+{context_str}
+
+请根据上述记录回答用户的问题。如果记录中没有相关信息，请诚实回答。
+保持回答简练、友好、有建设性。不要使用 JSON 格式回复，直接输出 Markdown 文本。
+"""
+        return context_str, system_prompt
+
+    def _sse(event, data):
+        """格式化一条 Server-Sent Event"""
+        import json
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    def _sse_response(generator):
+        from flask import Response, stream_with_context
+        return Response(stream_with_context(generator), mimetype='text/event-stream', headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
 
     @app.route('/api/chat', methods=['POST'])
     def chat_with_ai():
@@ -273,41 +221,107 @@ Style:
         user_msg = data.get('message', '')
         if not user_msg:
             return jsonify({"error": "Empty message"}), 400
-        flag = app.config.get('AI_BUSY_FLAG')
-        if flag:
-            flag.value = True
         try:
-            from app.data.dao.activity_dao import ActivityDAO
-            from app.service.detector.detector_logic import analyze
-            recent_activities = ActivityDAO.get_recent_activities(limit=20)
-            lines = []
-            for act in recent_activities or []:
-                title = act.get('summary') or "未知窗口"
-                if 'raw_data' in act and act['raw_data']:
-                    try:
-                        import json
-                        rd = json.loads(act['raw_data'])
-                        title = rd.get('window', title)
-                    except Exception:
-                        pass
-                ts = act.get('timestamp')
-                lines.append(f"- [{ts}] {title} (状态: {act.get('status')})")
-            context_str = "\n".join(lines)
-            system_prompt = f"""
-你是一个 Flow State 效率助手。用户正在询问关于他的工作/学习情况。
-以下是用户最近的活动记录（作为参考）：
-{context_str}
-
-请根据上述记录回答用户的问题。如果记录中没有相关信息，请诚实回答。
-保持回答简练、友好、有建设性。不要使用 JSON 格式回复，直接输出 Markdown 文本。
-"""
-            response_text = analyze(user_msg, system_prompt=system_prompt, json_mode=False)
+            from app.service.detector.detector_logic import analyze, ai_processor
+            from app.service.ai.llm_scheduler import PRIORITY_INTERACTIVE
+            context_str, system_prompt = _chat_prompt(user_msg)
+            # 相同问题 + 相同上下文的并发请求 (多个标签页/重复提交) 只调用一次模型
+            key = fingerprint("chat", user_msg, context_str)
+            response_text, _ = chat_flight.do(key, analyze, user_msg, system_prompt=system_prompt,
+                                              json_mode=False, priority=PRIORITY_INTERACTIVE)
+            if not response_text:
+                from app.service.ai.circuit_breaker import get_circuit_breaker
+                return jsonify({
+                    "error": "AI 模型暂时不可用，请稍后再试",
+                    "breaker": get_circuit_breaker(ai_processor.client.model).snapshot()
+                }), 503
             return jsonify({"response": response_text})
         except Exception as e:
             return jsonify({"error": str(e)}), 500
-        finally:
-            if flag:
-                flag.value = False
+
+    @app.route('/api/chat/stream', methods=['POST'])
+    def chat_stream():
+        """
+        流式聊天 (SSE)：逐段转发模型输出 (event: token)，结束时发送 event: done，
+        包含完整回答、首字延迟和总耗时；浏览器断开时关闭生成器，停止向 Ollama 读取。
+        """
+        data = request.json or {}
+        user_msg = data.get('message', '')
+        if not user_msg:
+            return jsonify({"error": "Empty message"}), 400
+        from app.service.detector.detector_logic import analyze_stream, ai_processor
+        _, system_prompt = _chat_prompt(user_msg)
+
+        def events():
+            start = time.time()
+            first_token = None
+            pieces = []
+            stream = analyze_stream(user_msg, system_prompt=system_prompt)
+            try:
+                for piece in stream:
+                    if first_token is None:
+                        first_token = time.time() - start
+                    pieces.append(piece)
+                    yield _sse("token", {"text": piece})
+            finally:
+                stream.close()
+            if not pieces:
+                from app.service.ai.circuit_breaker import get_circuit_breaker
+                # last_error 按线程记录，这里与上面消费 stream 的是同一线程
+                yield _sse("error", {
+                    "error": "AI 模型暂时不可用，请稍后再试",
+                    "detail": ai_processor.client.last_error,
+                    "breaker": get_circuit_breaker(ai_processor.client.model).snapshot()
+                })
+                return
+            yield _sse("done", {
+                "response": "".join(pieces),
+                "first_token_seconds": round(first_token, 3),
+                "total_seconds": round(time.time() - start, 3)
+            })
+
+        return _sse_response(events())
+
+    @app.route('/api/report/stream')
+    def report_stream():
+        """
+        流式报告 (SSE)：提交 (或加入相同的) 报告任务并推送
+        progress (阶段/百分比/阶段性结果)、token (寄语逐段生成)、done/error (最终结果)。
+        所有订阅方断开且没有轮询方时，任务被取消。
+        """
+        from app.service.report_service import get_report_jobs
+        try:
+            days = max(1, int(request.args.get('days', 3)))
+        except ValueError:
+            return jsonify({"error": "invalid days"}), 400
+        jobs = get_report_jobs()
+        job = jobs.submit(days, keep=False)
+
+        def events():
+            with jobs.watch(job):
+                last_progress = None
+                sent = 0
+                while True:
+                    # 先读版本号再取快照，避免两者之间的更新被漏掉
+                    version = job.version
+                    snapshot = job.snapshot()
+                    partial = snapshot["partial"]
+                    draft = partial.pop("encouragement_draft", "")
+                    progress = (snapshot["stage"], snapshot["progress"])
+                    if progress != last_progress:
+                        last_progress = progress
+                        yield _sse("progress", {"job_id": job.id, "stage": progress[0],
+                                                "progress": progress[1], "partial": partial})
+                    if len(draft) > sent:
+                        yield _sse("token", {"text": draft[sent:]})
+                        sent = len(draft)
+                    if snapshot["status"] in ("done", "failed", "cancelled"):
+                        yield _sse("done" if snapshot["status"] == "done" else "error", snapshot)
+                        return
+                    if job.wait_for_change(version, timeout=15) == version:
+                        yield ": keep-alive\n\n"
+
+        return _sse_response(events())
 
     @app.route('/api/settings/autostart', methods=['GET', 'POST'])
     def autostart_setting():
@@ -416,9 +430,9 @@ Style:
     return app
 
 
-def run_server(port=5000, ai_busy_flag=None):
+def run_server(port=5000, llm_scheduler=None):
     print(f"【Web服务进程】启动 (PID: {multiprocessing.current_process().pid}) http://127.0.0.1:{port}")
-    app = create_app(ai_busy_flag)
+    app = create_app(llm_scheduler)
     app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
 
 
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 调用熔断器
+Ollama 不可达或持续超慢时，不再让每个窗口都去排队等超时：
+- closed: 正常放行，连续失败达到阈值后进入 open
+- open: 直接拒绝，调用方走降级逻辑 (缓存/规则分类)
+- half_open: 恢复等待结束后只放行一个探测请求，成功则关闭，失败则重新打开且等待时间翻倍
+每个模型一个熔断器：主模型过载打开熔断时，延迟路由切到的备用模型仍可正常调用。
+"""
+
+import os
+import time
+import threading
+
+from app.core import config
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """线程安全的三态熔断器"""
+
+    def __init__(self, failure_threshold=None, recovery_timeout=None,
+                 max_recovery_timeout=None, slow_call_seconds=None, name=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or config.BREAKER_FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or config.BREAKER_RECOVERY_TIMEOUT
+        self.max_recovery_timeout = max_recovery_timeout or config.BREAKER_MAX_RECOVERY_TIMEOUT
+        self.slow_call_seconds = slow_call_seconds or config.BREAKER_SLOW_CALL_SECONDS
+
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._current_timeout = self.recovery_timeout
+        self._probe_in_flight = False
+        self._last_error = None
+        self._last_change = time.time()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow_request(self):
+        """是否允许发起一次调用；半开状态下同一时间只放行一个探测"""
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_OPEN:
+                if time.time() - self._opened_at < self._current_timeout:
+                    return False
+                self._set_state(STATE_HALF_OPEN)
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self, latency=None):
+        """记录一次成功；过慢的调用按失败处理"""
+        if latency is not None and latency > self.slow_call_seconds:
+            self.record_failure(f"slow call ({latency:.1f}s)")
+            return
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self._current_timeout = self.recovery_timeout
+            self._last_error = None
+            if self._state != STATE_CLOSED:
+                self._set_state(STATE_CLOSED)
+
+    def record_failure(self, reason=None):
+        with self._lock:
+            self._failures += 1
+            self._last_error = reason
+            if self._state == STATE_HALF_OPEN:
+                # 探测失败：重新打开，等待时间翻倍
+                self._probe_in_flight = False
+                self._current_timeout = min(self.max_recovery_timeout, self._current_timeout * 2)
+                self._open()
+            elif self._state == STATE_CLOSED and self._failures >= self.failure_threshold:
+                self._open()
+
+    def release_probe(self):
+        """探测请求未真正到达模型 (如排队超时) 时归还探测名额"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self):
+        self._opened_at = time.time()
+        self._set_state(STATE_OPEN)
+
+    def _set_state(self, state):
+        if state != self._state:
+            label = f"[CircuitBreaker:{self.name}]" if self.name else "[CircuitBreaker]"
+            print(f"{label} {self._state} -> {state}" + (f" ({self._last_error})" if self._last_error else ""))
+            self._state = state
+            self._last_change = time.time()
+
+    def snapshot(self):
+        """当前状态快照 (推送给 UI / Web API)"""
+        with self._lock:
+            retry_in = 0
+            if self._state == STATE_OPEN:
+                retry_in = max(0, int(self._current_timeout - (time.time() - self._opened_at)))
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "retry_in": retry_in,
+                "last_error": self._last_error,
+                "since": int(self._last_change),
+            }
+
+
+# ============ 进程内全局实例 ============
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def default_breaker_model():
+    return os.getenv('OLLAMA_MODEL', 'gpt-oss:20b-cloud')
+
+def get_circuit_breaker(model=None):
+    """当前进程内某个模型的熔断器；model 为空时取默认模型 (OLLAMA_MODEL)"""
+    model = model or default_breaker_model()
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(name=model)
+        return breaker
+
+def breaker_snapshots():
+    """已创建的全部熔断器状态 {模型: 快照}"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {model: breaker.snapshot() for model, breaker in breakers.items()}
@@ -1,31 +1,158 @@
 import os
+import time
+import threading
 import requests
 import json
 
+from app.core import config
+from app.service.ai.circuit_breaker import get_circuit_breaker
+from app.service.ai.llm_scheduler import get_scheduler, priority_for_flow, LLMSchedulerTimeout, PRIORITY_NAMES
+
 class LangflowClient:
-    def __init__(self, timeout: int = 180):
+    def __init__(self, timeout: int = None):
         # 按照用户要求，改为直接调用 Ollama 端口
         # 默认 Ollama 地址: http://localhost:11434
         self.ollama_base_url = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
         # 用户指定的模型: gpt-oss:20b-cloud (修正了拼写错误)
         self.model = os.getenv('OLLAMA_MODEL', 'gpt-oss:20b-cloud')
-        self.timeout = timeout
+        # 请求超时 (秒)，可通过 OLLAMA_TIMEOUT 覆盖 (基准测试时常调小)
+        self.timeout = timeout if timeout is not None else float(os.getenv('OLLAMA_TIMEOUT', 180))
+        # 同一个客户端被多个线程 (Web 请求、报告任务) 共享，错误按线程分别记录
+        self._local = threading.local()
+
+    @property
+    def last_error(self):
+        """当前线程最近一次调用的错误 (成功时为 None)"""
+        return getattr(self._local, "error", None)
 
-    def call_flow(self, flow: str, text: str):
+    @last_error.setter
+    def last_error(self, value):
+        self._local.error = value
+
+    def call_flow(self, flow: str, text: str, priority=None, model=None):
         """
         替代原本的 Langflow 调用，直接调用 Ollama。
-        参数 flow 在此处仅作记录，不再影响路由，统一使用指定模型处理。
+        参数 flow 决定默认调度优先级 (见 llm_scheduler.FLOW_PRIORITIES)，统一使用指定模型处理；
+        model 可临时指定其它模型 (如实时检测超出延迟预算时改用备用模型)。
+        所有调用都经过跨进程调度器排队，排队超时返回 None。
+        该模型的熔断器打开时直接返回 None，由调用方走降级逻辑。
         """
+        if priority is None:
+            priority = priority_for_flow(flow)
+        # 按实际调用的模型熔断：主模型熔断不影响备用模型
+        breaker = get_circuit_breaker(model or self.model)
+        if not breaker.allow_request():
+            self.last_error = "circuit open"
+            return None
+        try:
+            with get_scheduler().slot(model or self.model, priority):
+                self.last_error = None
+                start = time.time()
+                result = self._call_chat(text, model)
+                latency = time.time() - start
+        except LLMSchedulerTimeout as e:
+            breaker.release_probe()
+            print(f"[OllamaClient] Skipped {PRIORITY_NAMES[priority]} call ({flow}): {e}")
+            return None
+
+        if result is None:
+            breaker.record_failure(self.last_error or "empty response")
+        else:
+            breaker.record_success(latency)
+        return result
+
+    def stream_flow(self, flow: str, text: str, priority=None):
+        """
+        流式版本的 call_flow：逐块 yield 模型输出的文本。
+        - 调度名额和熔断判断与 call_flow 相同，名额在整个流式期间保持占用
+        - 由消费方驱动读取，消费慢时不会继续从 Ollama 读取 (背压)
+        - 消费方关闭生成器 (如浏览器断开) 时立即关闭与 Ollama 的连接，停止生成
+        失败时不抛异常，生成器直接结束，错误记录在迭代该生成器的线程的 last_error。
+        """
+        if priority is None:
+            priority = priority_for_flow(flow)
+        breaker = get_circuit_breaker(self.model)
+        if not breaker.allow_request():
+            self.last_error = "circuit open"
+            return
+        produced = False
+        outcome = None      # "ok" / "failed"；None 表示排队超时或消费方提前关闭
+        start = time.time()
+        try:
+            with get_scheduler().slot(self.model, priority):
+                self.last_error = None
+                start = time.time()
+                for piece in self._stream_chat(text):
+                    produced = True
+                    yield piece
+                outcome = "ok" if produced and not self.last_error else "failed"
+        except LLMSchedulerTimeout as e:
+            print(f"[OllamaClient] Skipped {PRIORITY_NAMES[priority]} stream ({flow}): {e}")
+            self.last_error = str(e)
+        finally:
+            if outcome == "ok":
+                breaker.record_success(time.time() - start)
+            elif outcome == "failed":
+                breaker.record_failure(self.last_error or "empty response")
+            else:
+                breaker.release_probe()
+
+    def _stream_chat(self, text: str):
+        url = f"{self.ollama_base_url}/api/chat"
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": text}
+            ],
+            "stream": True,
+            "keep_alive": config.OLLAMA_KEEP_ALIVE
+        }
+        resp = None
+        try:
+            resp = requests.post(url, json=payload, timeout=self.timeout, stream=True)
+            if resp.status_code == 404 and "not found" in resp.text.lower() and "model" in resp.text.lower():
+                print(f"[OllamaClient] Model '{self.model}' not found. Please check 'ollama list'.")
+                self.last_error = f"model '{self.model}' not found"
+                return
+            if resp.status_code == 404:
+                resp.close()
+                url = f"{self.ollama_base_url}/api/generate"
+                resp = requests.post(url, json={"model": self.model, "prompt": text, "stream": True,
+                                           "keep_alive": config.OLLAMA_KEEP_ALIVE},
+                                     timeout=self.timeout, stream=True)
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    self.last_error = str(data["error"])
+                    return
+                piece = self._extract_text(data)
+                if piece:
+                    yield piece
+                if data.get("done"):
+                    return
+        except Exception as e:
+            print(f"[OllamaClient] Error streaming from Ollama ({url}): {e}")
+            self.last_error = str(e)
+        finally:
+            if resp is not None:
+                resp.close()
+
+    def _call_chat(self, text: str, model=None):
         # 优先尝试 /api/chat 接口
         url = f"{self.ollama_base_url}/api/chat"
+        model = model or self.model
         
         # 构造 Ollama 请求
         payload = {
-            "model": self.model,
+            "model": model,
             "messages": [
                 {"role": "user", "content": text}
             ],
-            "stream": False
+            "stream": False,
+            "keep_alive": config.OLLAMA_KEEP_ALIVE
         }
 
         try:
@@ -40,12 +167,13 @@ class LangflowClient:
                 error_text = resp.text.lower()
                 # 如果是模型未找到，通常包含 "model" 和 "not found"
                 if "model" in error_text and "not found" in error_text:
-                    print(f"[OllamaClient] Model '{self.model}' not found. Please check 'ollama list'.")
+                    print(f"[OllamaClient] Model '{model}' not found. Please check 'ollama list'.")
+                    self.last_error = f"model '{model}' not found"
                     return None
                 
                 # 如果不是模型错误，可能是端点不支持，尝试 /api/generate
                 print(f"[OllamaClient] /api/chat not found (404), falling back to /api/generate...")
-                return self._call_generate_fallback(text)
+                return self._call_generate_fallback(text, model)
 
             resp.raise_for_status()
             data = resp.json()
@@ -53,17 +181,19 @@ class LangflowClient:
         except Exception as e:
             # 打印错误日志以便调试
             print(f"[OllamaClient] Error calling Ollama ({url}): {e}")
+            self.last_error = str(e)
             return None
 
-    def _call_generate_fallback(self, text: str):
+    def _call_generate_fallback(self, text: str, model=None):
         """
         回退方法：使用 /api/generate 接口
         """
         url = f"{self.ollama_base_url}/api/generate"
         payload = {
-            "model": self.model,
+            "model": model or self.model,
             "prompt": text,
-            "stream": False
+            "stream": False,
+            "keep_alive": config.OLLAMA_KEEP_ALIVE
         }
         try:
             resp = requests.post(url, json=payload, timeout=self.timeout)
@@ -72,6 +202,7 @@ class LangflowClient:
             return self._extract_text(data)
         except Exception as e:
             print(f"[OllamaClient] Fallback to /api/generate failed: {e}")
+            self.last_error = str(e)
             return None
 
     def _extract_text(self, data):
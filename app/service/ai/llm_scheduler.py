@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+跨进程 LLM 调度器
+所有进程 (AI 监控 / Web 服务) 共享一份调度状态，按优先级分配模型并发名额：
+    实时检测 (realtime) > 交互聊天 (interactive) > 批量报告 (batch)
+- 每个模型单独限制并发数 (config.LLM_MAX_CONCURRENCY / LLM_MODEL_CONCURRENCY)
+- 排队有截止时间，超时抛出 LLMSchedulerTimeout
+- 低优先级被插队达到 LLM_STARVATION_LIMIT 次后强制放行，任何类别都不会饿死
+- 每个名额记录持有者的 pid，持有者进程意外退出 (未执行 release) 时名额会被回收
+
+run.py 在主进程创建实例并传给各子进程，子进程调用 install_scheduler() 后，
+LangflowClient 的每次调用都会经过 get_scheduler()。
+"""
+
+import os
+import time
+import multiprocessing
+from contextlib import contextmanager
+
+from app.core import config
+
+PRIORITY_REALTIME = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BATCH = 2
+PRIORITY_NAMES = ("realtime", "interactive", "batch")
+
+# flow 名称到默认优先级的映射 (未列出的按 realtime 处理)
+FLOW_PRIORITIES = {
+    "detector": PRIORITY_REALTIME,
+    "chat": PRIORITY_INTERACTIVE,
+    "batch": PRIORITY_BATCH,
+    "summary": PRIORITY_BATCH,
+    "enc": PRIORITY_BATCH,
+}
+
+
+class LLMSchedulerTimeout(Exception):
+    """排队超过截止时间仍未获得模型名额"""
+
+
+def _pid_alive(pid):
+    """进程是否仍在运行 (僵尸进程视为已退出)；无法判断时按存活处理"""
+    try:
+        import psutil
+    except ImportError:
+        if os.name == "nt":
+            return True     # Windows 上 os.kill(pid, 0) 会结束目标进程，不能用来探测
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                return f.read().rpartition(b")")[2].split()[0] != b"Z"
+        except FileNotFoundError:
+            return False
+        except (OSError, IndexError):
+            pass
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+        return True
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+    except (psutil.AccessDenied, OSError):
+        return True
+
+
+class LLMScheduler:
+    """基于 multiprocessing 共享内存的优先级调度器"""
+
+    MAX_MODELS = 8          # 可同时跟踪的模型数
+    MODEL_NAME_LEN = 96     # 模型名最大字节数
+    MAX_HOLDERS = 32        # 每个模型可记录持有者 pid 的名额数 (超出部分不记录，也就无法回收)
+    REAP_INTERVAL = 1.0     # 排队时至少每隔多久检查一次持有者是否已退出 (秒)
+
+    def __init__(self, max_concurrency=None, model_limits=None, starvation_limit=None):
+        self.max_concurrency = max_concurrency or config.LLM_MAX_CONCURRENCY
+        self.model_limits = dict(config.LLM_MODEL_CONCURRENCY if model_limits is None else model_limits)
+        self.starvation_limit = starvation_limit or config.LLM_STARVATION_LIMIT
+        self.queue_timeouts = (
+            config.LLM_QUEUE_TIMEOUT_REALTIME,
+            config.LLM_QUEUE_TIMEOUT_INTERACTIVE,
+            config.LLM_QUEUE_TIMEOUT_BATCH,
+        )
+
+        n_classes = len(PRIORITY_NAMES)
+        self._cond = multiprocessing.Condition()
+        # 以下数组只在持有 _cond 时读写，因此使用无锁的共享数组
+        self._names = multiprocessing.Array('c', self.MAX_MODELS * self.MODEL_NAME_LEN, lock=False)
+        self._active = multiprocessing.Array('i', self.MAX_MODELS, lock=False)
+        self._waiting = multiprocessing.Array('i', n_classes * self.MAX_MODELS, lock=False)
+        self._skipped = multiprocessing.Array('i', n_classes * self.MAX_MODELS, lock=False)
+        # 每个已发出名额的持有者 pid (0 表示空位)
+        self._owners = multiprocessing.Array('i', self.MAX_MODELS * self.MAX_HOLDERS, lock=False)
+
+    # ---------- 模型槽位 ----------
+
+    def _slot_name(self, slot):
+        start = slot * self.MODEL_NAME_LEN
+        return bytes(self._names[start:start + self.MODEL_NAME_LEN]).rstrip(b"\0")
+
+    def _slot_for(self, model):
+        """查找或注册模型对应的槽位 (调用方需持有 _cond)"""
+        key = (model or "").encode("utf-8")[:self.MODEL_NAME_LEN - 1]
+        empty = None
+        for slot in range(self.MAX_MODELS):
+            name = self._slot_name(slot)
+            if name == key:
+                return slot
+            if not name and empty is None:
+                empty = slot
+        if empty is None:
+            # 槽位耗尽：按哈希共享计数 (仍然受并发上限约束，只是更保守)
+            return sum(key) % self.MAX_MODELS
+        start = empty * self.MODEL_NAME_LEN
+        self._names[start:start + len(key)] = key
+        return empty
+
+    # ---------- 持有者记录 (调用方需持有 _cond) ----------
+
+    def _add_owner(self, slot, pid):
+        base = slot * self.MAX_HOLDERS
+        for i in range(base, base + self.MAX_HOLDERS):
+            if self._owners[i] == 0:
+                self._owners[i] = pid
+                return
+
+    def _remove_owner(self, slot, pid):
+        base = slot * self.MAX_HOLDERS
+        for i in range(base, base + self.MAX_HOLDERS):
+            if self._owners[i] == pid:
+                self._owners[i] = 0
+                return
+
+    def _reap(self, slot):
+        """回收持有者进程已退出的名额，返回回收数量"""
+        base = slot * self.MAX_HOLDERS
+        me = os.getpid()
+        alive = {me: True}
+        reclaimed = 0
+        for i in range(base, base + self.MAX_HOLDERS):
+            pid = self._owners[i]
+            if pid == 0:
+                continue
+            if pid not in alive:
+                alive[pid] = _pid_alive(pid)
+            if not alive[pid]:
+                self._owners[i] = 0
+                if self._active[slot] > 0:
+                    self._active[slot] -= 1
+                reclaimed += 1
+        if reclaimed:
+            print(f"[LLMScheduler] 回收了 {reclaimed} 个已退出进程占用的名额 ({self._slot_name(slot).decode('utf-8', 'replace')})")
+            self._cond.notify_all()
+        return reclaimed
+
+    def _limit_for(self, model):
+        return max(1, self.model_limits.get(model, self.max_concurrency))
+
+    # ---------- 调度规则 ----------
+
+    def _idx(self, priority, slot):
+        return priority * self.MAX_MODELS + slot
+
+    def _next_class(self, slot):
+        """当前模型下一个应该获得名额的优先级：先看是否有饿死的类别，再按优先级"""
+        starving = None
+        highest = None
+        for p in range(len(PRIORITY_NAMES)):
+            i = self._idx(p, slot)
+            if self._waiting[i] <= 0:
+                continue
+            if highest is None:
+                highest = p
+            if starving is None and self._skipped[i] >= self.starvation_limit:
+                starving = p
+        return starving if starving is not None else highest
+
+    def _can_run(self, model, slot, priority):
+        if self._next_class(slot) != priority:
+            return False
+        limit = self._limit_for(model)
+        if self._active[slot] >= limit:
+            # 名额已满时才检查持有者，正常路径不做进程探测
+            self._reap(slot)
+        return self._active[slot] < limit
+
+    def acquire(self, model, priority=PRIORITY_REALTIME, timeout=None):
+        """阻塞直到获得名额；超过截止时间抛出 LLMSchedulerTimeout"""
+        if timeout is None:
+            timeout = self.queue_timeouts[priority]
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            slot = self._slot_for(model)
+            idx = self._idx(priority, slot)
+            self._waiting[idx] += 1
+            try:
+                while not self._can_run(model, slot, priority):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMSchedulerTimeout(
+                            f"{PRIORITY_NAMES[priority]} request for '{model}' waited more than {timeout:.1f}s"
+                        )
+                    # 持有者进程被杀死时不会有 notify，定期醒来重新检查
+                    self._cond.wait(min(remaining, self.REAP_INTERVAL))
+                self._active[slot] += 1
+                self._add_owner(slot, os.getpid())
+                self._skipped[idx] = 0
+                # 仍在排队的低优先级被插队一次
+                for lower in range(priority + 1, len(PRIORITY_NAMES)):
+                    lower_idx = self._idx(lower, slot)
+                    if self._waiting[lower_idx] > 0:
+                        self._skipped[lower_idx] += 1
+            finally:
+                self._waiting[idx] -= 1
+                # 排队集合变化后，其它等待者需要重新判断
+                self._cond.notify_all()
+        return slot
+
+    def release(self, model):
+        with self._cond:
+            slot = self._slot_for(model)
+            self._remove_owner(slot, os.getpid())
+            if self._active[slot] > 0:
+                self._active[slot] -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, model, priority=PRIORITY_REALTIME, timeout=None):
+        """with scheduler.slot(model, priority): ... 在名额内执行一次模型调用"""
+        self.acquire(model, priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def is_idle(self, model):
+        """该模型当前没有执行中或排队中的调用 (用于利用空闲时间做预测性分析)"""
+        with self._cond:
+            slot = self._slot_for(model)
+            self._reap(slot)
+            if self._active[slot] > 0:
+                return False
+            return all(self._waiting[self._idx(p, slot)] <= 0 for p in range(len(PRIORITY_NAMES)))
+
+    def status(self):
+        """返回各模型的占用与排队情况 (用于 Web 状态接口)"""
+        models = {}
+        with self._cond:
+            for slot in range(self.MAX_MODELS):
+                name = self._slot_name(slot)
+                if not name:
+                    continue
+                model = name.decode("utf-8", errors="replace")
+                self._reap(slot)
+                models[model] = {
+                    "active": self._active[slot],
+                    "limit": self._limit_for(model),
+                    "waiting": {
+                        PRIORITY_NAMES[p]: self._waiting[self._idx(p, slot)]
+                        for p in range(len(PRIORITY_NAMES))
+                    },
+                }
+        return models
+
+
+# ============ 进程内全局实例 ============
+
+_scheduler = None
+
+def install_scheduler(scheduler):
+    """子进程启动时安装由主进程创建的共享调度器"""
+    global _scheduler
+    _scheduler = scheduler
+
+def get_scheduler():
+    """获取当前进程使用的调度器；未安装时创建进程内实例 (单独运行脚本时)"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler()
+    return _scheduler
+
+def priority_for_flow(flow):
+    return FLOW_PRIORITIES.get(flow, PRIORITY_REALTIME)
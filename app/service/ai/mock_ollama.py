@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+本地 Ollama 模拟服务 (仅用于压测/离线调试)
+实现 /api/tags、/api/chat、/api/generate 三个接口，可配置：
+- 延迟分布：const:0.5 / uniform:0.2,2 / lognormal:0,0.5 (秒)
+- 错误率 (返回 HTTP 500) 与挂起率 (睡眠 hang_seconds 后再返回，用于触发客户端超时)
+- 流式输出 (stream=true 时按 NDJSON 逐块返回)
+- 固定回复：根据提示词内容自动生成合法的检测/批量/核心事项 JSON，也可用 JSON 文件覆盖
+
+命令行：
+    python -m app.service.ai.mock_ollama --port 11500 --latency lognormal:0,0.6 --error-rate 0.05
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ("gpt-oss:20b-cloud", "qwen2.5:3b")
+
+
+def parse_latency(spec):
+    """把延迟描述解析为无参函数，返回秒数"""
+    if callable(spec):
+        return spec
+    if spec is None or spec == "":
+        return lambda: 0.0
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    kind, _, args = str(spec).partition(":")
+    params = [float(x) for x in args.split(",") if x.strip()]
+    if kind == "const":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: random.uniform(params[0], params[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(params[0], params[1])
+    raise ValueError(f"unknown latency spec: {spec}")
+
+
+class MockResponder:
+    """根据提示词内容生成看起来像模型输出的固定回复"""
+
+    BATCH_INDEX = re.compile(r"【(\d+)】")
+
+    def __init__(self, canned=None):
+        # canned: {"子串": "回复"}，命中提示词中的子串时优先使用
+        self.canned = canned or {}
+
+    def reply(self, prompt):
+        for needle, text in self.canned.items():
+            if needle in prompt:
+                return text if isinstance(text, str) else json.dumps(text, ensure_ascii=False)
+
+        indices = [int(i) for i in self.BATCH_INDEX.findall(prompt)]
+        if indices:
+            if "核心事项" in prompt:
+                rows = [{"index": i, "核心事项": "编写后端代码，调试脚本"} for i in indices]
+            else:
+                rows = [{"index": i, "状态": "工作", "活动摘要": "处理文档"} for i in indices]
+            return json.dumps(rows, ensure_ascii=False)
+        if "致追梦者" in prompt or "鼓励" in prompt:
+            return "致追梦者：这几天的专注一点点累积起来，已经足够让人骄傲，继续保持节奏。"
+        if "JSON" in prompt or "json" in prompt:
+            return json.dumps({"状态": "工作", "活动摘要": "编辑代码", "置信度": 0.9}, ensure_ascii=False)
+        return "这是模拟服务返回的回答。"
+
+
+class MockOllamaServer:
+    """在后台线程中运行的模拟 Ollama 服务"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency="const:0", error_rate=0.0,
+                 hang_rate=0.0, hang_seconds=30.0, tokens_per_second=50.0,
+                 models=DEFAULT_MODELS, canned=None, seed=None):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.tokens_per_second = tokens_per_second
+        self.models = list(models)
+        self.responder = MockResponder(canned)
+        if seed is not None:
+            random.seed(seed)
+
+        self.stats = {"requests": 0, "errors": 0, "hangs": 0, "in_flight": 0, "max_in_flight": 0}
+        self._stats_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="MockOllama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def _track(self, key, delta=1):
+        with self._stats_lock:
+            self.stats[key] += delta
+            if key == "in_flight":
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def _send_json(self, code, obj):
+                body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/api/tags":
+                    self._send_json(200, {"models": [{"name": m, "model": m} for m in server.models]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path not in ("/api/chat", "/api/generate"):
+                    self._send_json(404, {"error": "not found"})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": "invalid json"})
+                    return
+
+                server._track("requests")
+                server._track("in_flight")
+                try:
+                    self._handle_completion(payload)
+                finally:
+                    server._track("in_flight", -1)
+
+            def _handle_completion(self, payload):
+                model = payload.get("model") or server.models[0]
+                if model not in server.models:
+                    self._send_json(404, {"error": f"model '{model}' not found"})
+                    return
+                is_chat = self.path == "/api/chat"
+                if is_chat:
+                    prompt = "\n".join(m.get("content", "") for m in payload.get("messages") or [])
+                else:
+                    prompt = payload.get("prompt", "")
+
+                if server.hang_rate and random.random() < server.hang_rate:
+                    server._track("hangs")
+                    time.sleep(server.hang_seconds)
+                if server.error_rate and random.random() < server.error_rate:
+                    server._track("errors")
+                    time.sleep(max(0.0, server.latency()) * 0.2)
+                    self._send_json(500, {"error": "mock internal error"})
+                    return
+
+                text = server.responder.reply(prompt)
+                delay = max(0.0, server.latency())
+                if payload.get("stream", True):
+                    self._stream(model, text, delay, is_chat)
+                else:
+                    time.sleep(delay)
+                    self._send_json(200, self._chunk(model, text, is_chat, done=True, delay=delay))
+
+            def _chunk(self, model, text, is_chat, done, delay=0.0):
+                data = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "done": done}
+                if is_chat:
+                    data["message"] = {"role": "assistant", "content": text}
+                else:
+                    data["response"] = text
+                if done:
+                    eval_count = max(1, len(text))
+                    data.update({
+                        "total_duration": int(delay * 1e9),
+                        "eval_count": eval_count,
+                        "eval_duration": int(eval_count / max(server.tokens_per_second, 1e-6) * 1e9),
+                    })
+                return data
+
+            def _stream(self, model, text, delay, is_chat):
+                """首字延迟为 delay 的一半，其余时间平均分配给各个分块"""
+                pieces = [text[i:i + 8] for i in range(0, len(text), 8)] or [""]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                time.sleep(delay / 2)
+                step = delay / 2 / len(pieces)
+                try:
+                    for piece in pieces:
+                        self._write_chunk(self._chunk(model, piece, is_chat, done=False))
+                        time.sleep(step)
+                    self._write_chunk(self._chunk(model, "", is_chat, done=True, delay=delay))
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _write_chunk(self, obj):
+                line = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def start_mock_server(**kwargs):
+    """启动后台模拟服务并返回实例 (端口为 0 时自动分配)"""
+    return MockOllamaServer(**kwargs).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Ollama server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", default="lognormal:0,0.5", help="const:S | uniform:A,B | lognormal:MU,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    parser.add_argument("--canned", help="JSON 文件：{\"提示词子串\": \"回复\"}")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    canned = None
+    if args.canned:
+        with open(args.canned, encoding="utf-8") as f:
+            canned = json.load(f)
+    server = MockOllamaServer(host=args.host, port=args.port, latency=args.latency,
+                              error_rate=args.error_rate, hang_rate=args.hang_rate,
+                              hang_seconds=args.hang_seconds, canned=canned, seed=args.seed)
+    print(f"Mock Ollama listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
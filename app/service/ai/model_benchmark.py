@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+检测模型离线基准
+从自己的 window_sessions 中按状态分层抽取已标注样本 (标签即会话当前的 status，
+包括重分类和手动修正后的结果)，用实时检测同一套提示词逐条发给候选模型，统计：
+    - 延迟分位数 (秒)
+    - 生成速度 tokens/s (Ollama 返回的 eval_count / eval_duration)
+    - JSON 有效率 (能解析出含“状态”的 JSON 对象)
+    - 与标签的一致率 (map_status 后比较，work/focus 视为同一类)
+结果写入 model_benchmarks，模型选择窗口据此排序并在没有历史选择时预选。
+
+不经过调度器和熔断器：离线测的是模型本身的延迟，运行时的排队与降级与此无关。
+"""
+
+import os
+import re
+import json
+import time
+
+import requests
+
+from app.core import config
+from app.core.metrics import summarize_latencies
+
+# 参与评测的标签；work 与 focus 在检测结果中无法区分，比较时合并
+LABEL_STATUSES = ("work", "focus", "entertainment")
+# JSON 有效率低于该值的模型排在最后 (输出不稳定会频繁触发降级)
+MIN_JSON_VALID_RATE = 0.9
+
+
+def _label_group(status):
+    return "work" if status in ("work", "focus") else status
+
+
+def load_labeled_samples(limit=60, days=30):
+    """
+    按状态分层抽样，同一 (进程, 标题) 只取一条。
+    Returns:
+        [{"window_title", "process_name", "duration", "label"}, ...]
+    """
+    from app.data.core.database import get_db_connection
+
+    per_status = max(1, limit // len(LABEL_STATUSES))
+    samples = []
+    with get_db_connection() as conn:
+        for status in LABEL_STATUSES:
+            rows = conn.execute('''
+                SELECT window_title, process_name, MAX(duration) AS duration, status
+                FROM window_sessions
+                WHERE status = ? AND process_name != 'Manual'
+                  AND window_title IS NOT NULL AND window_title != ''
+                  AND start_time >= datetime('now', 'localtime', ?)
+                GROUP BY process_name, window_title
+                ORDER BY RANDOM()
+                LIMIT ?
+            ''', (status, f"-{int(days)} days", per_status)).fetchall()
+            samples.extend({
+                "window_title": row['window_title'],
+                "process_name": row['process_name'],
+                "duration": row['duration'] or 0,
+                "label": row['status'],
+            } for row in rows)
+    return samples
+
+
+def parse_detector_output(text):
+    """与 AIProcessor.process 相同的 JSON 提取规则；无效时返回 None"""
+    match = re.search(r'\{.*\}', text or '', re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not data.get("状态"):
+        return None
+    return data
+
+
+def benchmark_model(model, samples, base_url=None, timeout=60, progress=None):
+    """
+    逐条评测一个模型 (串行，避免互相干扰延迟)。
+    Returns:
+        结果 dict，字段与 model_benchmarks 表一致
+    """
+    from app.service.detector.detector_logic import ai_processor, format_window_item, map_status
+
+    base_url = base_url or os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+    latencies = []
+    eval_tokens, eval_seconds = 0, 0.0
+    valid = agreed = errors = 0
+
+    for i, sample in enumerate(samples):
+        prompt = ai_processor.build_input(format_window_item(sample))
+        t0 = time.time()
+        try:
+            resp = requests.post(f"{base_url}/api/chat", json={
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "stream": False,
+                "keep_alive": config.OLLAMA_KEEP_ALIVE,
+            }, timeout=timeout)
+            resp.raise_for_status()
+            body = resp.json()
+        except Exception as e:
+            errors += 1
+            print(f"[ModelBenchmark] {model} sample {i} failed: {e}")
+            continue
+        latencies.append(time.time() - t0)
+
+        if body.get("eval_count") and body.get("eval_duration"):
+            eval_tokens += body["eval_count"]
+            eval_seconds += body["eval_duration"] / 1e9
+        text = (body.get("message") or {}).get("content") or body.get("response") or ""
+        data = parse_detector_output(text)
+        if data is not None:
+            valid += 1
+            predicted = map_status(data.get("状态"), sample["window_title"])
+            if _label_group(predicted) == _label_group(sample["label"]):
+                agreed += 1
+        if progress:
+            progress(i + 1, len(samples))
+
+    # 没有成功样本时不记录延迟 (否则 0.0 会让不可用的模型看起来最快)
+    lat = summarize_latencies(latencies) if latencies else {"p50": None, "p95": None, "p99": None}
+    total = len(samples)
+    return {
+        "model": model,
+        "samples": total,
+        "errors": errors,
+        "p50": lat["p50"],
+        "p95": lat["p95"],
+        "p99": lat["p99"],
+        "tokens_per_s": round(eval_tokens / eval_seconds, 1) if eval_seconds else None,
+        "json_valid_rate": round(valid / total, 3) if total else 0.0,
+        "agreement": round(agreed / total, 3) if total else 0.0,
+    }
+
+
+def rank_results(results):
+    """
+    排序：JSON 有效率达标的在前，其次一致率 (按 5% 分档，差距不大时不区分)，最后 p95 延迟
+    (没有延迟数据的排在最后)。
+    """
+    def key(r):
+        reliable = (r.get("json_valid_rate") or 0) >= MIN_JSON_VALID_RATE and not r.get("errors")
+        p95 = r.get("p95")
+        return (0 if reliable else 1, -int((r.get("agreement") or 0) * 20),
+                p95 if p95 is not None else float("inf"))
+    return sorted(results, key=key)
+
+
+def describe_result(r):
+    """模型选择窗口中展示的简短说明"""
+    tps = f" · {r['tokens_per_s']:.0f} tok/s" if r.get("tokens_per_s") else ""
+    p95 = f"{r['p95']:.1f}s" if r.get("p95") is not None else "n/a"
+    return (f"p95 {p95}{tps} · 一致率 {r['agreement'] * 100:.0f}%"
+            f" · JSON {r['json_valid_rate'] * 100:.0f}%")
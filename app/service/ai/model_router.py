@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+实时检测的延迟 SLO 路由 (供 monitor_service 使用)
+主模型负载高、变慢时，分类请求会在队列中堆积。这里跟踪主模型最近若干次调用的 p95：
+- 正常: 全部走主模型；滚动 p95 超过 SLO 即切换到备用模型
+- 降级: 走备用模型；每隔 probe_interval 让一次调用走主模型作为探测，
+        最近几次探测的 p95 低于 SLO × recover_ratio 才切回 (滞后，避免在预算边缘来回切换)
+未配置备用模型时只统计，不切换。
+"""
+
+import time
+import threading
+from collections import deque
+
+from app.core import config
+from app.core.metrics import percentile
+
+MODE_PRIMARY = "primary"
+MODE_FALLBACK = "fallback"
+
+
+class LatencySLORouter:
+    """按主模型滚动 p95 在主/备模型之间切换"""
+
+    def __init__(self, primary, fallback=None, slo=None, window=None, min_samples=None,
+                 probe_interval=None, recover_ratio=None, recover_samples=None):
+        self.primary = primary
+        self.fallback = fallback if fallback is not None else config.DETECTOR_FALLBACK_MODEL
+        if self.fallback == self.primary:
+            self.fallback = ""
+        self.slo = slo or config.DETECTOR_LATENCY_SLO
+        self.min_samples = min_samples or config.DETECTOR_SLO_MIN_SAMPLES
+        self.probe_interval = probe_interval or config.DETECTOR_SLO_PROBE_INTERVAL
+        self.recover_ratio = recover_ratio or config.DETECTOR_SLO_RECOVER_RATIO
+        self.recover_samples = recover_samples or config.DETECTOR_SLO_RECOVER_SAMPLES
+
+        self._lock = threading.Lock()
+        self._samples = {self.primary: deque(maxlen=window or config.DETECTOR_SLO_WINDOW)}
+        if self.fallback:
+            self._samples[self.fallback] = deque(maxlen=window or config.DETECTOR_SLO_WINDOW)
+        self._probes = deque(maxlen=self.recover_samples)
+        self._mode = MODE_PRIMARY
+        self._last_probe = 0.0
+        self._switches = 0
+        self._calls = {m: 0 for m in self._samples}
+
+    @property
+    def mode(self):
+        with self._lock:
+            return self._mode
+
+    @property
+    def serving(self):
+        """当前路由下主要承担实时分类的模型 (用于展示该模型的熔断状态)"""
+        with self._lock:
+            return self.fallback if self._mode == MODE_FALLBACK and self.fallback else self.primary
+
+    def choose(self, now=None):
+        """返回本次实时分类应使用的模型"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._mode == MODE_PRIMARY:
+                return self.primary
+            if now - self._last_probe >= self.probe_interval:
+                self._last_probe = now
+                return self.primary
+            return self.fallback
+
+    def record(self, model, latency, now=None):
+        """记录一次调用的耗时 (失败/超时的调用也应记录其实际耗时)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if model not in self._samples:
+                return
+            self._samples[model].append(latency)
+            self._calls[model] += 1
+            if model != self.primary or not self.fallback:
+                return
+            if self._mode == MODE_PRIMARY:
+                window = self._samples[self.primary]
+                p95 = percentile(list(window), 95)
+                if len(window) >= self.min_samples and p95 > self.slo:
+                    self._switch(MODE_FALLBACK, now, f"primary p95 {p95:.1f}s > SLO {self.slo:.1f}s")
+            else:
+                self._probes.append(latency)
+                p95 = percentile(list(self._probes), 95)
+                if len(self._probes) >= self.recover_samples and p95 <= self.slo * self.recover_ratio:
+                    self._switch(MODE_PRIMARY, now, f"primary probe p95 {p95:.1f}s recovered")
+
+    def _switch(self, mode, now, reason):
+        self._mode = mode
+        self._switches += 1
+        self._last_probe = now
+        self._probes.clear()
+        if mode == MODE_PRIMARY:
+            # 降级前的慢样本不再参与判断，回切后重新累计
+            self._samples[self.primary].clear()
+        target = self.fallback if mode == MODE_FALLBACK else self.primary
+        print(f"[ModelRouter] Switch to {mode} model '{target}': {reason}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self._mode,
+                "primary": self.primary,
+                "fallback": self.fallback or None,
+                "slo": self.slo,
+                "switches": self._switches,
+                "p95": {m: round(percentile(list(s), 95), 3) for m, s in self._samples.items()},
+                "calls": dict(self._calls),
+            }
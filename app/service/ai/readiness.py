@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Ollama 后台就绪检测
+替代 run.py 中阻塞启动最多 10 秒的 ensure_ollama_running：
+在后台线程中探测端口，必要时拉起 `ollama serve`，之后按固定间隔持续探测，
+供模型选择窗口、Web 状态接口等随时读取最新状态。
+"""
+
+import os
+import time
+import socket
+import threading
+import subprocess
+from urllib.parse import urlparse
+
+from app.core import config
+
+
+class OllamaReadiness:
+    """后台探测 Ollama 服务是否可用"""
+
+    STARTUP_WAIT_SECONDS = 10
+
+    def __init__(self, base_url=None, auto_start=False, probe_interval=None):
+        url = urlparse(base_url or os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'))
+        self.host = url.hostname or 'localhost'
+        self.port = url.port or 11434
+        self.auto_start = auto_start
+        self.probe_interval = probe_interval or config.OLLAMA_PROBE_INTERVAL
+
+        self.process = None          # 由本进程拉起的 ollama serve
+        self._ready = threading.Event()
+        self._checked = threading.Event()   # 首轮检测 (含自动启动等待) 已完成
+        self._stop = threading.Event()
+        self._thread = None
+        self._state = "unknown"
+        self._last_probe = 0.0
+        self._error = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="OllamaReadiness", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def probe(self):
+        """单次端口探测"""
+        try:
+            with socket.create_connection((self.host, self.port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def _set(self, ready, state, error=None):
+        self._last_probe = time.time()
+        self._state = state
+        self._error = error
+        if ready:
+            self._ready.set()
+        else:
+            self._ready.clear()
+
+    def _run(self):
+        if self.probe():
+            print("Ollama 服务检测：已在运行。")
+            self._set(True, "ready")
+        elif self.auto_start:
+            self._start_server()
+        else:
+            self._set(False, "unreachable")
+        self._checked.set()
+
+        while not self._stop.wait(self.probe_interval):
+            ok = self.probe()
+            if ok != self._ready.is_set():
+                print(f"Ollama 服务检测：{'已恢复' if ok else '连接中断'}")
+            self._set(ok, "ready" if ok else "unreachable")
+
+    def _start_server(self):
+        print("Ollama 服务检测：未运行，正在尝试后台启动...")
+        self._set(False, "starting")
+        try:
+            # 使用 CREATE_NO_WINDOW 隐藏控制台窗口 (仅限 Windows)
+            creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            self.process = subprocess.Popen(
+                ["ollama", "serve"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                creationflags=creationflags
+            )
+        except FileNotFoundError:
+            print("错误：未找到 'ollama' 命令。请确保已安装 Ollama 并添加到系统 PATH 中。")
+            self._set(False, "not_installed", "ollama command not found")
+            return
+        except Exception as e:
+            print(f"启动 Ollama 服务失败: {e}")
+            self._set(False, "unreachable", str(e))
+            return
+
+        deadline = time.time() + self.STARTUP_WAIT_SECONDS
+        while time.time() < deadline and not self._stop.is_set():
+            if self.probe():
+                print("Ollama 服务启动成功！")
+                self._set(True, "ready")
+                return
+            time.sleep(0.5)
+        print("警告：Ollama 服务启动超时，将在后台继续检测。")
+        self._set(False, "unreachable", "startup timeout")
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def is_checked(self):
+        """首轮检测是否已经完成 (无论成功与否)"""
+        return self._checked.is_set()
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def snapshot(self):
+        return {
+            "state": self._state,
+            "ready": self._ready.is_set(),
+            "host": f"{self.host}:{self.port}",
+            "last_probe": int(self._last_probe),
+            "error": self._error,
+        }
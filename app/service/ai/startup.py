@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+启动编排 (主进程使用)
+与模型选择窗口、UI 启动并行完成：
+    等待 Ollama 就绪 → 获取模型列表 → 预热上次使用的模型 (空 prompt 的 generate + keep_alive)
+用户在窗口中选了别的模型时，立即改为预热新模型：尚未开始的旧预热直接跳过，
+已在加载中的旧模型加载完成后卸载 (keep_alive=0)，不会和新模型同时占用内存。
+各阶段耗时写入 startup_timings，方便对比冷启动表现；第一次实时分类时模型已经加载完毕。
+"""
+
+import os
+import time
+import threading
+
+import requests
+
+from app.core import config
+
+LAST_MODEL_KEY = "last_model"
+DEFAULT_MODEL = "gpt-oss:20b-cloud"
+
+
+class StartupOrchestrator:
+    """后台完成就绪检测、模型列表和模型预热"""
+
+    def __init__(self, readiness, base_url=None):
+        self.readiness = readiness
+        self.base_url = base_url or os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+        self.models = []
+        self.benchmarks = {}    # {model: 最近一次离线基准结果}，用于窗口排序
+        self.last_model = None
+        self.timings = {}
+        self.error = None
+
+        self._t0 = time.time()
+        self._models_listed = threading.Event()
+        self._warm_lock = threading.Lock()     # 只保护下面的状态，不在加载请求期间持有
+        self._warmed = set()
+        self._warming = set()                   # 正在加载的模型
+        self._wanted = None                     # 用户当前选中 (或正在查看) 的模型
+        self._thread = None
+
+    # ---------- 对外接口 ----------
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="StartupOrchestrator", daemon=True)
+        self._thread.start()
+        return self
+
+    def models_listed(self):
+        """模型列表是否已经获取 (无论成功与否)"""
+        return self._models_listed.is_set()
+
+    def ranked_models(self):
+        """已安装模型按离线基准排序，未评测的保持原顺序排在后面"""
+        from app.service.ai.model_benchmark import rank_results
+        ranked = [r['model'] for r in rank_results(self.benchmarks.values()) if r['model'] in self.models]
+        return ranked + [m for m in self.models if m not in ranked]
+
+    def prewarm(self, model):
+        """用户在下拉框中切换模型时调用：提前在后台预热，不记录选择"""
+        if model and model not in self._warmed:
+            self._want(model)
+            threading.Thread(target=self._warm_when_ready, args=(model,), name="ModelWarmup", daemon=True).start()
+
+    def select_model(self, model):
+        """用户确认模型后调用：记住选择，若尚未预热则在后台预热"""
+        self.last_model = model
+        self._want(model)
+        threading.Thread(target=self._select, args=(model,), name="ModelWarmup", daemon=True).start()
+
+    # ---------- 后台流程 ----------
+
+    def _elapsed_ms(self, since):
+        return int((time.time() - since) * 1000)
+
+    def _run(self):
+        try:
+            from app.data import init_db
+            from app.data.dao.system_dao import SettingsDAO, ModelBenchmarkDAO
+            init_db()
+            self.last_model = SettingsDAO.get(LAST_MODEL_KEY)
+            self.benchmarks = ModelBenchmarkDAO.get_latest()
+        except Exception as e:
+            print(f"[Startup] Failed to load settings: {e}")
+        saved = self.last_model
+        self.last_model = self.last_model or DEFAULT_MODEL
+
+        if not self.readiness.wait_ready(config.STARTUP_READY_TIMEOUT):
+            self.error = "ollama not ready"
+            self._models_listed.set()
+            print(f"[Startup] Ollama not ready after {config.STARTUP_READY_TIMEOUT}s, skipping warm-up")
+            self._record(self.last_model)
+            return
+        self.timings["ready_ms"] = self._elapsed_ms(self._t0)
+
+        t = time.time()
+        try:
+            resp = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            resp.raise_for_status()
+            self.models = [m['name'] for m in resp.json().get('models', [])]
+        except Exception as e:
+            self.error = f"list models failed: {e}"
+            print(f"[Startup] {self.error}")
+        self.timings["tags_ms"] = self._elapsed_ms(t)
+        if not saved:
+            # 没有选过模型时，预选已安装模型中基准排名最高的
+            ranked = self.ranked_models()
+            if ranked and ranked[0] in self.benchmarks:
+                self.last_model = ranked[0]
+        self._models_listed.set()
+
+        with self._warm_lock:
+            if self._wanted is None:
+                self._wanted = self.last_model
+        model = self.last_model
+        warmed = self.warm(model)
+        self._record(model, warmed)
+        # 备用模型也提前加载，实时检测超出延迟预算切换过去时不必冷启动
+        if config.DETECTOR_FALLBACK_MODEL and config.DETECTOR_FALLBACK_MODEL in self.models:
+            self.warm(config.DETECTOR_FALLBACK_MODEL)
+
+    def _select(self, model):
+        try:
+            from app.data.dao.system_dao import SettingsDAO
+            SettingsDAO.set(LAST_MODEL_KEY, model)
+        except Exception as e:
+            print(f"[Startup] Failed to save last model: {e}")
+        self._warm_when_ready(model)
+
+    def _warm_when_ready(self, model):
+        if model not in self._warmed and self.readiness.wait_ready(config.STARTUP_READY_TIMEOUT):
+            self.warm(model)
+
+    def _want(self, model):
+        with self._warm_lock:
+            self._wanted = model
+
+    def _is_stale(self, model):
+        """用户已改选其它模型 (备用模型始终保留)；调用方需持有 _warm_lock"""
+        return self._wanted is not None and model != self._wanted and model != config.DETECTOR_FALLBACK_MODEL
+
+    def warm(self, model):
+        """加载模型到内存 (空 prompt 的 generate 只加载、不生成)；返回是否成功"""
+        with self._warm_lock:
+            if model in self._warmed:
+                return True
+            if model in self._warming or self._is_stale(model):
+                return False
+            self._warming.add(model)
+        t = time.time()
+        try:
+            resp = requests.post(
+                f"{self.base_url}/api/generate",
+                json={"model": model, "prompt": "", "stream": False, "keep_alive": config.OLLAMA_KEEP_ALIVE},
+                timeout=config.STARTUP_WARMUP_TIMEOUT
+            )
+            resp.raise_for_status()
+        except Exception as e:
+            self.error = f"warm-up failed for {model}: {e}"
+            print(f"[Startup] {self.error}")
+            with self._warm_lock:
+                self._warming.discard(model)
+            return False
+        with self._warm_lock:
+            self._warming.discard(model)
+            stale = self._is_stale(model)
+            if not stale:
+                self._warmed.add(model)
+        if stale:
+            # 加载期间用户改选了其它模型：卸载，避免两个模型同时常驻
+            print(f"[Startup] Model '{model}' no longer selected, unloading")
+            self._unload(model)
+            return False
+        self.timings["warmup_ms"] = self._elapsed_ms(t)
+        print(f"[Startup] Model '{model}' warmed in {self.timings['warmup_ms']} ms "
+              f"(ready {self.timings.get('ready_ms')} ms, tags {self.timings.get('tags_ms')} ms)")
+        return True
+
+    def _unload(self, model):
+        try:
+            requests.post(f"{self.base_url}/api/generate",
+                          json={"model": model, "prompt": "", "stream": False, "keep_alive": 0}, timeout=10)
+        except Exception as e:
+            print(f"[Startup] Failed to unload {model}: {e}")
+
+    def _record(self, model, warmed=False):
+        try:
+            from app.data.dao.system_dao import StartupTimingDAO
+            StartupTimingDAO.record(model, self.timings.get("ready_ms"), self.timings.get("tags_ms"),
+                                    self.timings.get("warmup_ms"), warmed, self.error)
+        except Exception as e:
+            print(f"[Startup] Failed to record timings: {e}")
+
+    def snapshot(self):
+        return {
+            "last_model": self.last_model,
+            "models": list(self.models),
+            "warmed": sorted(self._warmed),
+            "timings": dict(self.timings),
+            "error": self.error,
+        }
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+自适应分析节奏 (供 monitor_service 使用)
+替代固定的 “停留 > 5 秒 + 每 60 秒重新分析”：
+- 同一 (进程, 标题) 连续得到相同结果时，重新分析间隔按倍数退避
+- 快速切换窗口时拉长去抖时间，避免一连串无意义的分析
+- 模型实测延迟升高时按比例拉长所有间隔
+- 锁屏/空闲/用户暂停监控时完全暂停
+- 每小时 LLM 调用预算，超出后只复用已有结果
+"""
+
+import time
+import threading
+from collections import OrderedDict, deque
+
+from app.core import config
+
+# 决策结果
+DECISION_SKIP = "skip"          # 本轮什么都不做
+DECISION_ANALYZE = "analyze"    # 调用 LLM 分析
+DECISION_REUSE = "reuse"        # 复用该窗口上次的分析结果 (不调用 LLM)
+DECISION_PAUSE = "pause"        # 刚进入暂停状态 (锁屏/空闲)，记录一次 idle
+
+LOCK_SCREEN_TITLES = ("Lock Screen",)
+LOCK_SCREEN_PROCESSES = ("LockApp.exe",)
+
+
+def default_window_key(window_title, process_name):
+    return (process_name or "", window_title or "")
+
+
+class _WindowState:
+    __slots__ = ("interval", "last_analysis", "result", "payload", "stable_count")
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.last_analysis = 0.0
+        self.result = None
+        self.payload = None
+        self.stable_count = 0
+
+
+class AdaptiveAnalysisPolicy:
+    """根据窗口稳定性、切换频率、模型延迟和调用预算决定何时分析"""
+
+    MAX_TRACKED_WINDOWS = 512
+
+    def __init__(self, base_interval=None, max_interval=None, backoff_factor=None,
+                 debounce=None, max_debounce=None, rapid_switches=None,
+                 latency_target=None, hourly_budget=None, key_fn=None):
+        self.base_interval = base_interval or config.ANALYSIS_BASE_INTERVAL
+        self.max_interval = max_interval or config.ANALYSIS_MAX_INTERVAL
+        self.backoff_factor = backoff_factor or config.ANALYSIS_BACKOFF_FACTOR
+        self.debounce = debounce or config.ANALYSIS_DEBOUNCE
+        self.max_debounce = max_debounce or config.ANALYSIS_MAX_DEBOUNCE
+        self.rapid_switches = rapid_switches or config.ANALYSIS_RAPID_SWITCHES
+        self.latency_target = latency_target or config.ANALYSIS_LATENCY_TARGET
+        self.hourly_budget = config.LLM_CALLS_PER_HOUR if hourly_budget is None else hourly_budget
+        # 窗口键：默认 (进程, 标题)；worker 传入标题簇，计数/未保存标记变化不算切换
+        self.key_fn = key_fn or default_window_key
+
+        self._windows = OrderedDict()       # (process, title) -> _WindowState
+        self._switches = deque()            # 最近一分钟的切换时间点
+        self._calls = deque()               # 最近一小时的 LLM 调用时间点
+        self._calls_lock = threading.Lock()  # 预分类线程也会通过 try_charge() 计入预算
+        self._latency_ewma = None
+
+        self._current_key = None
+        self._current_since = 0.0
+        self._written_key = None            # 最近一次写入历史的窗口
+        self._paused = False
+        self._idle = False
+        self._suspended = False
+
+    # ---------- 外部输入 ----------
+
+    def observe(self, window_title, process_name, now=None):
+        """每轮循环调用，记录当前前台窗口 (用于去抖和切换频率统计)"""
+        now = time.time() if now is None else now
+        key = self.key_fn(window_title, process_name)
+        if key != self._current_key:
+            self._current_key = key
+            self._current_since = now
+            self._switches.append(now)
+        while self._switches and now - self._switches[0] > 60:
+            self._switches.popleft()
+
+    def set_idle(self, idle):
+        """由外部 (空闲检测) 设置用户是否离开"""
+        self._idle = bool(idle)
+
+    def set_suspended(self, suspended):
+        """由外部 (用户在界面上暂停监控) 设置是否暂停分析"""
+        self._suspended = bool(suspended)
+
+    @property
+    def suspended(self):
+        return self._suspended
+
+    def set_hourly_budget(self, budget):
+        """运行时调整每小时调用预算，0 表示不限制"""
+        self.hourly_budget = max(0, int(budget))
+
+    def record_result(self, window_title, process_name, result, payload=None, latency=None, now=None,
+                      charge=True):
+        """
+        记录一次成功分析。result 为 (状态, 摘要) 等可比较的值，
+        与上次相同则退避，不同则回到基础间隔；payload 为完整结果，供 DECISION_REUSE 时复用。
+        charge=False 表示本次没有调用模型 (如命中预分类结果，调用时已经计入预算)，只更新退避状态。
+        """
+        now = time.time() if now is None else now
+        state = self._state_for(self.key_fn(window_title, process_name))
+        if state.result is not None and state.result == result:
+            state.stable_count += 1
+            state.interval = min(self.max_interval, state.interval * self.backoff_factor)
+        else:
+            state.stable_count = 0
+            state.interval = self.base_interval
+        state.result = result
+        state.payload = payload
+        state.last_analysis = now
+        if charge:
+            self._charge(now)
+        if latency is not None:
+            self.record_latency(latency)
+
+    def record_degraded(self, window_title, process_name, payload=None, now=None):
+        """
+        记录一次降级结果 (缓存/规则分类，未真正调用模型)：
+        不计入预算，按基础间隔再尝试，恢复后的第一次模型结果不会被当作“稳定”
+        """
+        now = time.time() if now is None else now
+        state = self._state_for(self.key_fn(window_title, process_name))
+        state.result = ("degraded",)
+        state.payload = payload
+        state.stable_count = 0
+        state.interval = self.base_interval
+        state.last_analysis = now
+
+    def record_failure(self, window_title, process_name, latency=None, now=None):
+        """
+        记录一次失败的调用：同样计入预算和延迟，并推迟该窗口的下一次分析
+        (连续失败时按倍数退避)，避免模型故障时每轮都重试、很快耗尽预算
+        """
+        now = time.time() if now is None else now
+        state = self._state_for(self.key_fn(window_title, process_name))
+        if state.result == ("failed",):
+            state.interval = min(self.max_interval, state.interval * self.backoff_factor)
+        else:
+            state.interval = self.base_interval
+        # 保留上次成功的 payload，期间仍可复用
+        state.result = ("failed",)
+        state.stable_count = 0
+        state.last_analysis = now
+        self._charge(now)
+        if latency is not None:
+            self.record_latency(latency)
+
+    def try_charge(self, now=None):
+        """
+        worker 以外的模型调用 (预分类) 在调用前申请预算：
+        预算未耗尽时计入一次并返回 True，否则返回 False (不应调用模型)
+        """
+        now = time.time() if now is None else now
+        with self._calls_lock:
+            if self._exhausted_locked(now):
+                return False
+            self._calls.append(now)
+            return True
+
+    def _charge(self, now):
+        with self._calls_lock:
+            self._calls.append(now)
+
+    def record_latency(self, latency):
+        """记录一次模型调用耗时 (指数滑动平均)"""
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = 0.7 * self._latency_ewma + 0.3 * latency
+
+    def mark_written(self, window_title, process_name):
+        """worker 把结果写入历史后调用，表示该窗口已经被记录"""
+        self._written_key = self.key_fn(window_title, process_name)
+
+    def cached_payload(self, window_title, process_name):
+        state = self._windows.get(self.key_fn(window_title, process_name))
+        return state.payload if state else None
+
+    # ---------- 决策 ----------
+
+    def decide(self, window_title, process_name, now=None):
+        """返回本轮的决策 (DECISION_*)"""
+        now = time.time() if now is None else now
+        key = self.key_fn(window_title, process_name)
+
+        if self._idle or self._suspended or self.is_lock_screen(window_title, process_name):
+            if self._paused:
+                return DECISION_SKIP
+            self._paused = True
+            self._written_key = None
+            return DECISION_PAUSE
+        self._paused = False
+
+        if key != self._current_key or now - self._current_since < self.current_debounce():
+            return DECISION_SKIP
+
+        state = self._windows.get(key)
+        if state is not None:
+            self._windows.move_to_end(key)
+        due = state is None or state.result is None or \
+            now - state.last_analysis >= state.interval * self.latency_factor()
+
+        if not due:
+            # 切换回来的窗口：结果仍新鲜，直接复用
+            return DECISION_REUSE if key != self._written_key else DECISION_SKIP
+        if self.budget_exhausted(now):
+            if state is not None and state.result is not None and key != self._written_key:
+                return DECISION_REUSE
+            return DECISION_SKIP
+        return DECISION_ANALYZE
+
+    # ---------- 辅助 ----------
+
+    @staticmethod
+    def is_lock_screen(window_title, process_name):
+        return (window_title or "") in LOCK_SCREEN_TITLES or (process_name or "") in LOCK_SCREEN_PROCESSES
+
+    def current_debounce(self):
+        """快速切换时去抖时间翻倍，最多到 max_debounce"""
+        excess = len(self._switches) - self.rapid_switches
+        if excess <= 0:
+            return self.debounce
+        return min(self.max_debounce, self.debounce * (2 ** min(excess, 4)))
+
+    def latency_factor(self):
+        if not self._latency_ewma or self._latency_ewma <= self.latency_target:
+            return 1.0
+        return self._latency_ewma / self.latency_target
+
+    def budget_exhausted(self, now=None):
+        now = time.time() if now is None else now
+        with self._calls_lock:
+            return self._exhausted_locked(now)
+
+    def _exhausted_locked(self, now):
+        while self._calls and now - self._calls[0] > 3600:
+            self._calls.popleft()
+        return bool(self.hourly_budget) and len(self._calls) >= self.hourly_budget
+
+    def _state_for(self, key):
+        state = self._windows.get(key)
+        if state is None:
+            state = _WindowState(self.base_interval)
+            self._windows[key] = state
+            if len(self._windows) > self.MAX_TRACKED_WINDOWS:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(key)
+        return state
+
+    def stats(self, now=None):
+        """当前节奏参数快照 (调试/推送 UI 用)"""
+        now = time.time() if now is None else now
+        self.budget_exhausted(now)
+        return {
+            "calls_last_hour": len(self._calls),
+            "hourly_budget": self.hourly_budget,
+            "latency_ewma": round(self._latency_ewma, 2) if self._latency_ewma else None,
+            "latency_factor": round(self.latency_factor(), 2),
+            "debounce": self.current_debounce(),
+            "paused": self._paused,
+        }
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+/api/chat 的上下文构建
+替代“固定塞入最近 20 条 activity_logs”：用 BM25 在全部历史会话中检索与问题相关的记录，
+相同窗口合并为一行，再附上涉及日期的每日摘要，整体控制在 token 预算内。
+问题中没有可检索的词 (或没有命中) 时，退回最近的会话。
+"""
+
+import math
+from collections import OrderedDict
+
+from app.core import config
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩字符按 1 个计，其余按 4 个字符 1 个计"""
+    cjk = sum(1 for ch in text if '\u3400' <= ch <= '\u9fff')
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _group_sessions(sessions):
+    """相同 (进程, 标题, 摘要) 的会话合并，保持相关度顺序"""
+    groups = OrderedDict()
+    for s in sessions:
+        key = (s.get('process_name') or '', s.get('window_title') or '', s.get('summary') or '')
+        start = str(s.get('start_time') or '')
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = {"first": start, "last": start, "duration": 0, "count": 0,
+                               "status": s.get('status')}
+        g["first"] = min(g["first"], start)
+        g["last"] = max(g["last"], start)
+        g["duration"] += s.get('duration') or 0
+        g["count"] += 1
+    return groups
+
+
+def _format_group(key, g):
+    process, title, summary = key
+    first, last = g["first"][:16], g["last"][:16]
+    when = first if first == last else f"{first} ~ {last}"
+    desc = f"{title[:60]}" + (f" | {summary}" if summary and summary != title else "")
+    return (f"- [{when}] {process} | {desc} "
+            f"(状态: {g['status']}, {g['count']} 次, 共 {max(1, round(g['duration'] / 60))} 分钟)")
+
+
+def build_chat_context(question, token_budget=None, top_k=None, max_days=None):
+    """
+    Returns:
+        拼好的上下文文本 (相关会话 + 每日摘要)，不超过 token_budget
+    """
+    from app.data.dao.search_dao import SessionSearchDAO
+    from app.data.dao.activity_dao import WindowSessionDAO, StatsDAO
+    from app.data.dao.report_dao import DailySummaryDAO
+
+    token_budget = token_budget or config.CHAT_CONTEXT_TOKEN_BUDGET
+    top_k = top_k or config.CHAT_CONTEXT_TOP_K
+    max_days = max_days or config.CHAT_CONTEXT_MAX_DAYS
+
+    hits = SessionSearchDAO.search(question, limit=top_k * 10)
+    retrieved = bool(hits)
+    if not hits:
+        hits = WindowSessionDAO.get_recent_sessions(limit=top_k)
+    groups = _group_sessions(hits)
+
+    # 每日摘要：命中会话涉及的日期 (按相关度先后)，最多 max_days 天
+    dates = []
+    for s in hits:
+        d = str(s.get('start_time') or '')[:10]
+        if d and d not in dates:
+            dates.append(d)
+        if len(dates) >= max_days:
+            break
+    core_items = DailySummaryDAO.get_core_items(dates)
+
+    # 摘要最多占预算的三分之一，其余留给会话
+    summary_lines = []
+    used = 0
+    for d in sorted(dates):
+        text = core_items.get(d) or StatsDAO.get_period_summary(d).get('daily_summary') or ''
+        if not text:
+            continue
+        line = f"- {d}: {text}"
+        cost = estimate_tokens(line)
+        if used + cost > token_budget / 3:
+            break
+        summary_lines.append(line)
+        used += cost
+
+    session_lines = []
+    for key, g in list(groups.items())[:top_k]:
+        line = _format_group(key, g)
+        cost = estimate_tokens(line)
+        if used + cost > token_budget:
+            break
+        session_lines.append(line)
+        used += cost
+
+    parts = []
+    if session_lines:
+        header = "与问题相关的历史记录" if retrieved else "最近的活动记录"
+        parts.append(f"【{header}】\n" + "\n".join(session_lines))
+    if summary_lines:
+        parts.append("【相关日期的每日摘要】\n" + "\n".join(summary_lines))
+    return "\n\n".join(parts)
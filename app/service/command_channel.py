@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+UI → 监控 worker 的命令通道 (带确认)
+run.py 在主进程创建 CommandChannel，交给 worker 进程，并调用 install_command_channel() 供 UI 使用：
+- UI 调用 send_command(CMD_*, **args)，不阻塞；未安装通道时 (单独运行界面) 忽略
+- worker 每轮循环 receive() 取出全部命令，执行后 ack()
+- UI 定时 poll_acks() 取回确认；request() 可阻塞等待某条命令的确认 (脚本/调试用)
+两个方向各一个 multiprocessing.Queue，不经过文件系统。
+"""
+
+import queue
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+
+# 命令类型
+CMD_RESET_FOCUS = "reset_focus"     # 重置连续专注计时 (休息后)
+CMD_SET_MODE = "set_mode"           # 切换模式：mode = focus / recharge
+CMD_PAUSE = "pause"                 # 暂停监控：seconds 为空表示直到 resume
+CMD_RESUME = "resume"
+CMD_RECONFIGURE = "reconfigure"     # 运行时调整参数：settings = {名称: 值}
+
+COMMANDS = (CMD_RESET_FOCUS, CMD_SET_MODE, CMD_PAUSE, CMD_RESUME, CMD_RECONFIGURE)
+
+
+@dataclass(frozen=True)
+class Command:
+    id: int
+    kind: str
+    args: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Ack:
+    id: int
+    kind: str
+    ok: bool
+    result: object = None
+    error: str = None
+
+
+class CommandChannel:
+    """命令队列 (UI → worker) + 确认队列 (worker → UI)"""
+
+    def __init__(self, ctx=None):
+        ctx = ctx or multiprocessing
+        self._commands = ctx.Queue()
+        self._acks = ctx.Queue()
+        self._init_local()
+
+    def _init_local(self):
+        # 仅在发送方进程内有意义的状态，不随通道传给子进程
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._pending = {}      # 已收到但尚未被取走的确认 (request() 等待时暂存)
+
+    def __getstate__(self):
+        return {"_commands": self._commands, "_acks": self._acks}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_local()
+
+    # ---------- UI 侧 ----------
+
+    def send(self, kind, **args):
+        """发送命令，返回命令 id"""
+        if kind not in COMMANDS:
+            raise ValueError(f"Unknown command: {kind}")
+        with self._lock:
+            command_id = self._next_id
+            self._next_id += 1
+        self._commands.put(Command(command_id, kind, args))
+        return command_id
+
+    def poll_acks(self):
+        """取出目前收到的全部确认"""
+        with self._lock:
+            acks = list(self._pending.values())
+            self._pending.clear()
+        while True:
+            try:
+                acks.append(self._acks.get_nowait())
+            except queue.Empty:
+                return acks
+
+    def request(self, kind, timeout=2.0, **args):
+        """发送命令并等待其确认；超时返回 None"""
+        command_id = self.send(kind, **args)
+        try:
+            while True:
+                with self._lock:
+                    if command_id in self._pending:
+                        return self._pending.pop(command_id)
+                ack = self._acks.get(timeout=timeout)
+                if ack.id == command_id:
+                    return ack
+                with self._lock:
+                    self._pending[ack.id] = ack
+        except queue.Empty:
+            return None
+
+    # ---------- worker 侧 ----------
+
+    def receive(self):
+        """取出全部待执行命令 (不阻塞)"""
+        commands = []
+        while True:
+            try:
+                commands.append(self._commands.get_nowait())
+            except queue.Empty:
+                return commands
+
+    def ack(self, command, ok=True, result=None, error=None):
+        self._acks.put(Ack(command.id, command.kind, ok, result, error))
+
+
+_channel = None
+
+def install_command_channel(channel):
+    """主进程 (UI) 安装由 run.py 创建的命令通道"""
+    global _channel
+    _channel = channel
+
+def get_command_channel():
+    return _channel
+
+def send_command(kind, **args):
+    """UI 发送命令；未安装通道时返回 None"""
+    if _channel is None:
+        return None
+    try:
+        return _channel.send(kind, **args)
+    except Exception as e:
+        print(f"[CommandChannel] 发送命令失败 ({kind}): {e}")
+        return None
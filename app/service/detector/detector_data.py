@@ -1,12 +1,6 @@
 import time
+import math
 import traceback
-try:
-    from app.service.detector import detector_logic as AI
-except ImportError:
-    try:
-        import detector_logic as AI
-    except ImportError:
-        pass # Fallback or handle later if AI is strictly required
 
 from collections import defaultdict
 from contextlib import contextmanager
@@ -16,21 +10,11 @@ from typing import Iterator, Tuple, Optional, Dict, List
 import threading
 from threading import Event
 
-# 鼠标键盘检测相关
-import pynput
-from pynput import mouse, keyboard
-
-# 焦点识别相关
-import win32gui
-import win32process
-import psutil
+# 平台相关的库 (pynput 等) 均在使用处延迟导入，焦点窗口来源见 window_source.py，
+# 截图见 screenshot.py，非 Windows 平台也能导入整个监控链路
 
-#焦点截图相关
-import os
-from datetime import datetime
-from PIL import ImageGrab
-import ctypes
-from ctypes import wintypes
+from app.service.detector.focus_sampler import get_focus_sampler
+from app.service.detector.input_activity import InputActivity
 
 # ============ 通用工具函数 ============
 
@@ -53,25 +37,6 @@ class EventType:
     KEY_RELEASE = "KEY_RELEASE"
     FOCUS_CHANGE = "FOCUS_CHANGE"
 
-@dataclass
-class MouseEvent:
-    event_type: str
-    x: int
-    y: int
-    button: Optional[str] = None
-    dx: Optional[int] = None
-    dy: Optional[int] = None
-    pressed: Optional[bool] = None
-    distance: Optional[float] = None   # ⭐ 新增：与上一次移动的距离
-    timestamp: float = field(default_factory=time.time)
-
-@dataclass
-class KeyboardEvent:
-    """键盘事件"""
-    event_type: str
-    key: str
-    timestamp: float = field(default_factory=time.time)
-
 @dataclass
 class FocusEvent:
     window_title: str
@@ -83,60 +48,40 @@ class FocusEvent:
 # ============ 鼠标检测函数 ============
 
 class MouseDetector:
-    """鼠标事件检测器"""
+    """鼠标事件检测器 (只做按秒聚合，不保留原始事件)"""
     
-    def __init__(self):
+    def __init__(self, activity: Optional[InputActivity] = None):
+        """
+        Args:
+            activity: 聚合缓冲，可与 KeyboardDetector 共用；默认新建
+        """
         self._mouse_listener = None
-        self._mouse_events = []
-        self._lock = threading.Lock()
+        self.activity = activity if activity is not None else InputActivity()
         self._running = False
         self._last_pos = None
         
     def _on_move(self, x, y):
-        with self._lock:
-            distance = None
-
-            if self._last_pos is not None:
-                last_x, last_y = self._last_pos
-                dx = x - last_x
-                dy = y - last_y
-                distance = (dx ** 2 + dy ** 2) ** 0.5
-
-            self._last_pos = (x, y)
-
-            self._mouse_events.append(MouseEvent(
-                event_type=EventType.MOUSE_MOVE,
-                x=x,
-                y=y,
-                distance=distance
-            ))
-
+        """鼠标移动事件：累加移动次数与距离"""
+        distance = 0.0
+        last = self._last_pos
+        if last is not None:
+            distance = math.hypot(x - last[0], y - last[1])
+        self._last_pos = (x, y)
+        self.activity.record_move(distance)
     
     def _on_click(self, x, y, button, pressed):
-        """鼠标点击事件"""
-        with self._lock:
-            self._mouse_events.append(MouseEvent(
-                event_type=EventType.MOUSE_CLICK,
-                x=x,
-                y=y,
-                button=str(button).split('.')[-1],  # 例如: "left", "right"
-                pressed=pressed
-            ))
+        """鼠标点击事件 (只统计按下)"""
+        if pressed:
+            self.activity.record_click()
     
     def _on_scroll(self, x, y, dx, dy):
         """鼠标滚轮事件"""
-        with self._lock:
-            self._mouse_events.append(MouseEvent(
-                event_type=EventType.MOUSE_SCROLL,
-                x=x,
-                y=y,
-                dx=dx,
-                dy=dy
-            ))
+        self.activity.record_scroll()
     
     def start(self):
         """启动鼠标检测"""
         try:
+            from pynput import mouse
             self._running = True
             self._mouse_listener = mouse.Listener(
                 on_move=self._on_move,
@@ -149,12 +94,9 @@ class MouseDetector:
             print(f"启动鼠标检测失败: {e}")
             return False
     
-    def get_events(self) -> List[MouseEvent]:
-        """获取所有鼠标事件"""
-        with self._lock:
-            events = self._mouse_events.copy()
-            self._mouse_events.clear()
-        return events
+    def get_activity(self, seconds: int = 60) -> Dict:
+        """最近 seconds 秒的鼠标/键盘聚合计数"""
+        return self.activity.totals(seconds)
     
     def stop(self):
         """停止鼠标检测"""
@@ -166,68 +108,36 @@ class MouseDetector:
 # ============ 键盘检测函数 ============
 
 class KeyboardDetector:
-    """键盘事件检测器"""
+    """键盘事件检测器 (只统计按键次数，不记录按键内容)"""
     
-    def __init__(self):
+    def __init__(self, activity: Optional[InputActivity] = None):
+        """
+        Args:
+            activity: 聚合缓冲，可与 MouseDetector 共用；默认新建
+        """
         self._keyboard_listener = None
-        self._keyboard_events = []
-        self._lock = threading.Lock()
+        self.activity = activity if activity is not None else InputActivity()
         self._running = False
     
     def _on_press(self, key):
         """按键按下事件"""
-        with self._lock:
-            try:
-                key_str = str(key).replace("'", "")
-                if hasattr(key, 'char') and key.char:
-                    key_str = key.char
-                elif hasattr(key, 'name'):
-                    key_str = key.name
-                
-                self._keyboard_events.append(KeyboardEvent(
-                    event_type=EventType.KEY_PRESS,
-                    key=key_str
-                ))
-            except Exception as e:
-                print(f"处理按键事件出错: {e}")
-    
-    def _on_release(self, key):
-        """按键释放事件"""
-        with self._lock:
-            try:
-                key_str = str(key).replace("'", "")
-                if hasattr(key, 'char') and key.char:
-                    key_str = key.char
-                elif hasattr(key, 'name'):
-                    key_str = key.name
-                
-                self._keyboard_events.append(KeyboardEvent(
-                    event_type=EventType.KEY_RELEASE,
-                    key=key_str
-                ))
-            except Exception as e:
-                print(f"处理按键释放事件出错: {e}")
+        self.activity.record_key()
     
     def start(self):
         """启动键盘检测"""
         try:
+            from pynput import keyboard
             self._running = True
-            self._keyboard_listener = keyboard.Listener(
-                on_press=self._on_press,
-                on_release=self._on_release
-            )
+            self._keyboard_listener = keyboard.Listener(on_press=self._on_press)
             self._keyboard_listener.start()
             return True
         except Exception as e:
             print(f"启动键盘检测失败: {e}")
             return False
     
-    def get_events(self) -> List[KeyboardEvent]:
-        """获取所有键盘事件"""
-        with self._lock:
-            events = self._keyboard_events.copy()
-            self._keyboard_events.clear()
-        return events
+    def get_activity(self, seconds: int = 60) -> Dict:
+        """最近 seconds 秒的鼠标/键盘聚合计数"""
+        return self.activity.totals(seconds)
     
     def stop(self):
         """停止键盘检测"""
@@ -239,228 +149,81 @@ class KeyboardDetector:
 # ============ 焦点识别函数 ============
 
 class FocusDetector:
-    """焦点窗口检测器"""
+    """焦点窗口检测器 (基于进程内共享的 FocusSampler，不再单独轮询窗口)"""
     
-    def __init__(self, check_interval: float = 60.0):
+    def __init__(self, check_interval: float = None, source=None):
         """
         初始化焦点检测器
         
         Args:
-            check_interval: 检测间隔(秒)
+            check_interval: 采样间隔(秒)，默认 FLOW_FOCUS_SAMPLE_INTERVAL；只在首次创建共享采样器时生效
+            source: 焦点窗口来源 (WindowSource)，默认按平台/配置创建
         """
-        self.check_interval = check_interval
-        self._last_focus_info = None
-        self._running = False
-        self._lock = threading.Lock()
-        self._focus_events = []
-        self._thread = None
-        self._stop_event = Event()
-        self._focus_start_time = None
-        #截图
-        self._last_screenshot_time = 0
-        self.screenshot_interval = 5  # 秒
-        # os.makedirs("screenshot", exist_ok=True)
-    
-    def _get_active_window_info(self) -> Optional[Dict]:
-        """获取当前活动窗口信息"""
-        try:
-            # 获取前台窗口句柄
-            hwnd = win32gui.GetForegroundWindow()
-            if not hwnd:
-                # 锁屏或无焦点时，返回特定标记
-                return {
-                    "window_title": "Lock Screen",
-                    "process_name": "LockApp.exe",
-                    "process_id": 0,
-                    "hwnd": 0
-                }
-            
-            # 获取窗口标题
-            window_title = win32gui.GetWindowText(hwnd)
-            
-            # 获取进程ID
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            
-            # 获取进程信息
-            try:
-                process = psutil.Process(pid)
-                process_name = process.name()
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                process_name = "Unknown"
-            
-            return {
-                "window_title": window_title,
-                "process_name": process_name,
-                "process_id": pid,
-                "hwnd": hwnd
-            }
-        except Exception as e:
-            print(f"获取活动窗口信息失败: {e}")
-            return None
-    
-    def _detection_thread(self):
-        """检测线程"""
-        while not self._stop_event.is_set():
-            try:
-                focus_info = self._get_active_window_info()
-                
-                # ⭐ 截图逻辑应该放在这里，在获取到 focus_info 之后
-                if focus_info:
-                    now = time.time()
-                    # 每 5 秒截图一次
-                    # if now - self._last_screenshot_time >= self.screenshot_interval:
-                    #     self._take_screenshot(focus_info)
-                    #     self._last_screenshot_time = now
-                    
-                    with self._lock:
-                        # 检查焦点是否改变
-                        if self._last_focus_info is None or \
-                           self._last_focus_info.get("window_title") != focus_info.get("window_title") or \
-                           self._last_focus_info.get("process_name") != focus_info.get("process_name"):
-                            
-                            # 记录焦点事件
-                            now = time.time()
-
-                            # 如果之前有焦点，先计算持续时间
-                            if self._focus_start_time is not None:
-                                duration = now - self._focus_start_time
-                            else:
-                                duration = 0.0
-
-                            self._focus_events.append(FocusEvent(
-                                window_title=focus_info["window_title"],
-                                process_name=focus_info["process_name"],
-                                process_id=focus_info["process_id"],
-                                duration=duration
-                            ))
-
-                            # 更新开始时间
-                            self._focus_start_time = now
-                            self._last_focus_info = focus_info
-                            
-            except Exception as e:
-                print(f"焦点检测出错: {e}")
-            
-            # 等待一段时间
-            self._stop_event.wait(self.check_interval)
+        self.sampler = get_focus_sampler(source=source, interval=check_interval)
+        self._subscription = None
+        self._last_change = None
     
     def start(self):
-        """启动焦点检测"""
+        """启动焦点检测 (订阅焦点变化)"""
         try:
-            self._running = True
-            self._stop_event.clear()
-            self._thread = threading.Thread(target=self._detection_thread, daemon=True)
-            self._thread.start()
+            if self._subscription is None:
+                self._subscription = self.sampler.subscribe()
+            self.sampler.start()
             return True
         except Exception as e:
             print(f"启动焦点检测失败: {e}")
             return False
     
     def get_events(self) -> List[FocusEvent]:
-        """获取所有焦点事件"""
-        with self._lock:
-            events = self._focus_events.copy()
-            self._focus_events.clear()
+        """获取上次调用以来的焦点切换事件 (duration 为切换前窗口的停留时长)"""
+        if self._subscription is None:
+            return []
+        if not self.sampler.threaded:
+            self.sampler.poll()
+        events = []
+        for snap in self._subscription.drain():
+            duration = snap.since - self._last_change.since if self._last_change is not None else 0.0
+            events.append(FocusEvent(
+                window_title=snap.window_title,
+                process_name=snap.process_name,
+                process_id=snap.process_id,
+                duration=duration,
+                timestamp=snap.since
+            ))
+            self._last_change = snap
         return events
     
     def get_current_focus(self) -> Optional[Dict]:
-        """获取当前焦点窗口信息"""
-        return self._get_active_window_info()
+        """获取当前焦点窗口信息 (最近一次采样，不额外查询系统)"""
+        snap = self.sampler.latest() if self.sampler.threaded else self.sampler.poll()
+        return snap.as_dict() if snap is not None else None
     
     def stop(self):
         """停止焦点检测"""
-        self._running = False
-        self._stop_event.set()
-        if self._thread and self._thread.is_alive():
-            self._thread.join(timeout=1.0)
-        self._thread = None
-    
-    def _take_screenshot(self, focus_info):
-        """截图函数 - 修复 DPI 问题"""
-        try:
-            hwnd = focus_info["hwnd"]
-            
-            # 关键修复：设置 DPI 感知
-            try:
-                import ctypes
-                # 尝试设置进程为 DPI 感知
-                ctypes.windll.user32.SetProcessDPIAware()
-            except:
-                pass
-            
-            # 获取窗口矩形（现在应该返回正确的物理坐标）
-            rect = win32gui.GetWindowRect(hwnd)
-            
-            # 可选：使用更精确的 API
-            try:
-                from ctypes import wintypes
-                rect_struct = wintypes.RECT()
-                ctypes.windll.dwmapi.DwmGetWindowAttribute(
-                    wintypes.HWND(hwnd),
-                    wintypes.DWORD(9),  # DWMWA_EXTENDED_FRAME_BOUNDS
-                    ctypes.byref(rect_struct),
-                    ctypes.sizeof(rect_struct)
-                )
-                rect = (
-                    rect_struct.left,
-                    rect_struct.top,
-                    rect_struct.right,
-                    rect_struct.bottom
-                )
-            except:
-                pass  # 如果失败，使用 GetWindowRect 的结果
-            
-            # 截图
-            img = ImageGrab.grab(rect)
-            
-            app_name = focus_info["process_name"].replace(".exe", "")
-            ts = datetime.now().strftime("%Y%m%d%H%M%S")
-            filename = f"screenshot/{app_name}_{ts}.png"
-            
-            img.save(filename)
-            # print(f"截图保存: {filename}")
-            
-        except Exception as e:
-            pass # 暂时忽略截图错误
-            # print(f"截图失败: {e}")
+        if self._subscription is not None:
+            self.sampler.unsubscribe(self._subscription)
+            self._subscription = None
+        # 采样器是共享的：最后一个使用者退出时才停止
+        if self.sampler.subscriber_count == 0:
+            self.sampler.stop()
 
 # ============ 检测函数 ============
 
 def detect_mouse_events(mouse_detector: MouseDetector):
-    """鼠标检测函数 - 有事件则输出，无事件无反应"""
-    events = mouse_detector.get_events()
-    for event in events:
-        if event.event_type == EventType.MOUSE_MOVE:
-            if event.distance is not None:
-                print(f"[鼠标移动] 位置: ({event.x}, {event.y}) | 移动距离: {event.distance:.2f}px")
-            else:
-                print(f"[鼠标移动] 位置: ({event.x}, {event.y})")
-        elif event.event_type == EventType.MOUSE_CLICK:
-            action = "按下" if event.pressed else "释放"
-            print(f"[鼠标点击] {event.button}键{action} 位置: ({event.x}, {event.y})")
-        elif event.event_type == EventType.MOUSE_SCROLL:
-            direction = ""
-            if event.dx > 0:
-                direction += f"向右滚动{event.dx}"
-            elif event.dx < 0:
-                direction += f"向左滚动{-event.dx}"
-            if event.dy > 0:
-                direction += f"向上滚动{event.dy}"
-            elif event.dy < 0:
-                direction += f"向下滚动{-event.dy}"
-            print(f"[鼠标滚轮] {direction} 位置: ({event.x}, {event.y})")
+    """鼠标检测函数 - 最近一秒有活动则输出，无活动无反应"""
+    a = mouse_detector.get_activity(1)
+    if a["moves"] or a["clicks"] or a["scrolls"]:
+        print(f"[鼠标] 移动 {a['moves']} 次 ({a['distance']:.0f}px) | 点击 {a['clicks']} | 滚轮 {a['scrolls']}")
 
 def detect_keyboard_events(keyboard_detector: KeyboardDetector):
-    """键盘检测函数 - 有事件则输出，无事件无反应"""
-    events = keyboard_detector.get_events()
-    for event in events:
-        if event.event_type == EventType.KEY_PRESS:
-            print(f"[键盘按下] 按键: {event.key}")
-        elif event.event_type == EventType.KEY_RELEASE:
-            print(f"[键盘释放] 按键: {event.key}")
+    """键盘检测函数 - 最近一秒有按键则输出，无按键无反应"""
+    a = keyboard_detector.get_activity(1)
+    if a["keys"]:
+        print(f"[键盘] 按键 {a['keys']} 次")
 
 def detect_focus_events(focus_detector: FocusDetector):
     """焦点识别函数 - 焦点切换则输出，无事件无反应"""
+    from app.service.detector import detector_logic as AI
     events = focus_detector.get_events()
     for event in events:
         # 构建信息字符串
@@ -516,7 +279,7 @@ def main():
     # 初始化检测器
     # mouse_detector = MouseDetector()
     # keyboard_detector = KeyboardDetector()
-    focus_detector = FocusDetector(check_interval=50.0)
+    focus_detector = FocusDetector()
     
     # 启动检测器
     # print("启动鼠标检测...")
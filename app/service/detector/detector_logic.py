@@ -1,8 +1,9 @@
 import os
-import datetime
 import uuid
 import json
 import re
+import threading
+from collections import OrderedDict
 
 # 1. 强制不走代理（关键步骤！）
 os.environ["NO_PROXY"] = "localhost,127.0.0.1"
@@ -11,11 +12,127 @@ os.environ["HTTP_PROXY"] = ""
 os.environ["HTTPS_PROXY"] = ""
 
 from app.service.ai.langflow_client import LangflowClient
+from app.service.ai.llm_scheduler import PRIORITY_REALTIME, PRIORITY_INTERACTIVE
+from app.core.clock import get_clock
+
+# 批量分类的默认切分参数：单次请求最多多少条、提示词最多多少字符、失败条目最多重试几轮
+BATCH_MAX_ITEMS = 20
+BATCH_MAX_CHARS = 6000
+BATCH_MAX_RETRIES = 2
+
+BATCH_SYSTEM_PROMPT = """
+你是专业用户活动总结助手。下面给出多条窗口记录，每条以【序号】开头，包含【窗口标题】【进程名】【持续时间】。
+请逐条推断用户实际正在做的行为，规则与单条分析完全一致：
+- 摘要要尽可能细化，例如“查技术文档”、“在线购物”、“收发邮件”，禁止“浏览网页”、“可能xx”等模糊描述。
+- 不确定时优先猜测为“学习工作”；除非明确有娱乐、购物、休息等特征。
+- “活动摘要”不能直接粘贴输入内容，限20字以内。
+
+**只允许返回一个 JSON 数组，禁止其他任何词句**。数组中每个元素对应一条记录，index 必须与输入序号一致，不得遗漏：
+[
+  {"index": 0, "状态": "学习工作/娱乐/休息", "活动摘要": "具体活动简述，20字内"}
+]
+"""
+
+
+def map_status(status_raw, window_title=""):
+    """将 AI 返回的中文“状态”映射为内部状态码 (entertainment/idle/work/focus)"""
+    status_raw = status_raw or ""
+    if "娱乐" in status_raw or "休息" in status_raw:
+        return "entertainment"
+    if "Lock Screen" in (window_title or ""):  # 特殊处理锁屏
+        return "idle"
+    if "工作" in status_raw or "学习" in status_raw:
+        return "work"
+    return "focus"
+
+
+def format_window_item(item):
+    """把窗口描述 (dict 或 str) 统一格式化为单行文本"""
+    if isinstance(item, dict):
+        title = item.get("window_title", "")
+        process = item.get("process_name", "")
+        duration = item.get("duration", 0) or 0
+        return f"窗口: '{title}' | 进程: {process} | 持续: {float(duration):.2f}s"
+    return str(item)
+
+
+# 降级模式下的规则分类关键词 (不区分大小写)：
+# 英文关键词按整词匹配 ("code" 不匹配 "unicode"/"barcode")，中文关键词按子串匹配
+RULE_ENTERTAINMENT_KEYWORDS = [
+    'bilibili', '哔哩哔哩', 'youtube', '抖音', 'douyin', 'tiktok', 'netflix', '爱奇艺', '腾讯视频',
+    '优酷', 'steam', 'epicgames', 'qqmusic', 'cloudmusic', '网易云音乐', 'spotify', '游戏', '淘宝', '京东',
+]
+RULE_WORK_KEYWORDS = [
+    'code', 'trae', 'pycharm', 'idea64', 'visual studio', 'android studio', 'sublime', 'notepad++',
+    'terminal', 'powershell', 'cmd.exe', 'winword', 'excel', 'powerpnt', 'wps', 'feishu', 'lark',
+    'dingtalk', 'teams', 'zoom', 'wemeetapp', 'github', 'stack overflow', 'google docs', '文档',
+]
+
+
+def _keyword_pattern(keywords):
+    parts = []
+    for k in keywords:
+        escaped = re.escape(k.lower())
+        parts.append(rf"(?<![a-z0-9]){escaped}(?![a-z0-9])" if k.isascii() else escaped)
+    return re.compile("|".join(parts))
+
+
+_RULE_ENTERTAINMENT_RE = _keyword_pattern(RULE_ENTERTAINMENT_KEYWORDS)
+_RULE_WORK_RE = _keyword_pattern(RULE_WORK_KEYWORDS)
+
+
+def rule_based_classification(window_title, process_name):
+    """
+    不依赖模型的关键词分类，用于模型不可用时的降级：
+    命中娱乐关键词 → 娱乐；命中工作关键词 → 学习工作；都不命中 → 未知 (map_status 记为 focus，
+    与 LLM 提示词一致，不确定时不算作娱乐，但与明确的工作区分开)
+    """
+    text = f"{process_name or ''} {window_title or ''}".lower()
+    app_name = (process_name or "未知应用").replace(".exe", "")
+    if _RULE_ENTERTAINMENT_RE.search(text):
+        return {"状态": "娱乐", "活动摘要": f"使用 {app_name}"}
+    if _RULE_WORK_RE.search(text):
+        return {"状态": "学习工作", "活动摘要": f"使用 {app_name}"}
+    return {"状态": "未知", "活动摘要": f"使用 {app_name}"}
+
+
+def title_cluster_key(window_title, process_name):
+    """以标题簇为键，"(3) Inbox" 与 "(4) Inbox" 共用同一条缓存"""
+    from app.data.dao.cluster_dao import TitleClusterDAO
+    return TitleClusterDAO.key_for(window_title, process_name)
+
+
+class ClassificationCache:
+    """窗口 (默认为标题簇) -> 最近一次 LLM 分类结果的 LRU 缓存，降级模式优先使用"""
+
+    def __init__(self, max_size=1024, key_fn=title_cluster_key):
+        self.max_size = max_size
+        self.key_fn = key_fn
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, window_title, process_name):
+        key = self.key_fn(window_title, process_name)
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, window_title, process_name, value):
+        key = self.key_fn(window_title, process_name)
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
 
 class AIProcessor:
     def __init__(self):
         # 统一客户端（环境变量控制）
         self.client = LangflowClient()
+        self.cache = ClassificationCache()
         
         # 默认 System Prompt (保留作为文档，实际上现在通过 LangFlow 流程控制)
         self.system_prompt = """
@@ -38,23 +155,23 @@ class AIProcessor:
 }
 """
 
-    def process(self, text, system_prompt=None, json_mode=True):
-        # 获取当前实时时间
-        now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # 构造输入值
-        # 注意：LangFlow 的 Input 组件通常只需要一个 input_value 字符串
-        # 我们把 system_prompt 和 text 拼接起来，或者只传 text
-        # 如果 system_prompt 很重要，最好将其硬编码在 LangFlow 的 Prompt 组件中
-        # 这里我们将它们合并，以便 LangFlow 可以通过单一输入接收所有上下文
-        
-        # 优先使用传入的 system_prompt，否则使用默认的
+    def build_input(self, text, system_prompt=None):
+        """拼接系统提示词、当前时间和用户输入"""
+        now_str = get_clock().now().strftime("%Y-%m-%d %H:%M:%S")
         current_sys_prompt = system_prompt if system_prompt else self.system_prompt
-        
         if current_sys_prompt:
-            final_input = f"{current_sys_prompt}\n【当前系统时间】：{now_str}\n\nUser Input: {text}"
-        else:
-            final_input = f"【当前系统时间】：{now_str}\n\nUser Input: {text}"
+            return f"{current_sys_prompt}\n【当前系统时间】：{now_str}\n\nUser Input: {text}"
+        return f"【当前系统时间】：{now_str}\n\nUser Input: {text}"
+
+    def process_stream(self, text, system_prompt=None, priority=PRIORITY_INTERACTIVE):
+        """流式分析 (纯文本)：逐块 yield 模型输出，关闭生成器即取消请求"""
+        return self.client.stream_flow('chat', self.build_input(text, system_prompt), priority=priority)
+
+    def process(self, text, system_prompt=None, json_mode=True, priority=PRIORITY_REALTIME, model=None):
+        # 构造输入值
+        # 注意：LangFlow 的 Input 组件通常只需要一个 input_value 字符串
+        # 这里将系统提示词、当前时间和用户输入合并 (与流式/模型基准测试使用同一拼接方式)
+        final_input = self.build_input(text, system_prompt)
 
         # Request payload configuration 
         payload = { 
@@ -65,7 +182,7 @@ class AIProcessor:
         payload["session_id"] = str(uuid.uuid4()) 
         
         try:
-            result_text = self.client.call_flow('detector', final_input) or ''
+            result_text = self.client.call_flow('detector', final_input, priority=priority, model=model) or ''
             if json_mode:
                 try:
                     json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
@@ -83,13 +200,146 @@ class AIProcessor:
             if json_mode:
                  return f'{{"error": "{error_msg}"}}'
             return error_msg
-        
+
+    def classify_window(self, window_title, process_name, duration=0, model=None, priority=PRIORITY_REALTIME):
+        """
+        实时分类单个窗口，模型不可用时自动降级。
+        model 为空时使用客户端默认模型 (用户选择的模型)；预测性分析以低优先级调用。
+        Returns:
+            (ai_data, source)，source 为 "llm" / "cache" / "rules"
+        """
+        prompt = format_window_item({
+            "window_title": window_title, "process_name": process_name, "duration": duration
+        })
+        # 熔断器打开时 call_flow 会立即返回空结果，不会发起网络请求
+        text = self.process(prompt, priority=priority, model=model)
+        try:
+            data = json.loads(text)
+            if isinstance(data, dict) and "error" not in data and data.get("状态"):
+                self.cache.put(window_title, process_name, data)
+                return data, "llm"
+        except Exception:
+            pass
+
+        cached = self.cache.get(window_title, process_name)
+        if cached is not None:
+            return dict(cached), "cache"
+        return rule_based_classification(window_title, process_name), "rules"
+
+    def process_batch(self, items, system_prompt=None, max_items=BATCH_MAX_ITEMS,
+                      max_chars=BATCH_MAX_CHARS, max_retries=BATCH_MAX_RETRIES):
+        """
+        批量分析：把 N 条记录打包进一个带序号的提示词，一次 LLM 调用返回 JSON 数组。
+        - 超过 max_items / max_chars 的批次自动切分
+        - 只有解析失败（缺失或格式错误）的条目会进入下一轮重试，且重试批次减半
+
+        Args:
+            items: 窗口描述列表 (dict 含 window_title/process_name/duration，或已格式化的 str)
+            system_prompt: 批量提示词，默认使用 BATCH_SYSTEM_PROMPT；自定义提示词须要求按 index 返回 JSON 数组
+        Returns:
+            与 items 等长的列表，每个元素为解析后的 dict (不含 index)，失败则为 None
+        """
+        lines = [format_window_item(item) for item in items]
+        results = [None] * len(lines)
+        pending = list(range(len(lines)))
+        batch_size = max(1, max_items)
+
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+            if attempt > 0:
+                print(f"[AIProcessor] 批量分析第 {attempt} 次重试，剩余 {len(pending)} 条")
+            failed = []
+            for chunk in self._split_batch(pending, lines, batch_size, max_chars):
+                parsed = self._call_batch(chunk, lines, system_prompt or BATCH_SYSTEM_PROMPT)
+                for idx in chunk:
+                    if idx in parsed:
+                        results[idx] = parsed[idx]
+                    else:
+                        failed.append(idx)
+            pending = failed
+            batch_size = max(1, batch_size // 2)
+
+        return results
+
+    def _split_batch(self, indices, lines, max_items, max_chars):
+        """按条数和字符数切分批次，单条超长时独占一个批次"""
+        chunk, size = [], 0
+        for idx in indices:
+            line_len = len(lines[idx]) + 8
+            if chunk and (len(chunk) >= max_items or size + line_len > max_chars):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(idx)
+            size += line_len
+        if chunk:
+            yield chunk
+
+    def _call_batch(self, chunk, lines, system_prompt):
+        """发送一个批次，返回 {全局下标: 结果 dict}"""
+        # 批内使用 0..n-1 的局部序号，避免模型被大数字干扰
+        body = "\n".join(f"【{local}】{lines[idx]}" for local, idx in enumerate(chunk))
+        now_str = get_clock().now().strftime("%Y-%m-%d %H:%M:%S")
+        final_input = f"{system_prompt}\n【当前系统时间】：{now_str}\n\nUser Input:\n{body}"
+        try:
+            result_text = self.client.call_flow('batch', final_input) or ''
+        except Exception as e:
+            print(f"[AIProcessor] 批量请求失败: {e}")
+            return {}
+
+        parsed = {}
+        for entry in self._parse_batch_output(result_text):
+            try:
+                local = int(entry.pop("index"))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= local < len(chunk):
+                parsed[chunk[local]] = entry
+        return parsed
+
+    @staticmethod
+    def _parse_batch_output(text):
+        """从模型输出中提取带 index 的 JSON 对象列表，数组整体解析失败时逐个对象兜底"""
+        array_match = re.search(r'\[.*\]', text, re.DOTALL)
+        if array_match:
+            try:
+                data = json.loads(array_match.group(0))
+                if isinstance(data, list):
+                    return [d for d in data if isinstance(d, dict)]
+            except Exception:
+                pass
+        entries = []
+        for obj_str in re.findall(r'\{[^{}]*\}', text, re.DOTALL):
+            try:
+                obj = json.loads(obj_str)
+                if isinstance(obj, dict):
+                    entries.append(obj)
+            except Exception:
+                continue
+        return entries
+
 
 # 单例实例
 ai_processor = AIProcessor()
 
-def analyze(text, system_prompt=None, json_mode=True):
-    return ai_processor.process(text, system_prompt, json_mode)
+def analyze(text, system_prompt=None, json_mode=True, priority=PRIORITY_REALTIME):
+    return ai_processor.process(text, system_prompt, json_mode, priority)
+
+def analyze_stream(text, system_prompt=None, priority=PRIORITY_INTERACTIVE):
+    """流式分析，返回逐块文本的生成器"""
+    return ai_processor.process_stream(text, system_prompt, priority)
+
+def classify_window(window_title, process_name, duration=0, model=None, priority=PRIORITY_REALTIME):
+    """实时分类单个窗口，返回 (ai_data, source)；模型不可用时使用缓存或规则结果"""
+    return ai_processor.classify_window(window_title, process_name, duration, model, priority)
+
+def default_model():
+    """实时检测默认使用的模型 (用户在启动时选择的模型)"""
+    return ai_processor.client.model
+
+def analyze_batch(items, system_prompt=None, **kwargs):
+    """批量分析多条窗口记录，返回与 items 等长的结果列表 (失败项为 None)"""
+    return ai_processor.process_batch(items, system_prompt, **kwargs)
 
 if __name__ == "__main__":
     while True:
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+焦点采样器 (每个进程一个)
+唯一负责查询前台窗口的地方：后台线程每隔 interval 秒调用一次 WindowSource，
+- latest() 返回最近一次采样的不可变快照 (FocusSnapshot)，读取不触发任何系统调用
+- 焦点变化 (标题或进程改变) 时才产生事件，推送给所有订阅者 (subscribe() 返回的队列)
+
+回放/倍速等非真实时钟下不启动线程，由调用方每轮调用 poll() 驱动，保证结果与时钟一致。
+"""
+
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+
+from app.core import config
+from app.core.clock import get_clock, RealClock
+from app.service.detector.window_source import create_window_source
+
+
+@dataclass(frozen=True)
+class FocusSnapshot:
+    """某一时刻的前台窗口"""
+    window_title: str
+    process_name: str
+    process_id: int
+    hwnd: int
+    exe: str
+    since: float        # 进入该窗口的时间
+    sampled_at: float   # 最近一次确认仍是该窗口的时间
+    seq: int            # 焦点切换序号 (每次变化 +1)
+
+    def as_dict(self):
+        return asdict(self)
+
+
+class FocusSubscription:
+    """焦点变化事件队列 (有界，消费过慢时丢弃最旧的事件)"""
+
+    def __init__(self, maxlen=1000):
+        self._events = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+
+    def _push(self, snapshot):
+        with self._cond:
+            self._events.append(snapshot)
+            self._cond.notify_all()
+
+    def drain(self):
+        """取出全部待处理事件 (按时间顺序)"""
+        with self._cond:
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def get(self, timeout=None):
+        """等待下一个事件，超时返回 None"""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+
+class FocusSampler:
+    """
+    source:   WindowSource，默认按平台/配置创建
+    interval: 采样间隔 (秒)，默认 FLOW_FOCUS_SAMPLE_INTERVAL
+    """
+
+    def __init__(self, source=None, interval=None, clock=None):
+        self.source = source if source is not None else create_window_source()
+        self.interval = interval or config.FOCUS_SAMPLE_INTERVAL
+        self.clock = clock or get_clock()
+        # 真实时钟下使用后台线程；其它时钟由调用方调用 poll()
+        self.threaded = isinstance(self.clock, RealClock)
+        self._latest = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples = 0
+
+    def start(self):
+        """启动采样线程 (重复调用无副作用)"""
+        with self._lock:
+            if not self.threaded or self._thread is not None:
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="FocusSampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self.interval + 1)
+        self._thread = None
+        self.source.close()
+        global _sampler
+        with _sampler_lock:
+            if _sampler is self:
+                _sampler = None
+
+    def latest(self):
+        """最近一次采样的快照；尚未采样或出错时为 None"""
+        return self._latest
+
+    def subscribe(self, maxlen=1000):
+        sub = FocusSubscription(maxlen)
+        with self._lock:
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def poll(self):
+        """采样一次并发布；返回最新快照"""
+        try:
+            info = self.source.get_active_window()
+        except Exception as e:
+            print(f"[FocusSampler] 获取活动窗口信息失败: {e}")
+            info = None
+        self.samples += 1
+        if not info:
+            return self._latest
+        now = self.clock.time()
+        prev = self._latest
+        title = info.get("window_title") or ""
+        process = info.get("process_name") or ""
+        changed = prev is None or prev.window_title != title or prev.process_name != process
+        snapshot = FocusSnapshot(
+            window_title=title,
+            process_name=process,
+            process_id=info.get("process_id") or 0,
+            hwnd=info.get("hwnd") or 0,
+            exe=info.get("exe") or "",
+            since=now if changed else prev.since,
+            sampled_at=now,
+            seq=(prev.seq + 1 if prev else 1) if changed else prev.seq,
+        )
+        # 引用赋值是原子的：读者要么看到旧快照，要么看到新快照
+        self._latest = snapshot
+        if changed:
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for sub in subscribers:
+                sub._push(snapshot)
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.interval)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_focus_sampler(source=None, interval=None, clock=None):
+    """进程内共享的采样器；首次调用时按参数创建 (之后的参数被忽略)"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = FocusSampler(source=source, interval=interval, clock=clock)
+        return _sampler
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+焦点轨迹 (Focus Trace) 的录制与回放
+轨迹为 NDJSON 文本 (路径以 .gz 结尾时 gzip 压缩)，第一行是文件头，其余每行一个焦点切换事件：
+    {"type": "header", "version": 1, "started_at": 1717200000.0, "host": "..."}
+    {"t": 1717200000.0, "title": "main.py - Visual Studio Code", "process": "Code.exe", "pid": 1234}
+只记录切换 (标题或进程变化)，一天通常只有几千行，压缩后几十 KB。
+
+回放时 replay_source() 把轨迹转换为 ReplayWindowSource，时间取自注入的时钟 (见 app/core/clock.py)：
+配合 ReplayClock，监控 worker 按虚拟时间运行，1x/1000x/不等待均可，结果与倍速无关。
+"""
+
+import os
+import gzip
+import json
+import time
+import socket
+import threading
+
+from app.service.detector.window_source import ReplayWindowSource, create_window_source
+
+TRACE_VERSION = 1
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_trace(path, events, started_at=None):
+    """把事件列表 [{"t", "title", "process", "pid"}] 写为轨迹文件"""
+    events = sorted(events, key=lambda e: e["t"])
+    if started_at is None:
+        started_at = events[0]["t"] if events else time.time()
+    with _open(path, "w") as f:
+        f.write(json.dumps({"type": "header", "version": TRACE_VERSION, "started_at": started_at,
+                            "host": socket.gethostname()}, ensure_ascii=False) + "\n")
+        for e in events:
+            f.write(json.dumps(_event(e["t"], e.get("title"), e.get("process"), e.get("pid")),
+                               ensure_ascii=False) + "\n")
+
+
+def read_trace(path):
+    """返回 (header, events)；没有文件头的轨迹以第一个事件时间为起点"""
+    header, events = None, []
+    with _open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            if obj.get("type") == "header":
+                if obj.get("version", TRACE_VERSION) > TRACE_VERSION:
+                    raise ValueError(f"Unsupported trace version: {obj.get('version')}")
+                header = obj
+            else:
+                events.append(obj)
+    events.sort(key=lambda e: e["t"])
+    if header is None:
+        header = {"type": "header", "version": TRACE_VERSION,
+                  "started_at": events[0]["t"] if events else 0.0}
+    return header, events
+
+
+def replay_source(events, clock, started_at=None):
+    """
+    由轨迹事件构造回放窗口来源：当前焦点 = 时钟时间之前最后一次切换。
+    clock 为 app.core.clock.Clock；started_at 默认取第一个事件时间 (即时钟应从该时刻开始)。
+    """
+    if started_at is None:
+        started_at = events[0]["t"] if events else clock.time()
+    replay_events = [{
+        "t": e["t"] - started_at,
+        "window_title": e.get("title") or "",
+        "process_name": e.get("process") or "",
+        "process_id": e.get("pid") or 0,
+    } for e in events]
+    return ReplayWindowSource(replay_events, clock=lambda: clock.time() - started_at)
+
+
+def _event(t, title, process, pid):
+    return {"t": round(t, 3), "title": title or "", "process": process or "", "pid": pid or 0}
+
+
+class FocusTraceRecorder:
+    """
+    后台线程按 interval 秒轮询窗口来源，焦点变化时追加一行事件 (每行立即 flush，进程异常退出也不丢已有数据)。
+    """
+
+    def __init__(self, path, source=None, interval=1.0):
+        self.path = path
+        self.source = source
+        self.interval = interval
+        self.count = 0
+        self._last = None
+        self._file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.source is None:
+            self.source = create_window_source()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = _open(self.path, "w")
+        self._write({"type": "header", "version": TRACE_VERSION, "started_at": time.time(),
+                     "host": socket.gethostname(), "source": self.source.name})
+        self._thread = threading.Thread(target=self._run, name="FocusTraceRecorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 2)
+            self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.source is not None:
+            self.source.close()
+
+    def poll(self, now=None):
+        """采样一次；焦点变化时写入事件并返回该事件，否则返回 None"""
+        try:
+            info = self.source.get_active_window()
+        except Exception as e:
+            print(f"[FocusTrace] Failed to read active window: {e}")
+            return None
+        if not info:
+            return None
+        current = (info.get("window_title") or "", info.get("process_name") or "")
+        if current == self._last:
+            return None
+        self._last = current
+        event = _event(time.time() if now is None else now, current[0], current[1], info.get("process_id"))
+        self._write(event)
+        self.count += 1
+        return event
+
+    def _write(self, obj):
+        self._file.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.interval)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+空闲检测 (供 monitor_service 使用)
+根据输入活动缓冲 (InputActivity) 的最近一次输入时间和系统空闲时间判断用户是否离开：
+超过阈值无输入即进入空闲，空闲开始时间 = 最后一次输入的时刻；有新的输入即恢复。
+update() 每轮调用一次，只在状态切换时返回事件，worker 据此暂停分类、在空闲开始处截断当前记录。
+
+系统空闲时间：Windows 用 GetLastInputInfo (ctypes)，X11 用 xprintidle (已安装时)；
+只在真实时钟下使用 (回放/倍速时钟与系统时间无关)。两者都不可用时检测器不生效。
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+
+from app.core import config
+from app.core.clock import get_clock, RealClock
+
+IDLE = "idle"
+ACTIVE = "active"
+
+
+def os_idle_seconds():
+    """系统级空闲秒数 (所有输入设备)；不支持时返回 None"""
+    if sys.platform == "win32":
+        try:
+            import ctypes
+
+            class LASTINPUTINFO(ctypes.Structure):
+                _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+            info = LASTINPUTINFO()
+            info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+            if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+                return None
+            # GetTickCount 约 49.7 天回绕，按 32 位无符号相减
+            millis = (ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF
+            return millis / 1000.0
+        except Exception:
+            return None
+    if os.environ.get("DISPLAY") and shutil.which("xprintidle"):
+        try:
+            out = subprocess.run(["xprintidle"], capture_output=True, text=True, timeout=2).stdout
+            return int(out.strip()) / 1000.0
+        except (ValueError, OSError, subprocess.SubprocessError):
+            return None
+    return None
+
+
+class IdleDetector:
+    """
+    activity:    InputActivity (鼠标/键盘监听未启动时传 None)
+    os_idle_fn:  返回系统空闲秒数的函数，None 表示不使用
+    threshold:   多少秒无输入视为离开
+    """
+
+    def __init__(self, activity=None, threshold=None, os_idle_fn=os_idle_seconds, clock=None):
+        self.activity = activity
+        self.threshold = threshold or config.IDLE_THRESHOLD
+        self.clock = clock or get_clock()
+        if not isinstance(self.clock, RealClock) or (os_idle_fn is not None and os_idle_fn() is None):
+            os_idle_fn = None
+        self.os_idle_fn = os_idle_fn
+        self.idle = False
+        self.idle_since = None
+        self._started_at = self.clock.time()
+
+    @property
+    def available(self):
+        return self.activity is not None or self.os_idle_fn is not None
+
+    def idle_seconds(self, now=None):
+        """距最后一次输入的秒数 (取各来源中最近的一次)；不可用时为 0"""
+        now = self.clock.time() if now is None else now
+        candidates = []
+        if self.activity is not None:
+            last = self.activity.last_input_at
+            # 启动后还没有任何输入：从启动时刻算起
+            candidates.append(now - (last if last is not None else self._started_at))
+        if self.os_idle_fn is not None:
+            value = self.os_idle_fn()
+            if value is not None:
+                candidates.append(value)
+        return max(0.0, min(candidates)) if candidates else 0.0
+
+    def last_input_at(self, now=None):
+        """最后一次输入的时间 (epoch 秒)；不可用时为 now"""
+        now = self.clock.time() if now is None else now
+        return now - self.idle_seconds(now)
+
+    def update(self, now=None):
+        """
+        检查一次；状态切换时返回 (IDLE, 空闲开始时间) 或 (ACTIVE, 恢复时间)，否则返回 None。
+        """
+        if not self.available:
+            return None
+        now = self.clock.time() if now is None else now
+        idle_for = self.idle_seconds(now)
+        if not self.idle and idle_for >= self.threshold:
+            self.idle = True
+            self.idle_since = now - idle_for
+            return IDLE, self.idle_since
+        if self.idle and idle_for < self.threshold:
+            self.idle = False
+            self.idle_since = None
+            return ACTIVE, now
+        return None
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+鼠标/键盘输入活动的按秒聚合 (供 MouseDetector / KeyboardDetector 共用)
+监听回调只把计数累加到当前秒的桶里，不保留任何原始事件 (坐标、按键内容)：
+    moves     鼠标移动事件数
+    distance  鼠标移动距离 (像素)
+    clicks    鼠标按下次数
+    scrolls   滚轮事件数
+    keys      按键按下次数
+桶存放在固定长度的 array 环形缓冲中 (默认 3600 秒)，每个槽位记录所属的 epoch 秒，
+写入时发现槽位属于旧的一轮就清零复用，内存与运行时长无关。
+InputMinuteRecorder 定期把已结束的分钟批量写入 input_minutes 表。
+"""
+
+import threading
+from array import array
+
+from app.core import config
+from app.core.clock import get_clock
+
+FIELDS = ("moves", "distance", "clicks", "scrolls", "keys")
+
+
+class InputActivity:
+    """按秒聚合的输入活动环形缓冲 (线程安全)"""
+
+    def __init__(self, seconds=None, clock=None):
+        self.size = seconds or config.INPUT_RING_SECONDS
+        self.clock = clock or get_clock()
+        self._stamp = array('q', [-1]) * self.size      # 槽位对应的 epoch 秒，-1 表示空
+        self._moves = array('I', [0]) * self.size
+        self._distance = array('d', [0.0]) * self.size
+        self._clicks = array('I', [0]) * self.size
+        self._scrolls = array('I', [0]) * self.size
+        self._keys = array('I', [0]) * self.size
+        self._columns = (self._moves, self._distance, self._clicks, self._scrolls, self._keys)
+        self._last_input = None
+        self._lock = threading.Lock()
+
+    # ---------- 写入 (监听回调) ----------
+
+    def _slot(self, now):
+        """返回当前秒的槽位下标，必要时清零 (调用方持有锁)"""
+        sec = int(now)
+        idx = sec % self.size
+        if self._stamp[idx] != sec:
+            self._stamp[idx] = sec
+            for column in self._columns:
+                column[idx] = 0
+        self._last_input = now
+        return idx
+
+    def record_move(self, distance=0.0):
+        with self._lock:
+            idx = self._slot(self.clock.time())
+            self._moves[idx] += 1
+            self._distance[idx] += distance
+
+    def record_click(self):
+        with self._lock:
+            self._clicks[self._slot(self.clock.time())] += 1
+
+    def record_scroll(self):
+        with self._lock:
+            self._scrolls[self._slot(self.clock.time())] += 1
+
+    def record_key(self):
+        with self._lock:
+            self._keys[self._slot(self.clock.time())] += 1
+
+    # ---------- 读取 ----------
+
+    @property
+    def last_input_at(self):
+        """最近一次输入的时间 (epoch 秒)，从未有输入时为 None"""
+        with self._lock:
+            return self._last_input
+
+    def _read(self, sec):
+        """某一秒的计数元组；不在缓冲内时为 None (调用方持有锁)"""
+        idx = sec % self.size
+        if self._stamp[idx] != sec:
+            return None
+        return tuple(column[idx] for column in self._columns)
+
+    def totals(self, seconds=60, now=None):
+        """最近 seconds 秒的合计，另含 active_seconds (有任何输入的秒数)"""
+        now = int(self.clock.time() if now is None else now)
+        seconds = min(seconds, self.size)
+        result = dict.fromkeys(FIELDS, 0)
+        result["active_seconds"] = 0
+        with self._lock:
+            for sec in range(now - seconds + 1, now + 1):
+                row = self._read(sec)
+                if row is None:
+                    continue
+                for name, value in zip(FIELDS, row):
+                    result[name] += value
+                result["active_seconds"] += 1
+        result["distance"] = round(result["distance"], 1)
+        return result
+
+    def minute_series(self, minutes=None, now=None, include_current=False):
+        """
+        按分钟的强度序列 [{"minute": 分钟起始 epoch, moves, distance, clicks, scrolls, keys, active_seconds}, ...]，
+        时间升序；默认只含已结束的分钟，最多覆盖缓冲长度。
+        """
+        now = int(self.clock.time() if now is None else now)
+        end_minute = now - now % 60 + (60 if include_current else 0)
+        max_minutes = self.size // 60
+        minutes = max_minutes if minutes is None else min(minutes, max_minutes)
+        series = []
+        with self._lock:
+            for minute in range(end_minute - minutes * 60, end_minute, 60):
+                point = dict.fromkeys(FIELDS, 0)
+                point["minute"] = minute
+                point["active_seconds"] = 0
+                for sec in range(minute, minute + 60):
+                    row = self._read(sec)
+                    if row is None:
+                        continue
+                    for name, value in zip(FIELDS, row):
+                        point[name] += value
+                    point["active_seconds"] += 1
+                point["distance"] = round(point["distance"], 1)
+                series.append(point)
+        return series
+
+
+class InputMinuteRecorder:
+    """每隔 flush_interval 秒把已结束、且有输入的分钟批量写入 input_minutes"""
+
+    def __init__(self, activity, flush_interval=None):
+        self.activity = activity
+        interval = flush_interval or config.INPUT_FLUSH_INTERVAL
+        # 间隔不能超过环形缓冲长度，否则未写入的分钟会被覆盖
+        self.flush_interval = max(60, min(interval, activity.size - 120))
+        self._flushed_until = None      # 已写入的最后一分钟之后的分钟起点
+        self._last_flush = activity.clock.time()
+
+    def maybe_flush(self, now=None):
+        now = self.activity.clock.time() if now is None else now
+        if now - self._last_flush < self.flush_interval:
+            return 0
+        return self.flush(now)
+
+    def flush(self, now=None, include_current=False):
+        """写入尚未写过的分钟，返回写入条数；include_current 用于退出前写入当前这一分钟"""
+        from app.data.dao.input_dao import InputMinuteDAO
+        now = self.activity.clock.time() if now is None else now
+        self._last_flush = now
+        series = self.activity.minute_series(now=now, include_current=include_current)
+        rows = [p for p in series
+                if p["active_seconds"] and (self._flushed_until is None or p["minute"] >= self._flushed_until)]
+        if series:
+            self._flushed_until = series[-1]["minute"] + 60
+        try:
+            return InputMinuteDAO.save_batch(rows)
+        except Exception as e:
+            print(f"[InputActivity] Failed to save input minutes: {e}")
+            return 0
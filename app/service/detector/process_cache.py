@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+进程信息缓存 (供窗口来源使用)
+前台窗口的进程几乎不变，每次轮询都 psutil.Process(pid).name() 既慢又多余。
+这里按 (pid, 进程创建时间) 缓存进程名、可执行文件路径和命令行：
+- 每次查询只做一次系统调用 (取创建时间确认 pid 未被复用)，命中则直接返回
+- pid 被新进程复用时创建时间不同，旧条目自动作废
+- 定期用一次 pid 列表清理已退出的进程，另有容量上限
+后端：Windows 用 psutil，Linux 直接读 /proc (不依赖 psutil)。
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+ProcessInfo = namedtuple("ProcessInfo", ["pid", "create_time", "name", "exe", "cmdline"])
+
+
+class PsutilBackend:
+    """psutil 后端 (Windows)"""
+
+    def __init__(self):
+        import psutil
+        self._psutil = psutil
+
+    def identity(self, pid):
+        """进程创建时间；进程不存在或无权限时返回 None"""
+        try:
+            return self._psutil.Process(pid).create_time()
+        except (self._psutil.NoSuchProcess, self._psutil.AccessDenied, ValueError):
+            return None
+
+    def describe(self, pid):
+        """(name, exe, cmdline)；拿不到的字段为空"""
+        try:
+            proc = self._psutil.Process(pid)
+        except (self._psutil.NoSuchProcess, self._psutil.AccessDenied, ValueError):
+            return "Unknown", "", ()
+        with proc.oneshot():
+            name = self._safe(proc.name) or "Unknown"
+            exe = self._safe(proc.exe) or ""
+            cmdline = tuple(self._safe(proc.cmdline) or ())
+        return name, exe, cmdline
+
+    def _safe(self, fn):
+        try:
+            return fn()
+        except (self._psutil.NoSuchProcess, self._psutil.AccessDenied, self._psutil.ZombieProcess, OSError):
+            return None
+
+    def alive_pids(self):
+        return set(self._psutil.pids())
+
+
+class ProcfsBackend:
+    """/proc 后端 (Linux)"""
+
+    def identity(self, pid):
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            return None
+        # 第 22 个字段 starttime；进程名 (第 2 个字段) 可能含空格，从最后一个 ')' 之后开始数
+        fields = stat[stat.rfind(b")") + 2:].split()
+        try:
+            return int(fields[19])
+        except (IndexError, ValueError):
+            return None
+
+    def describe(self, pid):
+        exe = ""
+        try:
+            exe = os.readlink(f"/proc/{pid}/exe")
+        except OSError:
+            pass
+        name = os.path.basename(exe) if exe else ""
+        if not name:
+            try:
+                with open(f"/proc/{pid}/comm", encoding="utf-8", errors="replace") as f:
+                    name = f.read().strip()
+            except OSError:
+                pass
+        cmdline = ()
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = tuple(p.decode("utf-8", errors="replace") for p in f.read().split(b"\0") if p)
+        except OSError:
+            pass
+        return name or "Unknown", exe, cmdline
+
+    def alive_pids(self):
+        return {int(p) for p in os.listdir("/proc") if p.isdigit()}
+
+
+class ProcessInfoCache:
+    """(pid, create_time) → ProcessInfo，线程安全"""
+
+    def __init__(self, backend, max_size=256, sweep_interval=60.0):
+        self.backend = backend
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()      # pid -> ProcessInfo
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def lookup(self, pid):
+        """返回 ProcessInfo；进程已不存在时返回 None 并移除缓存"""
+        if not pid:
+            return None
+        self._maybe_sweep()
+        create_time = self.backend.identity(pid)
+        with self._lock:
+            cached = self._entries.get(pid)
+            if create_time is None:
+                if cached is not None:
+                    del self._entries[pid]
+                    self.stats["evicted"] += 1
+                return None
+            if cached is not None and cached.create_time == create_time:
+                self._entries.move_to_end(pid)
+                self.stats["hits"] += 1
+                return cached
+        name, exe, cmdline = self.backend.describe(pid)
+        info = ProcessInfo(pid, create_time, name, exe, cmdline)
+        with self._lock:
+            self.stats["misses"] += 1
+            self._entries[pid] = info
+            self._entries.move_to_end(pid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+        return info
+
+    def evict(self, pid):
+        with self._lock:
+            if self._entries.pop(pid, None) is not None:
+                self.stats["evicted"] += 1
+
+    def sweep(self):
+        """移除已退出进程的条目，返回移除数量"""
+        try:
+            alive = self.backend.alive_pids()
+        except Exception:
+            return 0
+        with self._lock:
+            gone = [pid for pid in self._entries if pid not in alive]
+            for pid in gone:
+                del self._entries[pid]
+            self.stats["evicted"] += len(gone)
+        return len(gone)
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        self.sweep()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+前台窗口截图流水线
+监控循环只调用 maybe_capture(snapshot)：按间隔把截图请求放入有界队列 (满了直接丢弃，不阻塞)，
+采集、缩放、感知哈希、编码和写盘都在后台线程完成：
+    1. 截取前台窗口 (Windows 按窗口矩形，其它平台整屏)
+    2. 缩放到最长边 max_side
+    3. dHash 与该窗口上一张截图比较，汉明距离 <= dedupe_distance 视为画面未变，不保存
+    4. 编码为 WebP (不支持时 JPEG) 写入截图目录，索引写入 screenshots 表
+    5. 总大小超过配额时按最近访问时间 (LRU) 删除
+process(image, ...) 不依赖截屏，可直接用合成图片验证编码与去重。
+Pillow 在使用处延迟导入。
+"""
+
+import os
+import sys
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from app.core import config
+from app.core.clock import get_clock
+
+# 窗口切换后等画面稳定再截图 (秒)
+SETTLE_SECONDS = 2.0
+# 记录上一张截图哈希的窗口数上限
+MAX_TRACKED_WINDOWS = 64
+
+
+def default_root():
+    from app.data.core.database import DB_DIR
+    return config.SCREENSHOT_DIR or os.path.join(DB_DIR, 'screenshots')
+
+
+def capture_window(hwnd=None):
+    """截取前台窗口；失败时返回 None"""
+    from PIL import ImageGrab
+    if sys.platform != "win32" or not hwnd:
+        return ImageGrab.grab()
+    import ctypes
+    from ctypes import wintypes
+    import win32gui
+    try:
+        # 设置 DPI 感知，否则高分屏下窗口坐标是缩放后的逻辑坐标
+        ctypes.windll.user32.SetProcessDPIAware()
+    except Exception:
+        pass
+    rect = win32gui.GetWindowRect(hwnd)
+    try:
+        # DWMWA_EXTENDED_FRAME_BOUNDS 不含窗口阴影，比 GetWindowRect 更准确
+        rect_struct = wintypes.RECT()
+        ctypes.windll.dwmapi.DwmGetWindowAttribute(
+            wintypes.HWND(hwnd), wintypes.DWORD(9),
+            ctypes.byref(rect_struct), ctypes.sizeof(rect_struct)
+        )
+        rect = (rect_struct.left, rect_struct.top, rect_struct.right, rect_struct.bottom)
+    except Exception:
+        pass
+    if rect[2] <= rect[0] or rect[3] <= rect[1]:
+        return None     # 最小化的窗口
+    return ImageGrab.grab(rect, all_screens=True)
+
+
+def downscale(image, max_side):
+    """等比缩放到最长边不超过 max_side (返回新图片，不修改原图)"""
+    from PIL import Image
+    if not max_side or max(image.size) <= max_side:
+        return image
+    image = image.copy()
+    image.thumbnail((max_side, max_side), Image.BILINEAR, reducing_gap=2.0)
+    return image
+
+
+def dhash(image, size=8):
+    """差值感知哈希 (size*size 位整数)：缩成 (size+1)*size 灰度图，比较相邻像素"""
+    from PIL import Image
+    gray = image.convert("L").resize((size + 1, size), Image.BILINEAR)
+    pixels = gray.tobytes()
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def encode(image, fmt="webp", quality=70):
+    """编码为 (bytes, 扩展名)；Pillow 不支持 WebP 时使用 JPEG"""
+    import io
+    from PIL import features
+    fmt = fmt.lower()
+    if fmt == "webp" and not features.check("webp"):
+        fmt = "jpeg"
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buf = io.BytesIO()
+    if fmt == "webp":
+        image.save(buf, "WEBP", quality=quality, method=4)
+        return buf.getvalue(), "webp"
+    image.save(buf, "JPEG", quality=quality, optimize=True)
+    return buf.getvalue(), "jpg"
+
+
+class ScreenshotPipeline:
+    """
+    root:       截图目录，默认 FLOW_SCREENSHOT_DIR 或数据库目录下的 screenshots/
+    capture_fn: hwnd -> PIL.Image (默认 capture_window)
+    其余参数默认取自 config.SCREENSHOT_*
+    """
+
+    def __init__(self, root=None, capture_fn=None, clock=None, interval=None, max_side=None,
+                 fmt=None, quality=None, dedupe_distance=None, quota_mb=None):
+        self.root = root or default_root()
+        self.capture_fn = capture_fn or capture_window
+        self.clock = clock or get_clock()
+        self.interval = interval or config.SCREENSHOT_INTERVAL
+        self.max_side = config.SCREENSHOT_MAX_SIDE if max_side is None else max_side
+        self.fmt = fmt or config.SCREENSHOT_FORMAT
+        self.quality = quality or config.SCREENSHOT_QUALITY
+        self.dedupe_distance = config.SCREENSHOT_DEDUPE_DISTANCE if dedupe_distance is None else dedupe_distance
+        self.quota_bytes = int((config.SCREENSHOT_QUOTA_MB if quota_mb is None else quota_mb) * 1024 * 1024)
+
+        self._queue = queue.Queue(maxsize=2)
+        self._thread = None
+        self._last_hash = OrderedDict()     # (进程, 标题) -> 上一张保存的截图哈希
+        self._last_submit = None
+        self._last_seq = None
+        self._total_bytes = None
+        self.stats = {"captured": 0, "saved": 0, "duplicates": 0, "dropped": 0, "evicted": 0, "errors": 0}
+
+    def start(self):
+        if self._thread is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="ScreenshotPipeline", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    # ---------- 监控循环调用 (不阻塞) ----------
+
+    def maybe_capture(self, snapshot, now=None):
+        """按间隔提交截图请求；窗口切换后等画面稳定再截一次。返回是否已提交"""
+        if snapshot is None:
+            return False
+        now = self.clock.time() if now is None else now
+        if snapshot.seq != self._last_seq:
+            due = now - snapshot.since >= SETTLE_SECONDS
+        else:
+            due = self._last_submit is None or now - self._last_submit >= self.interval
+        if not due:
+            return False
+        self._last_seq = snapshot.seq
+        self._last_submit = now
+        return self.submit(snapshot, now)
+
+    def submit(self, snapshot, captured_at=None):
+        captured_at = self.clock.time() if captured_at is None else captured_at
+        try:
+            self._queue.put_nowait((snapshot, captured_at))
+            return True
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+    # ---------- 后台线程 ----------
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            snapshot, captured_at = item
+            try:
+                image = self.capture_fn(snapshot.hwnd)
+                if image is None:
+                    continue
+                self.stats["captured"] += 1
+                self.process(image, snapshot.window_title, snapshot.process_name, captured_at)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[Screenshot] 截图失败: {e}")
+
+    def process(self, image, window_title="", process_name="", captured_at=None):
+        """缩放、去重、编码并保存一张截图；返回相对路径，画面未变化时返回 None"""
+        from app.data.dao.screenshot_dao import ScreenshotDAO
+        captured_at = self.clock.time() if captured_at is None else captured_at
+        image = downscale(image, self.max_side)
+        phash = dhash(image)
+
+        key = (process_name, window_title)
+        previous = self._last_hash.get(key)
+        if previous is not None and hamming(previous, phash) <= self.dedupe_distance:
+            self.stats["duplicates"] += 1
+            return None
+        self._last_hash[key] = phash
+        self._last_hash.move_to_end(key)
+        while len(self._last_hash) > MAX_TRACKED_WINDOWS:
+            self._last_hash.popitem(last=False)
+
+        data, ext = encode(image, self.fmt, self.quality)
+        moment = datetime.fromtimestamp(captured_at)
+        rel_path = os.path.join(moment.strftime("%Y-%m-%d"), f"{moment.strftime('%H%M%S')}_{phash:016x}.{ext}")
+        full_path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(data)
+
+        ScreenshotDAO.insert(captured_at, rel_path, len(data), image.width, image.height,
+                             f"{phash:016x}", window_title, process_name)
+        self.stats["saved"] += 1
+        if self._total_bytes is None:
+            self._total_bytes = ScreenshotDAO.total_bytes()
+        else:
+            self._total_bytes += len(data)
+        if self._total_bytes > self.quota_bytes:
+            self.enforce_quota()
+        return rel_path
+
+    def enforce_quota(self):
+        """按 LRU 删除截图直到总大小不超过配额，返回删除数量"""
+        from app.data.dao.screenshot_dao import ScreenshotDAO
+        total = ScreenshotDAO.total_bytes()
+        removed = 0
+        while total > self.quota_bytes:
+            batch = ScreenshotDAO.least_recently_used(limit=50)
+            if not batch:
+                break
+            ids = []
+            for row in batch:
+                if total <= self.quota_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, row["path"]))
+                except OSError:
+                    pass    # 文件已被手动删除
+                total -= row["bytes"]
+                ids.append(row["id"])
+            removed += ScreenshotDAO.delete(ids)
+        self._total_bytes = total
+        self.stats["evicted"] += removed
+        return removed
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+焦点窗口来源 (WindowSource)
+FocusSampler (及 FocusDetector、监控 worker) 只依赖这里的接口，平台相关的库在各后端内部延迟导入：
+- Win32WindowSource:  win32gui + win32process + psutil (Windows)
+- X11WindowSource:    EWMH _NET_ACTIVE_WINDOW + /proc (Linux，可在 Xvfb 下运行)
+- ReplayWindowSource: 按时间回放预先给定的焦点事件 (基准测试/复现)
+
+get_active_window() 统一返回:
+    {"window_title", "process_name", "process_id", "hwnd", "exe"}；没有前台窗口 (锁屏) 时返回锁屏标记，出错返回 None
+进程信息经 ProcessInfoCache 按 (pid, 创建时间) 缓存；前台窗口句柄和 pid 都没变时不再查询进程。
+"""
+
+import os
+import sys
+import time
+import bisect
+import subprocess
+
+from app.core import config
+from app.service.detector.process_cache import ProcessInfoCache, PsutilBackend, ProcfsBackend
+
+LOCK_SCREEN_INFO = {
+    "window_title": "Lock Screen",
+    "process_name": "LockApp.exe",
+    "process_id": 0,
+    "hwnd": 0,
+    "exe": ""
+}
+
+
+class WindowSource:
+    """焦点窗口来源接口"""
+
+    name = "base"
+    process_cache = None
+    _last_process = None     # (窗口句柄, pid, ProcessInfo)
+
+    def get_active_window(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def _process(self, hwnd, pid):
+        """
+        窗口所属进程信息 (ProcessInfo 或 None)。
+        与上次相同的窗口句柄 + pid 直接复用 (窗口还在，进程必然还在)，否则查缓存。
+        """
+        last = self._last_process
+        if last is not None and last[0] == hwnd and last[1] == pid:
+            return last[2]
+        info = self.process_cache.lookup(pid) if pid else None
+        self._last_process = (hwnd, pid, info)
+        return info
+
+
+class Win32WindowSource(WindowSource):
+    """Windows 前台窗口"""
+
+    name = "win32"
+
+    def __init__(self, process_cache=None):
+        import win32gui
+        import win32process
+        self._win32gui = win32gui
+        self._win32process = win32process
+        self.process_cache = process_cache or ProcessInfoCache(PsutilBackend())
+
+    def get_active_window(self):
+        hwnd = self._win32gui.GetForegroundWindow()
+        if not hwnd:
+            # 锁屏或无焦点时，返回特定标记
+            return dict(LOCK_SCREEN_INFO)
+        window_title = self._win32gui.GetWindowText(hwnd)
+        _, pid = self._win32process.GetWindowThreadProcessId(hwnd)
+        info = self._process(hwnd, pid)
+        return {
+            "window_title": window_title,
+            "process_name": info.name if info else "Unknown",
+            "process_id": pid,
+            "hwnd": hwnd,
+            "exe": info.exe if info else ""
+        }
+
+
+class X11WindowSource(WindowSource):
+    """
+    X11 / EWMH：读取根窗口的 _NET_ACTIVE_WINDOW，再读该窗口的 _NET_WM_NAME 与 _NET_WM_PID，
+    进程名从 /proc 获取。优先使用 python-xlib，未安装时退回 xprop 命令。
+    """
+
+    name = "x11"
+
+    def __init__(self, display=None, process_cache=None):
+        self.display_name = display or os.environ.get("DISPLAY")
+        if not self.display_name:
+            raise RuntimeError("DISPLAY is not set")
+        self.process_cache = process_cache or ProcessInfoCache(ProcfsBackend())
+        try:
+            from Xlib import display as xdisplay
+            self._display = xdisplay.Display(self.display_name)
+            self._root = self._display.screen().root
+            self._atoms = {name: self._display.intern_atom(name) for name in (
+                "_NET_ACTIVE_WINDOW", "_NET_WM_NAME", "_NET_WM_PID", "UTF8_STRING")}
+        except ImportError:
+            self._display = None
+
+    def get_active_window(self):
+        if self._display is not None:
+            wid, title, pid = self._query_xlib()
+        else:
+            wid, title, pid = self._query_xprop()
+        if not wid:
+            return dict(LOCK_SCREEN_INFO)
+        info = self._process(wid, pid)
+        return {
+            "window_title": title or "",
+            "process_name": info.name if info else "Unknown",
+            "process_id": pid or 0,
+            "hwnd": wid,
+            "exe": info.exe if info else ""
+        }
+
+    def _query_xlib(self):
+        from Xlib import X, error
+        prop = self._root.get_full_property(self._atoms["_NET_ACTIVE_WINDOW"], X.AnyPropertyType)
+        wid = prop.value[0] if prop and len(prop.value) else 0
+        if not wid:
+            return 0, None, None
+        try:
+            window = self._display.create_resource_object("window", wid)
+            name = window.get_full_property(self._atoms["_NET_WM_NAME"], self._atoms["UTF8_STRING"])
+            title = name.value if name else window.get_wm_name()
+            if isinstance(title, bytes):
+                title = title.decode("utf-8", errors="replace")
+            pid_prop = window.get_full_property(self._atoms["_NET_WM_PID"], X.AnyPropertyType)
+            pid = pid_prop.value[0] if pid_prop and len(pid_prop.value) else None
+        except error.XError:
+            # 窗口在查询过程中被关闭
+            return 0, None, None
+        return wid, title, pid
+
+    def _xprop(self, *args):
+        env = dict(os.environ, DISPLAY=self.display_name)
+        return subprocess.run(["xprop", *args], capture_output=True, text=True, timeout=2, env=env).stdout
+
+    def _query_xprop(self):
+        out = self._xprop("-root", "_NET_ACTIVE_WINDOW")
+        try:
+            wid = int(out.strip().split()[-1], 16)
+        except (ValueError, IndexError):
+            return 0, None, None
+        if not wid:
+            return 0, None, None
+        title, pid = None, None
+        for line in self._xprop("-id", hex(wid), "_NET_WM_NAME", "WM_NAME", "_NET_WM_PID").splitlines():
+            key, _, value = line.partition(" = ")
+            if key.startswith("_NET_WM_PID") and value.strip().isdigit():
+                pid = int(value)
+            elif key.startswith(("_NET_WM_NAME", "WM_NAME")) and title is None and value:
+                title = value.strip().strip('"')
+        return wid, title, pid
+
+    def close(self):
+        if self._display is not None:
+            self._display.close()
+            self._display = None
+
+
+class ReplayWindowSource(WindowSource):
+    """
+    回放焦点事件。events 为按时间排序的 dict 列表：
+        {"t": 相对开始的秒数, "window_title", "process_name", "process_id"}
+    clock() 返回当前回放时间 (相对开始的秒数)，默认按真实时间流逝。
+    """
+
+    name = "replay"
+
+    def __init__(self, events, clock=None):
+        self.events = sorted(events, key=lambda e: e["t"])
+        self._times = [e["t"] for e in self.events]
+        if clock is None:
+            start = time.monotonic()
+            clock = lambda: time.monotonic() - start
+        self.clock = clock
+
+    def finished(self):
+        """回放时间已超过最后一个事件"""
+        return not self.events or self.clock() > self._times[-1]
+
+    def get_active_window(self):
+        idx = bisect.bisect_right(self._times, self.clock()) - 1
+        if idx < 0:
+            return None
+        e = self.events[idx]
+        return {
+            "window_title": e.get("window_title", ""),
+            "process_name": e.get("process_name", ""),
+            "process_id": e.get("process_id", 0),
+            "hwnd": 0,
+            "exe": e.get("exe", "")
+        }
+
+
+def create_window_source(kind=None, **kwargs):
+    """
+    按配置或平台创建窗口来源。kind 为空时读取 FLOW_WINDOW_SOURCE (默认 auto)。
+    auto: Windows 使用 win32，设置了 DISPLAY 的 Linux 使用 x11。
+    """
+    kind = (kind or config.WINDOW_SOURCE or "auto").lower()
+    if kind == "auto":
+        if sys.platform == "win32":
+            kind = "win32"
+        elif os.environ.get("DISPLAY"):
+            kind = "x11"
+        else:
+            raise RuntimeError(f"No window source available on {sys.platform} (set DISPLAY or FLOW_WINDOW_SOURCE)")
+    if kind == "win32":
+        return Win32WindowSource(**kwargs)
+    if kind == "x11":
+        return X11WindowSource(**kwargs)
+    if kind == "replay":
+        return ReplayWindowSource(**kwargs)
+    raise ValueError(f"Unknown window source: {kind}")
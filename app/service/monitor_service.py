@@ -4,37 +4,102 @@ import traceback
 import json
 from queue import Empty
 
-def ai_monitor_worker(msg_queue, running_event, ai_busy_flag=None):
+def ai_monitor_worker(msg_queue, running_event, llm_scheduler=None, window_source=None, command_channel=None):
     """
     独立进程：AI 监控 Worker (新版)
     负责：
-    1. 获取当前焦点窗口信息 (FocusDetector)
+    1. 获取当前焦点窗口信息 (FocusSampler 共享快照)
     2. 调用 Ollama 进行语义分析 (AIProcessor)
     3. 解析 JSON 结果并存入数据库 (HistoryManager)
     4. 推送到 UI 队列
+
+    llm_scheduler: 主进程创建的跨进程调度器，实时分析以最高优先级排队
+    window_source: 焦点窗口来源 (WindowSource)；为空时按平台/FLOW_WINDOW_SOURCE 创建
+    command_channel: 来自 UI 的命令通道 (CommandChannel)：重置专注计时、切换模式、暂停、调整参数
     """
     print(f"【AI监控进程】启动 (PID: {multiprocessing.current_process().pid})...")
     
     try:
         # 导入新版检测器组件
         # 注意：在子进程中导入，避免主进程上下文污染
-        from app.service.detector.detector_data import FocusDetector
-        from app.service.detector.detector_logic import analyze
+        from app.service.detector.detector_data import MouseDetector, KeyboardDetector
+        from app.service.detector.focus_sampler import get_focus_sampler
+        from app.service.detector.screenshot import ScreenshotPipeline
+        from app.service.detector.input_activity import InputActivity, InputMinuteRecorder
+        from app.service.detector.idle_detector import IdleDetector, IDLE
+        from app.service.detector.detector_logic import classify_window, map_status, default_model, title_cluster_key
+        from app.service.ai.model_router import LatencySLORouter, MODE_PRIMARY
+        from app.service.speculation import SpeculativeClassifier
+        from app.core import config
+        from app.core.clock import get_clock
+        from app.service.ai.circuit_breaker import get_circuit_breaker
         from app.data import ActivityHistoryManager
+        from app.service.ai.llm_scheduler import install_scheduler, get_scheduler, PRIORITY_BATCH
+        from app.service.command_channel import (
+            CMD_RESET_FOCUS, CMD_SET_MODE, CMD_PAUSE, CMD_RESUME, CMD_RECONFIGURE
+        )
+        from app.service.analysis_policy import (
+            AdaptiveAnalysisPolicy, DECISION_ANALYZE, DECISION_REUSE, DECISION_PAUSE
+        )
+        
+        if llm_scheduler is not None:
+            install_scheduler(llm_scheduler)
+        
+        # 时钟：默认真实时间；回放时由调用方安装 ReplayClock，整条链路按虚拟时间运行
+        clock = get_clock()
         
         # 初始化组件
-        focus_detector = FocusDetector(check_interval=50.0)
-        focus_detector.start()
+        # 焦点采样：进程内只有一个采样器查询前台窗口，这里读取快照并订阅焦点切换
+        focus_sampler = get_focus_sampler(source=window_source, clock=clock).start()
+        focus_changes = focus_sampler.subscribe()
+        
+        # 截图 (默认关闭)：采集/缩放/去重/编码在后台线程，循环里只提交请求
+        screenshots = ScreenshotPipeline(clock=clock).start() if config.SCREENSHOT_ENABLED else None
+        
+        # 键鼠输入：按秒聚合 (不保留原始事件)，每分钟强度批量写入 input_minutes
+        input_activity = None
+        input_recorder = None
+        input_detectors = []
+        if config.INPUT_TRACKING:
+            input_activity = InputActivity(clock=clock)
+            input_detectors = [MouseDetector(input_activity), KeyboardDetector(input_activity)]
+            if any([d.start() for d in input_detectors]):
+                input_recorder = InputMinuteRecorder(input_activity)
+            else:
+                input_activity = None
+        
+        # 空闲检测：最近一次输入 + 系统空闲时间，离开期间暂停分类并记录为 idle
+        idle_detector = None
+        if config.IDLE_DETECTION:
+            idle_detector = IdleDetector(input_activity, clock=clock)
+            if not idle_detector.available:
+                print("[AI Worker] 无法获取输入活动，空闲检测未启用")
+                idle_detector = None
         
-        history_manager = ActivityHistoryManager()
+        history_manager = ActivityHistoryManager(clock=clock)
         
-        # 状态追踪
-        last_analysis_time = 0
-        last_analyzed_window = None # 记录上次分析过的窗口
-        ANALYSIS_INTERVAL = 60  # 加快分析频率 (原为10秒)
+        # 自适应分析节奏 (退避/去抖/延迟感知/锁屏暂停/每小时预算)
+        policy = AdaptiveAnalysisPolicy(key_fn=title_cluster_key)
+        # 实时分类的延迟 SLO：主模型 p95 超预算时改用备用模型，恢复后切回
+        model_router = LatencySLORouter(default_model())
         
-        current_focus_start = time.time()
-        last_window_title = ""
+        # 预测性预分类：模型空闲时按历史切换频率预先分类下一个可能的窗口 (最低优先级)
+        speculator = None
+        if config.SPECULATION_ENABLED:
+            speculator = SpeculativeClassifier(
+                classify_fn=lambda title, process, dur, model: classify_window(
+                    title, process, dur, model=model, priority=PRIORITY_BATCH),
+                # 实时检测已因延迟降级时不再额外占用模型
+                model_fn=lambda: model_router.primary if model_router.mode == MODE_PRIMARY else None,
+                idle_fn=lambda model: get_scheduler().is_idle(model),
+                key_fn=title_cluster_key,
+                clock=clock,
+                # 预分类的模型调用同样计入每小时调用预算
+                budget_fn=lambda: policy.try_charge(now=clock.time()),
+            ).start()
+        analyzed_since_switch = False
+        
+        current_focus_start = clock.time()
         
         # 新增：全局专注计时器 (跨窗口、跨分析周期)
         # 用于记录连续专注的时长
@@ -42,128 +107,229 @@ def ai_monitor_worker(msg_queue, running_event, ai_busy_flag=None):
         
         # 新增：当前状态计时器 (用于娱乐提醒)
         # 记录当前状态 (status) 是从什么时候开始的
-        current_status_start_time = time.time()
+        current_status_start_time = clock.time()
         last_status_type = "focus" # 默认初始状态
         entertainment_block_start = 0
         MICRO_BREAK_SEC = 90
         
+        # 用户暂停监控的截止时间 (None 表示未暂停，inf 表示直到 resume)
+        paused_until = None
+        
+        def reconfigure(settings):
+            """运行时调整参数 (任一参数不支持时都不生效)；返回实际生效的值"""
+            supported = {"llm_calls_per_hour", "analysis_base_interval"}
+            if idle_detector is not None:
+                supported.add("idle_threshold")
+            if screenshots is not None:
+                supported.add("screenshot_interval")
+            unknown = sorted(set(settings) - supported)
+            if unknown:
+                raise ValueError(f"不支持的参数: {', '.join(unknown)}")
+            applied = {}
+            for name, value in settings.items():
+                if name == "llm_calls_per_hour":
+                    policy.set_hourly_budget(value)
+                    applied[name] = policy.hourly_budget
+                elif name == "analysis_base_interval":
+                    policy.base_interval = max(1.0, float(value))
+                    applied[name] = policy.base_interval
+                elif name == "idle_threshold":
+                    idle_detector.threshold = max(1, int(value))
+                    applied[name] = idle_detector.threshold
+                elif name == "screenshot_interval":
+                    screenshots.interval = max(1.0, float(value))
+                    applied[name] = screenshots.interval
+            return applied
+        
         while running_event.is_set():
-            start_loop = time.time()
+            start_loop = clock.time()
             
-            # --- 检查来自 UI 的重置信号 ---
-            try:
-                import os
-                if os.path.exists("reset_focus.signal"):
-                    print("[AI Worker] Received reset signal from UI. Resetting focus timer.")
-                    global_focus_start_time = None
-                    # 也可以选择重置 current_status_start_time，视需求而定
-                    current_status_start_time = time.time() 
-                    os.remove("reset_focus.signal")
-            except Exception as e:
-                print(f"[AI Worker] Error checking signal file: {e}")
+            # --- 处理来自 UI 的命令 ---
+            for command in (command_channel.receive() if command_channel is not None else ()):
+                try:
+                    result = None
+                    if command.kind == CMD_RESET_FOCUS:
+                        print("[AI Worker] 收到重置命令，重置专注计时")
+                        global_focus_start_time = None
+                        current_status_start_time = clock.time()
+                    elif command.kind == CMD_SET_MODE:
+                        mode = command.args.get("mode")
+                        if mode not in ("focus", "recharge"):
+                            raise ValueError(f"未知模式: {mode}")
+                        ActivityHistoryManager.set_current_mode(mode)
+                        result = mode
+                    elif command.kind == CMD_PAUSE:
+                        seconds = command.args.get("seconds")
+                        paused_until = clock.time() + seconds if seconds else float("inf")
+                        policy.set_suspended(True)
+                        result = None if seconds is None else paused_until
+                    elif command.kind == CMD_RESUME:
+                        paused_until = None
+                        policy.set_suspended(False)
+                    elif command.kind == CMD_RECONFIGURE:
+                        result = reconfigure(command.args.get("settings") or {})
+                    print(f"[AI Worker] 命令已执行: {command.kind} {command.args}")
+                    command_channel.ack(command, result=result)
+                except Exception as e:
+                    print(f"[AI Worker] 命令执行失败: {command.kind}: {e}")
+                    command_channel.ack(command, ok=False, error=str(e))
+            if paused_until is not None and clock.time() >= paused_until:
+                print("[AI Worker] 暂停到期，恢复监控")
+                paused_until = None
+                policy.set_suspended(False)
             # ---------------------------
             
             try:
-                # 1. 获取基础焦点数据 (高频)
-                focus_info = focus_detector.get_current_focus()
+                # 1. 获取基础焦点数据 (高频)：非真实时钟下由本循环驱动采样
+                if not focus_sampler.threaded:
+                    focus_sampler.poll()
+                switched = focus_changes.drain()
+                snapshot = focus_sampler.latest()
                 
-                if not focus_info:
-                    time.sleep(1)
+                if snapshot is None:
+                    clock.sleep(1)
                     continue
                     
-                window_title = focus_info.get("window_title", "")
-                process_name = focus_info.get("process_name", "")
+                window_title = snapshot.window_title
+                process_name = snapshot.process_name
                 
-                # 简单的状态重置检测
-                if window_title != last_window_title:
-                    current_focus_start = time.time()
-                    last_window_title = window_title
+                # 焦点切换：从进入新窗口的时刻重新计时
+                if switched:
+                    current_focus_start = snapshot.since
+                    analyzed_since_switch = False
+                if speculator is not None:
+                    speculator.on_focus(window_title, process_name)
                 
-                duration = time.time() - current_focus_start
+                duration = clock.time() - current_focus_start
                 
-                # 2. AI 深度分析
-                # 触发条件: 
-                # A. 持续时间 > 5秒 (避免抖动)
-                # B. (距离上次分析超过间隔 OR 窗口标题发生了变化)
-                #    这里我们加入 "窗口变化" 作为触发条件，实现"拿到结果就触发"
-                #    同时保留最小间隔限制，防止同一窗口频繁重复分析
+                if input_recorder is not None:
+                    input_recorder.maybe_flush()
                 
-                ai_result = None
-                summary = ""
-                status = "focus" # 默认状态
+                # 空闲/恢复切换：离开时暂停分类，本段记录截断到最后一次输入的时刻
+                idle_start = None
+                if idle_detector is not None:
+                    transition = idle_detector.update()
+                    if transition is not None:
+                        print(f"[AI Worker] 输入状态切换: {transition[0]}")
+                        policy.set_idle(transition[0] == IDLE)
+                    if idle_detector.idle:
+                        idle_start = idle_detector.idle_since
                 
-                # 检查是否是新窗口（与上次分析时的窗口不同）
-                # 注意：last_window_title 是用来判断是否重置计时的，这里我们需要一个变量记录"上次分析过的窗口"
-                # 但简单起见，如果 duration > 5 且 还没分析过当前窗口，就应该触发
+                if screenshots is not None and idle_start is None and not policy.suspended \
+                        and not policy.is_lock_screen(window_title, process_name):
+                    screenshots.maybe_capture(snapshot)
                 
-                # 简化逻辑：只要满足时长，且 (时间间隔够了 OR 是个新任务)，就尝试分析
-                # 为了防止同一任务刷屏，我们引入一个标志位
+                # 2. AI 深度分析 (由自适应策略决定本轮是分析、复用、暂停还是跳过)
+                policy.observe(window_title, process_name, now=clock.time())
+                decision = policy.decide(window_title, process_name, now=clock.time())
                 
-                should_analyze = False
-                if duration > 5:
-                    # 场景1: 这是一个新窗口，且还没被分析过 (利用 last_analysis_time 粗略控制是不够的)
-                    # 我们需要记录上一次成功分析的窗口名
-                    if 'last_analyzed_window' not in locals():
-                        last_analyzed_window = None
-                        
-                    if window_title != last_analyzed_window:
-                         should_analyze = True
-                    # 场景2: 同一窗口停留很久了，定期重新分析一下 (比如每60秒)，以免漏掉状态变化
-                    elif (time.time() - last_analysis_time > ANALYSIS_INTERVAL): 
-                         should_analyze = True
-                         
-                if should_analyze:
-                    # --- 错峰执行检查 (已移除，允许并行) ---
-                    # if ai_busy_flag and ai_busy_flag.value:
-                    #     print(f"[AI Worker] AI正忙(Web端占用)，跳过本次实时分析: {window_title}")
-                    #     ... (代码已移除以支持并行)
-                        
-                    prompt = f"窗口: '{window_title}' | 进程: {process_name} | 持续: {duration:.2f}s"
-                    print(f"[AI Worker] 请求分析: {prompt}")
+                ai_data = None
+                ai_source = "llm"
+                ai_model = None   # 实际给出分析结果的模型 (复用/降级时为空)
+                status = "focus" # 默认状态
+                
+                if decision == DECISION_ANALYZE:
+                    print(f"[AI Worker] 请求分析: 窗口: '{window_title}' | 进程: {process_name} | 持续: {duration:.2f}s")
                     
+                    call_start = clock.time()
+                    routed_model = model_router.choose(now=call_start)
+                    # 切换后的第一次分析：优先取用预分类结果
+                    speculative = None
+                    if speculator is not None and not analyzed_since_switch:
+                        speculative = speculator.take(window_title, process_name, now=call_start)
+                    analyzed_since_switch = True
+                    if speculative is not None:
+                        ai_data, ai_model = speculative
+                        ai_source = "speculative"
+                        print(f"[AI Worker] 命中预分类结果: {window_title}")
+                        # 预分类调用时已计入预算，这里只更新退避状态
+                        policy.record_result(
+                            window_title, process_name,
+                            (ai_data.get("状态"), ai_data.get("活动摘要")), payload=ai_data, now=call_start,
+                            charge=False
+                        )
+                    else:
+                        try:
+                            # 调用 Ollama (不可用时自动降级为缓存/规则分类)
+                            ai_data, ai_source = classify_window(window_title, process_name, duration, model=routed_model)
+                            latency = clock.time() - call_start
+                            if ai_source == "llm":
+                                ai_model = routed_model
+                                model_router.record(routed_model, latency, now=clock.time())
+                                if speculator is not None:
+                                    speculator.note_classified(window_title, process_name, now=clock.time())
+                                policy.record_result(
+                                    window_title, process_name,
+                                    (ai_data.get("状态"), ai_data.get("活动摘要")),
+                                    payload=ai_data, latency=latency, now=clock.time()
+                                )
+                            else:
+                                if latency >= model_router.slo:
+                                    # 超时失败同样说明模型过慢 (熔断/排队放弃的调用耗时很短，不计入)
+                                    model_router.record(routed_model, latency, now=clock.time())
+                                print(f"[AI Worker] 模型不可用，使用降级结果 ({ai_source})")
+                                policy.record_degraded(window_title, process_name, payload=ai_data, now=clock.time())
+                        except Exception as e:
+                            print(f"[AI Worker] AI 分析出错: {e}")
+                            policy.record_failure(window_title, process_name, clock.time() - call_start, now=clock.time())
+                            ai_data = None
+                elif decision == DECISION_REUSE:
+                    ai_data = policy.cached_payload(window_title, process_name)
+                    print(f"[AI Worker] 复用已有分析结果: {window_title}")
+                elif decision == DECISION_PAUSE:
+                    # 锁屏/离开：不调用模型，直接记录一段 idle
+                    if idle_start is not None:
+                        ai_data = {"状态": "离开", "活动摘要": "无键鼠输入 (离开)"}
+                    elif policy.suspended:
+                        ai_data = {"状态": "离开", "活动摘要": "已暂停监控"}
+                    else:
+                        ai_data = {"状态": "离开", "活动摘要": "锁屏/离开"}
+                    ai_source = "rules"
+                    print(f"[AI Worker] 进入暂停状态: {window_title}")
+                
+                if ai_data:
                     try:
-                        # 调用 Ollama
-                        json_str = analyze(prompt)
-                        
-                        # 解析 JSON
-                        ai_data = json.loads(json_str)
-                        
                         # 提取关键字段
                         # 兼容 AI 可能返回的不同字段名 (容错)
                         status_raw = ai_data.get("状态", "focus")
                         # 简单的状态映射
-                        if "娱乐" in status_raw or "休息" in status_raw:
-                            status = "entertainment"
-                        elif "Lock Screen" in window_title: # 特殊处理锁屏
+                        if decision == DECISION_PAUSE:
                             status = "idle"
-                        elif "工作" in status_raw or "学习" in status_raw:
-                            status = "work"
                         else:
-                            status = "focus"
+                            status = map_status(status_raw, window_title)
                             
                         summary = ai_data.get("活动摘要", f"使用 {process_name}")
                         
                         # 打印调试
                         print(f"[AI Worker] 分析结果: {status} | {summary}")
                         
-                        last_analysis_time = time.time()
-                        last_analyzed_window = window_title # 标记已分析
-                        
                         # 3. 存入数据库
                         # 注意：这里我们把 raw_data 存为 JSON 字符串以便后续回溯
                         raw_data_str = json.dumps({
                             "window": window_title,
                             "process": process_name,
-                            "ai_raw": ai_data
+                            "ai_raw": ai_data,
+                            "ai_source": ai_source if decision == DECISION_ANALYZE else decision,
+                            "model": ai_model
                         }, ensure_ascii=False)
                         
-                        history_manager.update(status, summary=summary, raw_data=raw_data_str)
+                        # 空闲：idle 从最后一次输入时开始，而不是检测到空闲的这一刻。
+                        # 其它记录只写到最后一次输入为止：若之后判定为离开，这段时间属于 idle，
+                        # 不会先被计为专注；若用户在阈值内回来，这段时间计入下一段记录
+                        if decision == DECISION_PAUSE:
+                            record_at = idle_start
+                        elif idle_detector is not None:
+                            record_at = idle_detector.last_input_at()
+                        else:
+                            record_at = None
+                        history_manager.update(status, summary=summary, raw_data=raw_data_str, at=record_at)
+                        policy.mark_written(window_title, process_name)
                         
                         # 构造推送到 UI 的消息
                         # 修改持续专注时间的逻辑：
                         # 使用本地维护的 global_focus_start_time 来计算连续时长
                         
-                        current_time = time.time()
+                        current_time = clock.time()
                         if status != last_status_type:
                             current_status_start_time = current_time
                             if status == 'entertainment':
@@ -191,23 +357,30 @@ def ai_monitor_worker(msg_queue, running_event, ai_busy_flag=None):
                             global_focus_start_time = None
                             total_focus_duration = 0
                         
+                        breaker_state = get_circuit_breaker(model_router.serving).state
+                        degraded = breaker_state != "closed" or (
+                            decision == DECISION_ANALYZE and ai_source not in ("llm", "speculative"))
                         ui_msg = {
                             "status": status,
                             "duration": total_focus_duration, # 专注总时长 (给主界面)
                             "current_activity_duration": current_activity_duration, # 当前活动时长 (给提醒逻辑)
                             "current_window_duration": int(duration), # 窗口停留时长
                             "message": summary,  # UI 上显示摘要
-                            "timestamp": time.strftime("%H:%M:%S"),
-                            "debug_info": f"AI: {status_raw}"
+                            "timestamp": clock.now().strftime("%H:%M:%S"),
+                            "debug_info": f"AI: {status_raw} ({decision})",
+                            # 模型状态：degraded 表示模型不可用、结果来自缓存/规则，UI 可据此提示
+                            "ai_mode": "degraded" if degraded else "normal",
+                            "ai_breaker": breaker_state,
+                            # 实时检测当前路由 (primary/fallback) 与本条结果所用模型
+                            "ai_route": model_router.mode,
+                            "ai_model": ai_model
                         }
                         
                         if not msg_queue.full():
                             msg_queue.put(ui_msg)
                             
-                    except json.JSONDecodeError:
-                        print(f"[AI Worker] JSON 解析失败: {json_str}")
                     except Exception as e:
-                        print(f"[AI Worker] AI 分析出错: {e}")
+                        print(f"[AI Worker] 写入分析结果出错: {e}")
                 
                 # 如果没有触发 AI 分析，也可以推送一个轻量级的心跳包给 UI (可选)
                 # 或者依靠上面的 AI 分析结果来更新
@@ -218,14 +391,24 @@ def ai_monitor_worker(msg_queue, running_event, ai_busy_flag=None):
                 traceback.print_exc()
             
             # 控制循环频率
-            elapsed = time.time() - start_loop
+            elapsed = clock.time() - start_loop
             if elapsed < 1.0:
-                time.sleep(1.0 - elapsed)
+                clock.sleep(1.0 - elapsed)
                 
     except Exception as e:
         print(f"【AI监控进程】致命错误: {e}")
         traceback.print_exc()
     finally:
-        if 'focus_detector' in locals():
-            focus_detector.stop()
+        if 'focus_sampler' in locals():
+            focus_sampler.stop()
+        if locals().get('screenshots') is not None:
+            screenshots.stop()
+            print(f"[AI Worker] 截图统计: {screenshots.stats}")
+        for detector in locals().get('input_detectors', []):
+            detector.stop()
+        if locals().get('input_recorder') is not None:
+            input_recorder.flush(include_current=True)
+        if locals().get('speculator') is not None:
+            speculator.stop()
+            print(f"[AI Worker] 预分类统计: {speculator.stats()}")
         print("【AI监控进程】已退出")
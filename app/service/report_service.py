@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+报告生成服务 (Web 进程使用)
+把原先在 /api/report/generate 请求线程中同步执行的流水线搬到后台任务：
+    核心事件提取 → 每日周期统计 → AI 核心事项 (批量) → 致追梦者寄语 → 模板渲染
+- 提交后立即返回任务 id，进度和阶段性结果通过 ReportJobManager.get() 查询
+- 完成的报告按 (日期范围, 数据版本, 模型) 持久化，数据未变化时重复请求直接返回
+- 每天的核心事项单独保存 (DailySummaryDAO)，只为新的或核心事件有变化的日期调用 AI
+- 寄语连同输入和提示词指纹按日期范围保存 (EncouragementDAO)，提示词未变时不再调用 AI
+"""
+
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from app.core.single_flight import fingerprint
+from app.core.clock import get_clock
+
+FALLBACK_ENCOURAGEMENT = "AI 暂时繁忙，但数据见证了你的努力。继续加油！"
+
+CORE_ITEMS_PROMPT = """
+Role: 你是一个极其敏锐的数据分析师。
+Task: 下面给出用户多天的主要活动记录，每天一条，以【序号】开头。请为每一天输出当天核心事项的中文短句，使用中文逗号“，”分隔。
+
+Constraints:
+- 每天只输出一行短句，由 2~3 个短语组成，使用“，”分隔。
+- 覆盖最重要的 1-2 项工作；如有[娱乐]也要简述，但不要使用括号，直接以短语表达，例如“看B站”。
+- 不要使用句号、分号或项目符号；不要加多余说明。
+- 每条总字数 ≤ 30。
+- 示例："编写后端代码，调试脚本，看B站"
+
+只返回一个 JSON 数组，禁止其他任何词句，index 与输入序号一致：
+[{"index": 0, "核心事项": "编写后端代码，调试脚本，看B站"}]
+"""
+
+
+def core_items_version(model):
+    """每日核心事项的提示词 + 模型指纹，任一变化都会让已保存的核心事项失效"""
+    return hashlib.sha1((CORE_ITEMS_PROMPT + (model or "")).encode("utf-8")).hexdigest()[:16]
+
+
+def report_date_range(days, today=None):
+    """与 ReportGenerator 一致：包含今天在内的最近 days 天"""
+    end_d = today or get_clock().today()
+    return end_d - timedelta(days=days - 1), end_d
+
+
+def prepare_report_data(start_d, end_d, progress=None):
+    """逐日重新提取核心事件并计算周期统计 (报告依赖的派生表)"""
+    from app.data.dao.core_events_extractor import extract_core_events
+    from app.data.dao.stats_calculator import calculate_period_stats
+
+    total = (end_d - start_d).days + 1
+    cur = start_d
+    done = 0
+    while cur <= end_d:
+        d_str = cur.strftime('%Y-%m-%d')
+        try:
+            extract_core_events(d_str)
+            calculate_period_stats(d_str)
+        except Exception as e:
+            print(f"[ReportService] Failed to prepare {d_str}: {e}")
+        done += 1
+        if progress:
+            progress("prepare", int(40 * done / total), {"days_prepared": done})
+        cur += timedelta(days=1)
+
+
+def make_ai_callback(client, progress=None, outcome=None):
+    """
+    构造传给 ReportGenerator.generate_report 的 ai_callback。
+    progress(stage, percent, partial) 用于上报进度；
+    outcome["degraded"] 标记本次是否有 AI 环节失败 (失败的报告不会被缓存)。
+    """
+    outcome = outcome if outcome is not None else {}
+    outcome["degraded"] = True  # 回调抛异常时 ReportGenerator 会使用占位文本
+
+    def report_progress(stage, percent, partial=None):
+        if progress:
+            progress(stage, percent, partial)
+
+    def ai_callback(context):
+        from app.service.detector.detector_logic import analyze_batch
+        core_items = {}
+        degraded = False
+        report_progress("core_items", 40)
+        # 所有日期打包成一次批量调用，每天一条，按 index 对应
+        day_keys = []
+        day_texts = []
+        for log in context['daily_logs']:
+            items_info = log.get('items_context', '')
+            if not items_info and log.get('top_app'):
+                 items_info = f"[工作] {log['top_app']} - {log['title']}"
+            if not items_info or len(items_info) <= 5:
+                continue
+            day_keys.append(log['date'])
+            day_texts.append(f"{log['date']} 的主要活动记录：" + items_info.replace("\n", "；"))
+        if day_texts:
+            try:
+                for key, res in zip(day_keys, analyze_batch(day_texts, system_prompt=CORE_ITEMS_PROMPT)):
+                    if res and res.get('核心事项'):
+                        core_items[key] = res['核心事项']
+            except Exception:
+                pass
+            # 只要有一天缺失就不缓存报告，否则过去日期范围的不完整报告会一直被返回
+            if len(core_items) < len(day_keys):
+                degraded = True
+        report_progress("encouragement", 70, {"core_items": core_items})
+
+        peak_info = context['peak_day']
+        rows = context.get('period_stats_rows', [])
+        top_apps = context.get('top_apps', '')
+        total_focus_hours = context['total_focus_hours']
+        wins = context['willpower_wins']
+        peak_hours = []
+        summaries = []
+        frag_vals = []
+        switch_vals = []
+        for r in rows:
+            peak_hours.append(r.get('peak_hour') or 0)
+            s = r.get('daily_summary') or ''
+            if s: summaries.append(s)
+            if r.get('focus_fragmentation_ratio') is not None:
+                frag_vals.append(r.get('focus_fragmentation_ratio'))
+            if r.get('context_switch_freq') is not None:
+                switch_vals.append(r.get('context_switch_freq'))
+        days_len = max(1, len(rows))
+        from collections import Counter
+        best_hour = Counter(peak_hours).most_common(1)[0][0] if peak_hours else 0
+        avg_frag = round(sum(frag_vals)/len(frag_vals), 2) if frag_vals else 0
+        avg_switch = round(sum(switch_vals)/len(switch_vals), 1) if switch_vals else 0
+        summary_join = '；'.join(summaries[:3])
+        avg_per_day = round(total_focus_hours / days_len, 1)
+        frag_state = '专注占优' if avg_frag >= 1.2 else ('碎片偏多' if avg_frag < 0.8 else '相对平衡')
+        switch_state = '切换较频繁' if avg_switch > 18 else ('切换略多' if avg_switch > 12 else '切换控制良好')
+        metrics_hint = (
+            f"近{days_len}天平均每天专注约{avg_per_day}小时，克制分心{wins}次。"
+            f"黄金时段多在{best_hour}点，{frag_state}；每小时切换约{avg_switch}次，尽量控制在十几次以内。"
+        )
+        prompt_enc = f"""
+Role: 你是一位洞察力敏锐且富有同理心的成长教练。
+Task: 根据用户的行为数据，写一段“致追梦者”的复盘寄语。
+Data Context:
+- 近期活动摘要：{summary_join}
+- 主要阵地（常用软件）：{top_apps}
+- 核心指标线索：{metrics_hint}
+
+请遵循以下写作指南：
+1. **看见本质**：不要机械地罗列软件名称，而是尝试解读这些工具背后的创造性活动（例如，看到 IDE 是在“构建逻辑之塔”，看到设计软件是在“描绘想象”）。
+2. **启发式反馈**：不要生硬地给建议（如“建议你...”），而是用启发式的口吻指出数据背后的改进空间或优势（例如“如果能减少碎片化的切换，你的心流体验或许会更深沉”）。
+3. **激励结语**：用一句温暖有力的话作为结尾，肯定他的每一分努力。
+
+Style:
+- 语气要自然流畅，像朋友间的深度对话，严禁使用“建议1：”、“综上所述”等公文式措辞。
+- 篇幅控制在 150 字以内。
+"""
+        from app.data.dao.report_dao import EncouragementDAO
+        enc_inputs = {"summary_join": summary_join, "top_apps": top_apps, "metrics_hint": metrics_hint}
+        enc_hash = EncouragementDAO.prompt_hash(prompt_enc, client.model)
+        encouragement = None
+        try:
+            encouragement = EncouragementDAO.get(context['start_date'], context['end_date'], enc_hash)
+        except Exception as e:
+            print(f"[ReportService] Failed to load stored encouragement: {e}")
+        if encouragement:
+            print("[ReportService] Encouragement reused (prompt unchanged)")
+        else:
+            # 流式生成寄语：每收到一段就作为阶段性结果上报，SSE 订阅方可以实时看到
+            pieces = []
+            with closing(client.stream_flow('enc', prompt_enc)) as stream:
+                for piece in stream:
+                    pieces.append(piece)
+                    report_progress("encouragement", 75, {"encouragement_draft": "".join(pieces)})
+            encouragement = "".join(pieces).strip()
+            if encouragement:
+                try:
+                    EncouragementDAO.save(context['start_date'], context['end_date'], enc_inputs,
+                                          enc_hash, client.model, encouragement)
+                except Exception as e:
+                    print(f"[ReportService] Failed to store encouragement: {e}")
+        if not encouragement:
+            degraded = True
+            encouragement = FALLBACK_ENCOURAGEMENT
+        report_progress("render", 90, {"encouragement": encouragement})
+        outcome["degraded"] = degraded
+        return {"core_items": core_items, "encouragement": encouragement}
+
+    return ai_callback
+
+
+def generate_report(days, progress=None, use_cache=True):
+    """
+    同步生成报告，返回 (report_markdown, cached)。
+    先按数据版本查缓存，命中则跳过整条流水线。
+    """
+    from app.data.dao.report_dao import ReportCacheDAO
+    from app.data.web_report.report_generator import ReportGenerator
+    from app.service.ai.langflow_client import LangflowClient
+
+    client = LangflowClient()
+    start_d, end_d = report_date_range(days)
+    version = ReportCacheDAO.data_version(start_d, end_d)
+    if use_cache:
+        hit = ReportCacheDAO.get_report(start_d, end_d, version, client.model)
+        if hit:
+            return hit["report"], True
+
+    prepare_report_data(start_d, end_d, progress)
+    outcome = {}
+    report_md = ReportGenerator().generate_report(
+        days=days, ai_callback=make_ai_callback(client, progress, outcome),
+        summary_version=core_items_version(client.model), model=client.model
+    )
+    if not outcome.get("degraded"):
+        ReportCacheDAO.save_report(start_d, end_d, version, client.model, report_md)
+    return report_md, False
+
+
+class ReportJobCancelled(Exception):
+    """任务已被取消 (所有流式订阅方都已断开)"""
+
+
+class ReportJob:
+    """一次后台报告任务的状态"""
+
+    FINISHED = ("done", "failed", "cancelled")
+
+    def __init__(self, days):
+        self.id = uuid.uuid4().hex[:12]
+        self.days = days
+        self.status = "queued"      # queued / running / done / failed / cancelled
+        self.stage = "queued"
+        self.progress = 0
+        self.partial = {}
+        self.report = None
+        self.error = None
+        self.cached = False
+        self.created_at = time.time()
+        self.finished_at = None
+        self.keep = False           # 有轮询方 (POST 提交) 关心结果时不随 SSE 断开而取消
+        self.watchers = 0           # 当前 SSE 订阅数
+        self.version = 0            # 每次状态变化递增，供订阅方等待
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    @property
+    def finished(self):
+        return self.status in self.FINISHED
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def update(self, stage, percent, partial=None):
+        """进度回调 (在任务线程中调用)；任务被取消时抛出 ReportJobCancelled 中断流水线"""
+        if self._cancelled.is_set():
+            raise ReportJobCancelled(self.id)
+        with self._lock:
+            self.stage = stage
+            self.progress = max(self.progress, percent)
+            if partial:
+                self.partial.update(partial)
+            self.version += 1
+            self._changed.notify_all()
+
+    def finish(self, report=None, error=None, cached=False, cancelled=False):
+        with self._lock:
+            self.report = report
+            self.error = error
+            self.cached = cached
+            self.status = "cancelled" if cancelled else ("failed" if error else "done")
+            self.stage = self.status
+            self.progress = 100
+            self.finished_at = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, version, timeout=None):
+        """阻塞直到 version 变化或超时，返回最新 version"""
+        with self._lock:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def snapshot(self):
+        with self._lock:
+            data = {
+                "job_id": self.id,
+                "days": self.days,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": self.progress,
+                "partial": dict(self.partial),
+                "cached": self.cached,
+                "created_at": int(self.created_at),
+                "finished_at": int(self.finished_at) if self.finished_at else None,
+            }
+            if self.report is not None:
+                data["report"] = self.report
+            if self.error:
+                data["error"] = self.error
+            return data
+
+
+class ReportJobManager:
+    """后台报告任务队列 (默认单线程执行，避免多个报告同时争抢模型)"""
+
+    MAX_JOBS = 50   # 内存中保留的任务记录数
+
+    def __init__(self, max_workers=1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ReportJob")
+        self._jobs = OrderedDict()
+        self._inflight = {}     # 请求指纹 -> 尚未完成的任务 (single-flight)
+        self._lock = threading.Lock()
+
+    def submit(self, days, keep=True):
+        """
+        提交任务；缓存命中时任务直接以 done 状态返回。
+        相同请求 (日期范围 + 模型) 已在排队或执行时，直接返回那个任务，不重复计算。
+        keep=False 表示只由 SSE 订阅 (watch) 关心结果，所有订阅方断开后任务会被取消。
+        """
+        from app.data.dao.report_dao import ReportCacheDAO
+        from app.service.ai.langflow_client import LangflowClient
+
+        model = LangflowClient().model
+        start_d, end_d = report_date_range(days)
+        key = fingerprint("report", start_d, end_d, model)
+        with self._lock:
+            running = self._inflight.get(key)
+            if running is not None:
+                running.keep = running.keep or keep
+                return running
+
+        try:
+            version = ReportCacheDAO.data_version(start_d, end_d)
+            hit = ReportCacheDAO.get_report(start_d, end_d, version, model)
+        except Exception as e:
+            print(f"[ReportService] Cache lookup failed: {e}")
+            hit = None
+
+        with self._lock:
+            # 查缓存期间可能有相同请求抢先提交
+            running = self._inflight.get(key)
+            if running is not None:
+                running.keep = running.keep or keep
+                return running
+            job = ReportJob(days)
+            job.keep = keep
+            self._remember(job)
+            if hit:
+                job.finish(report=hit["report"], cached=True)
+                return job
+            self._inflight[key] = job
+        self._executor.submit(self._run, job, key)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @contextmanager
+    def watch(self, job):
+        """SSE 订阅期间持有；最后一个订阅方离开且没有轮询方时取消未完成的任务"""
+        with self._lock:
+            job.watchers += 1
+        try:
+            yield job
+        finally:
+            with self._lock:
+                job.watchers -= 1
+                abandon = job.watchers == 0 and not job.keep and not job.finished
+            if abandon:
+                print(f"[ReportService] All subscribers left, cancelling job {job.id}")
+                job.cancel()
+
+    def _remember(self, job):
+        """调用方需持有 _lock"""
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.MAX_JOBS:
+            self._jobs.popitem(last=False)
+
+    def _run(self, job, key):
+        with job._lock:
+            job.status = "running"
+        try:
+            # submit 中已经查过缓存，这里直接跑流水线
+            report_md, cached = generate_report(job.days, progress=job.update, use_cache=False)
+            # ReportGenerator 会吞掉 ai_callback 中的异常，取消需要在这里再确认一次
+            if job._cancelled.is_set():
+                raise ReportJobCancelled(job.id)
+            job.finish(report=report_md, cached=cached)
+        except ReportJobCancelled:
+            job.finish(cancelled=True)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            job.finish(error=str(e))
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+def get_report_jobs():
+    """当前进程的报告任务管理器"""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = ReportJobManager()
+        return _job_manager
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+预测性预分类 (供 monitor_service 使用)
+窗口切换高度重复 (IDE → 浏览器文档 → 聊天 ...)，而 worker 要等切换后停留满去抖时间才分析。
+这里用 window_sessions 中相邻会话的转移频率预测“下一个窗口”，在模型空闲时
+以最低优先级预先分类最可能的几个、且尚无新鲜结果的 (进程, 标题)；
+切换过去后 worker 的第一次分析直接取用预分类结果，不必再等模型。
+
+统计：
+    lookups  切换后第一次需要分析的次数
+    hits     其中直接命中预分类结果的次数 (hit_rate = hits / lookups)
+    calls    预分类实际调用模型的次数
+    wasted   预分类结果过期仍未被使用的次数
+    over_budget  因 worker 的每小时调用预算耗尽而放弃预分类的次数
+"""
+
+import threading
+from collections import Counter, OrderedDict, deque
+from datetime import timedelta
+
+from app.core import config
+from app.core.clock import get_clock
+
+
+def window_key(window_title, process_name):
+    return (process_name or "", window_title or "")
+
+
+class TransitionModel:
+    """窗口键 → 下一个窗口键的转移计数；键默认为 (进程, 标题)，worker 使用标题簇"""
+
+    MAX_SOURCES = 2000
+
+    def __init__(self, key_fn=None, clock=None):
+        self.key_fn = key_fn or window_key
+        self.clock = clock or get_clock()
+        self._next = OrderedDict()     # key -> Counter(next_key)
+        self._examples = {}            # key -> 最近一次见到的 (window_title, process_name)，预分类时使用
+        self._lock = threading.Lock()
+
+    def add(self, prev, cur, count=1):
+        if not prev or not cur or prev == cur:
+            return
+        with self._lock:
+            counter = self._next.get(prev)
+            if counter is None:
+                counter = self._next[prev] = Counter()
+                if len(self._next) > self.MAX_SOURCES:
+                    self._next.popitem(last=False)
+            else:
+                self._next.move_to_end(prev)
+            counter[cur] += count
+
+    def key(self, window_title, process_name):
+        """计算窗口键并记住一个可用于分类的样例标题"""
+        key = self.key_fn(window_title, process_name)
+        with self._lock:
+            self._examples[key] = (window_title, process_name)
+            if len(self._examples) > 2 * self.MAX_SOURCES:
+                self._examples.pop(next(iter(self._examples)))
+        return key
+
+    def example(self, key):
+        with self._lock:
+            return self._examples.get(key)
+
+    def load_sessions(self, sessions):
+        """按时间顺序的会话列表 (dict 含 window_title/process_name) 中相邻两条计为一次转移"""
+        prev = None
+        for s in sessions:
+            cur = self.key(s.get('window_title'), s.get('process_name'))
+            self.add(prev, cur)
+            prev = cur
+
+    def load_history(self, days=None):
+        from app.data.dao.activity_dao import WindowSessionDAO
+        days = days or config.SPECULATION_HISTORY_DAYS
+        end = self.clock.now()
+        start = end - timedelta(days=days)
+        sessions = WindowSessionDAO.get_sessions_between(
+            start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S')
+        )
+        self.load_sessions(sessions)
+        return len(sessions)
+
+    def predict(self, key, top_k=None, min_prob=None):
+        """返回 [(next_key, 概率), ...]，按概率降序"""
+        top_k = top_k or config.SPECULATION_TOP_K
+        min_prob = config.SPECULATION_MIN_PROB if min_prob is None else min_prob
+        with self._lock:
+            counter = self._next.get(key)
+            if not counter:
+                return []
+            total = sum(counter.values())
+            ranked = counter.most_common(top_k)
+        return [(k, n / total) for k, n in ranked if n / total >= min_prob]
+
+
+class SpeculativeClassifier:
+    """
+    后台线程：模型空闲时预分类可能的下一个窗口。
+    classify_fn(window_title, process_name, duration, model) -> (payload, source)，只保留 source == "llm" 的结果；
+    model_fn() 返回当前可用于预分类的模型，返回 None 表示暂不预分类 (如实时检测已降级)；
+    idle_fn(model) 判断模型是否空闲；
+    budget_fn() 在每次调用模型前申请 worker 的每小时调用预算，返回 False 时本轮不预分类；
+    clock 默认取全局时钟 (回放/加速时与 worker 使用同一时间)。
+    """
+
+    MAX_RESULTS = 64
+
+    def __init__(self, classify_fn, model_fn, idle_fn, transitions=None, ttl=None,
+                 max_per_hour=None, interval=None, key_fn=None, clock=None, budget_fn=None):
+        self.classify_fn = classify_fn
+        self.model_fn = model_fn
+        self.idle_fn = idle_fn
+        self.budget_fn = budget_fn
+        self.clock = clock or get_clock()
+        self.transitions = transitions or TransitionModel(key_fn, clock=self.clock)
+        self.ttl = ttl or config.SPECULATION_TTL
+        self.max_per_hour = config.SPECULATION_MAX_PER_HOUR if max_per_hour is None else max_per_hour
+        self.interval = interval or config.SPECULATION_INTERVAL
+
+        self._lock = threading.Lock()
+        self._current = None
+        self._results = OrderedDict()   # key -> (payload, model, created_at)
+        self._fresh = {}                # key -> 最近一次实时分析时间 (这些窗口无需预分类)
+        self._calls = deque()           # 最近一小时的预分类调用时间点
+        self._stats = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- worker 调用 ----------
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="SpeculativeClassifier", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def on_focus(self, window_title, process_name):
+        """每轮循环调用：记录窗口切换，更新转移计数"""
+        key = self.transitions.key(window_title, process_name)
+        with self._lock:
+            prev, self._current = self._current, key
+        if prev is not None and prev != key:
+            self.transitions.add(prev, key)
+
+    def take(self, window_title, process_name, now=None):
+        """切换后第一次需要分析时调用：命中则返回 (payload, model) 并移除，否则 None"""
+        now = self.clock.time() if now is None else now
+        key = self.transitions.key_fn(window_title, process_name)
+        with self._lock:
+            self._stats["lookups"] += 1
+            entry = self._results.pop(key, None)
+            if entry is not None and now - entry[2] > self.ttl:
+                self._stats["wasted"] += 1
+                entry = None
+            if entry is None:
+                hit = None
+            else:
+                self._stats["hits"] += 1
+                hit = (entry[0], entry[1])
+            if self._stats["lookups"] % 20 == 0:
+                print(f"[Speculation] {self._stats_locked()}")
+            return hit
+
+    def note_classified(self, window_title, process_name, now=None):
+        """worker 实时分析过的窗口在有效期内不再预分类"""
+        now = self.clock.time() if now is None else now
+        key = self.transitions.key_fn(window_title, process_name)
+        with self._lock:
+            self._fresh[key] = now
+            if len(self._fresh) > 4 * self.MAX_RESULTS:
+                cutoff = now - self.ttl
+                self._fresh = {k: t for k, t in self._fresh.items() if t >= cutoff}
+
+    # ---------- 后台预分类 ----------
+
+    def _run(self):
+        try:
+            loaded = self.transitions.load_history()
+            print(f"[Speculation] Loaded transitions from {loaded} sessions")
+        except Exception as e:
+            print(f"[Speculation] Failed to load history: {e}")
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                print(f"[Speculation] Error: {e}")
+
+    def step(self, now=None):
+        """预分类一个候选窗口；返回是否调用了模型"""
+        now = self.clock.time() if now is None else now
+        self._expire(now)
+        if self.max_per_hour and len(self._calls) >= self.max_per_hour:
+            return False
+        model = self.model_fn()
+        if not model or not self.idle_fn(model):
+            return False
+        key = self._next_candidate(now)
+        if key is None:
+            return False
+
+        example = self.transitions.example(key)
+        if example is None:
+            return False
+        window_title, process_name = example
+        if self.budget_fn is not None and not self.budget_fn():
+            with self._lock:
+                self._stats["over_budget"] += 1
+            return False
+        with self._lock:
+            self._calls.append(now)
+            self._stats["calls"] += 1
+        payload, source = self.classify_fn(window_title, process_name, config.ANALYSIS_DEBOUNCE, model)
+        if source != "llm":
+            with self._lock:
+                self._stats["failed"] += 1
+            return True
+        with self._lock:
+            self._results[key] = (payload, model, self.clock.time())
+            while len(self._results) > self.MAX_RESULTS:
+                self._results.popitem(last=False)
+                self._stats["wasted"] += 1
+        return True
+
+    def _next_candidate(self, now):
+        with self._lock:
+            current = self._current
+        if current is None:
+            return None
+        for key, _prob in self.transitions.predict(current):
+            with self._lock:
+                known = key in self._results or (key in self._fresh and now - self._fresh[key] < self.ttl)
+            if not known:
+                return key
+        return None
+
+    def _expire(self, now):
+        with self._lock:
+            while self._calls and now - self._calls[0] > 3600:
+                self._calls.popleft()
+            expired = [k for k, v in self._results.items() if now - v[2] > self.ttl]
+            for k in expired:
+                del self._results[k]
+            self._stats["wasted"] += len(expired)
+
+    def _stats_locked(self):
+        lookups = self._stats["lookups"]
+        return {
+            "lookups": lookups,
+            "hits": self._stats["hits"],
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            "calls": self._stats["calls"],
+            "failed": self._stats["failed"],
+            "over_budget": self._stats["over_budget"],
+            "wasted": self._stats["wasted"],
+            "pending": len(self._results),
+        }
+
+    def stats(self):
+        with self._lock:
+            return self._stats_locked()
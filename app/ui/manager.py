@@ -12,6 +12,8 @@ from app.ui.widgets.dialogs.fatigue import FatigueReminderDialog
 from app.ui.widgets.dialogs.reminder import EntertainmentReminder
 from app.data import init_db
 from app.data.services.history_service import ActivityHistoryManager
+from app.core.clock import get_clock
+from app.service.command_channel import get_command_channel
 
 class FlowStateApp(QtCore.QObject):
     def __init__(self, msg_queue=None):
@@ -71,6 +73,19 @@ class FlowStateApp(QtCore.QObject):
             pass
         except Exception as e:
             print(f"[AppManager] Queue Error: {e}")
+        self._check_command_acks()
+
+    def _check_command_acks(self):
+        """取回 AI 进程对命令的确认，失败时打印原因"""
+        channel = get_command_channel()
+        if channel is None:
+            return
+        try:
+            for ack in channel.poll_acks():
+                if not ack.ok:
+                    print(f"[AppManager] Command {ack.kind} failed: {ack.error}")
+        except Exception as e:
+            print(f"[AppManager] Command ack error: {e}")
 
     def _handle_status_update(self, result):
         # 1. 更新 UI 数据
@@ -80,7 +95,7 @@ class FlowStateApp(QtCore.QObject):
         
         self.popup.update_focus_status(result)
         
-        current_time = time.time()
+        current_time = get_clock().time()
         
         # 2. 疲劳提醒逻辑
         self._check_fatigue(duration, current_time)
@@ -606,13 +606,10 @@ class FatigueReminderDialog(QDialog):
         self.timer_display_label.setText(f"{mins:02d}:{secs:02d}")
 
     def _send_reset_signal(self):
-        """发送重置信号给后端"""
-        try:
-            with open("reset_focus.signal", "w") as f:
-                f.write("reset")
-            print("[FatigueDialog] Sent reset signal to backend.")
-        except Exception as e:
-            print(f"[FatigueDialog] Failed to send reset signal: {e}")
+        """通知 AI 进程重置专注计时"""
+        from app.service.command_channel import send_command, CMD_RESET_FOCUS
+        if send_command(CMD_RESET_FOCUS) is not None:
+            print("[FatigueDialog] Sent reset command to backend.")
 
     def accept(self):
         """重写 accept 方法，在休息完成后发送重置信号"""
@@ -4,7 +4,7 @@ import requests
 from PySide6 import QtWidgets, QtCore, QtGui
 
 class ModelSelectionDialog(QtWidgets.QDialog):
-    def __init__(self, default_model="gpt-oss:20b-cloud", parent=None):
+    def __init__(self, default_model="gpt-oss:20b-cloud", parent=None, readiness=None, startup=None):
         super().__init__(parent)
         self.setWindowTitle("选择 AI 模型")
         self.setFixedSize(400, 250)
@@ -70,7 +70,65 @@ class ModelSelectionDialog(QtWidgets.QDialog):
         
         # 初始化数据
         self.default_model = default_model
+        self.readiness = readiness
+        self.startup = startup
+        if startup is not None:
+            # 模型列表由启动编排在后台获取 (同时预热上次使用的模型)，这里只轮询结果，不阻塞界面
+            if startup.last_model:
+                self.default_model = startup.last_model
+            self.model_combo.addItem(self.default_model)
+            self.status_label.setText("正在获取本地模型，同时预热上次使用的模型...")
+            self._ready_timer = QtCore.QTimer(self)
+            self._ready_timer.setInterval(200)
+            self._ready_timer.timeout.connect(self._poll_startup)
+            self._ready_timer.start()
+        elif readiness is not None and not readiness.is_checked():
+            # Ollama 仍在后台启动：先显示默认模型，检测完成后再刷新列表
+            self.model_combo.addItem(self.default_model)
+            self.status_label.setText("Ollama 启动中，稍后刷新模型列表...")
+            self._ready_timer = QtCore.QTimer(self)
+            self._ready_timer.setInterval(300)
+            self._ready_timer.timeout.connect(self._poll_readiness)
+            self._ready_timer.start()
+        else:
+            self.load_models()
+
+    def _poll_readiness(self):
+        if not self.readiness.is_checked():
+            return
+        self._ready_timer.stop()
+        current = self.model_combo.currentText()
+        self.model_combo.clear()
         self.load_models()
+        index = self.model_combo.findText(current)
+        if index >= 0:
+            self.model_combo.setCurrentIndex(index)
+
+    def _poll_startup(self):
+        if not self.startup.models_listed():
+            return
+        self._ready_timer.stop()
+        # 上次使用的模型在后台线程中读取，可能晚于窗口创建
+        if self.startup.last_model:
+            self.default_model = self.startup.last_model
+        # 已评测的模型按离线基准排序，并在名称后附上关键指标
+        from app.service.ai.model_benchmark import describe_result
+        models = [self.default_model] + [m for m in self.startup.ranked_models() if m != self.default_model]
+        self.model_combo.clear()
+        for m in models:
+            bench = self.startup.benchmarks.get(m)
+            self.model_combo.addItem(f"{m}  ({describe_result(bench)})" if bench else m, m)
+        self.model_combo.setCurrentIndex(0)
+        if self.startup.models:
+            self.status_label.setText(f"已加载 {len(self.startup.models)} 个本地模型"
+                                      + ("，已按基准排序" if self.startup.benchmarks else ""))
+            self.status_label.setStyleSheet("color: green; font-size: 12px;")
+        else:
+            self.status_label.setText("无法连接 Ollama，仅显示默认模型")
+            self.status_label.setStyleSheet("color: orange; font-size: 12px;")
+        # 用户切换到其它模型时立即开始预热
+        self.model_combo.currentIndexChanged.connect(
+            lambda i: self.startup.prewarm(self.model_combo.itemData(i)))
 
     def load_models(self):
         """加载本地 Ollama 模型"""
@@ -106,17 +164,17 @@ class ModelSelectionDialog(QtWidgets.QDialog):
 
     def accept(self):
         """确认选择"""
-        self.selected_model = self.model_combo.currentText()
+        self.selected_model = self.model_combo.currentData() or self.model_combo.currentText()
         super().accept()
 
-def show_model_selection():
+def show_model_selection(readiness=None, startup=None):
     """显示模型选择对话框并返回选择的模型"""
     # 检查是否已经有 QApplication 实例
     app = QtWidgets.QApplication.instance()
     if not app:
         app = QtWidgets.QApplication(sys.argv)
         
-    dialog = ModelSelectionDialog()
+    dialog = ModelSelectionDialog(readiness=readiness, startup=startup)
     if dialog.exec() == QtWidgets.QDialog.Accepted:
         return dialog.selected_model
     return None
@@ -442,6 +442,9 @@ class FocusStatusCard(QtWidgets.QWidget):
             # 更新全局模式
             from app.data.services.history_service import ActivityHistoryManager
             ActivityHistoryManager.set_current_mode("focus")
+            # 同步给 AI 进程 (历史记录在那里写入)
+            from app.service.command_channel import send_command, CMD_SET_MODE
+            send_command(CMD_SET_MODE, mode="focus")
 
     def _on_recharge_mode_clicked(self):
         """处理充电模式按钮点击"""
@@ -451,6 +454,9 @@ class FocusStatusCard(QtWidgets.QWidget):
             # 更新全局模式
             from app.data.services.history_service import ActivityHistoryManager
             ActivityHistoryManager.set_current_mode("recharge")
+            # 同步给 AI 进程 (历史记录在那里写入)
+            from app.service.command_channel import send_command, CMD_SET_MODE
+            send_command(CMD_SET_MODE, mode="recharge")
             
     # 删除不再需要的 _on_mode_changed 方法 (因为它依赖 radio 按钮) 
             
@@ -608,12 +614,12 @@ class FocusStatusCard(QtWidgets.QWidget):
         # 2. 查询今日累计数据 (调用 StatsDAO)
         try:
             from app.data.dao.activity_dao import StatsDAO
-            from datetime import date
+            from app.core.clock import get_clock
             try:
                 StatsDAO.recompute_today_from_sessions()
             except Exception:
                 pass
-            summary = StatsDAO.get_daily_summary(date.today())
+            summary = StatsDAO.get_daily_summary(get_clock().today())
             total_focus_sec = int((summary or {}).get('total_focus_time') or 0)
             if current_status in ['work', 'focus']:
                 total_focus_sec += int(current_duration or 0)
@@ -695,6 +701,13 @@ class FocusStatusCard(QtWidgets.QWidget):
             else:
                  self.status_label.setText(f"⏸️ 休息中  已连续{display_minutes}分钟")
 
+        # 模型不可用时提示当前为降级模式 (结果来自缓存/规则分类)
+        if result.get("ai_mode") == "degraded":
+            self.status_label.setText(self.status_label.text() + "  (AI 离线)")
+            self.status_label.setToolTip("本地模型暂时不可用，当前状态由缓存或规则推断，恢复后自动切回 AI 分析")
+        else:
+            self.status_label.setToolTip("")
+
 
 class TimerDialog(QtWidgets.QDialog):
     """
@@ -11,6 +11,7 @@ from datetime import datetime, date
 import re
 from urllib.parse import quote_plus
 from app.ui.widgets.screen_time_panel import ScreenTimePanel
+from app.core.clock import get_clock
 # from app.data import ActivityHistoryManager
 
 class SimpleDailyReport(QtWidgets.QWidget):
@@ -59,7 +60,7 @@ class SimpleDailyReport(QtWidgets.QWidget):
 
     def _load_data(self):
         """Load data for both dashboard and timeline"""
-        self.today = date.today()
+        self.today = get_clock().today()
         
         # 1. Stats Summary（统一使用每日统计表 daily_stats）
         try:
@@ -524,7 +525,7 @@ class DailyDashboard(QtWidgets.QWidget):
         btn_back.clicked.connect(self.close_req.emit)
         
         # Date
-        lbl_date = QtWidgets.QLabel(date.today().strftime("%Y.%m.%d %A"))
+        lbl_date = QtWidgets.QLabel(get_clock().today().strftime("%Y.%m.%d %A"))
         lbl_date.setStyleSheet("color: #2E4E3F; font-size: 20px; font-weight: bold;") 
         lbl_date.setAlignment(QtCore.Qt.AlignCenter)
         
@@ -934,7 +935,7 @@ class DailyTimeline(QtWidgets.QWidget):
         btn_back.setStyleSheet("color: #50795D; font-weight: bold; border: none; font-size: 16px;")
         btn_back.clicked.connect(self.close_req.emit)
         
-        lbl_date = QtWidgets.QLabel(date.today().strftime("%Y.%m.%d %A"))
+        lbl_date = QtWidgets.QLabel(get_clock().today().strftime("%Y.%m.%d %A"))
         lbl_date.setStyleSheet("color: #2E4E3F; font-size: 20px; font-weight: bold;")
         lbl_date.setAlignment(QtCore.Qt.AlignCenter)
         
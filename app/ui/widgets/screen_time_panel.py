@@ -1,6 +1,7 @@
 import datetime
 from PySide6 import QtCore, QtGui, QtWidgets
 from app.data.core.database import get_db_connection
+from app.core.clock import get_clock
 
 def truncate_label(label, maxlen=13):
     label = str(label)
@@ -288,8 +289,7 @@ class ScreenTimePanel(QtWidgets.QWidget):
         return [], [], 0, {"学习工作":0, "娱乐":0}
 
     def _load_today_process_data(self):
-        import datetime
-        today_str = datetime.date.today().strftime("%Y-%m-%d")
+        today_str = get_clock().today().strftime("%Y-%m-%d")
         result = []
         try:
             with get_db_connection() as conn:
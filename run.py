@@ -4,8 +4,6 @@ import os
 import signal
 import multiprocessing
 import time
-import socket
-import subprocess
 
 def force_exit(signum, frame):
     # 只让主进程打印消息
@@ -23,63 +21,28 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 from app.ui.main import main
 from app.service.API.web_API import run_server
 from app.service.monitor_service import ai_monitor_worker
+from app.service.ai.llm_scheduler import LLMScheduler
+from app.service.command_channel import CommandChannel, install_command_channel
+from app.service.ai.readiness import OllamaReadiness
+from app.service.ai.startup import StartupOrchestrator
 from app.ui.widgets.dialogs.model_selection import show_model_selection
 
-def ensure_ollama_running():
-    """检查并启动 Ollama 服务"""
-    host = 'localhost'
-    port = 11434
-    
-    # 检查端口是否被占用
-    def is_port_open():
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            return s.connect_ex((host, port)) == 0
-
-    if is_port_open():
-        print("Ollama 服务检测：已在运行。")
-        return None
-
-    print("Ollama 服务检测：未运行，正在尝试启动...")
-    try:
-        # 启动 ollama serve
-        # 使用 CREATE_NO_WINDOW 隐藏控制台窗口 (仅限 Windows)
-        creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-        process = subprocess.Popen(
-            ["ollama", "serve"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            creationflags=creationflags
-        )
-        
-        # 等待服务就绪
-        print("等待 Ollama 服务启动...")
-        for _ in range(10):  # 最多等待 10 秒
-            if is_port_open():
-                print("Ollama 服务启动成功！")
-                return process
-            time.sleep(1)
-        
-        print("警告：Ollama 服务启动超时，可能需要手动启动。")
-        return process
-    except FileNotFoundError:
-        print("错误：未找到 'ollama' 命令。请确保已安装 Ollama 并添加到系统 PATH 中。")
-    except Exception as e:
-        print(f"启动 Ollama 服务失败: {e}")
-    
-    return None
-
 if __name__ == "__main__":
     # Windows 下多进程必须在 __main__ 保护下
     # 使用 freeze_support() 来支持 PyInstaller 打包
     multiprocessing.freeze_support()
+    # 倍速时钟 (FLOW_CLOCK=scaled:...) 的计时起点，子进程继承后与主进程读到同一时间
+    os.environ.setdefault('FLOW_CLOCK_ANCHOR', str(time.time()))
     
-    # 0. 自动启动 Ollama 服务
-    ollama_process = ensure_ollama_running()
+    # 0. 后台检测/自动启动 Ollama 服务 (不阻塞启动)
+    ollama_readiness = OllamaReadiness(auto_start=True).start()
+    # 与选择窗口并行：初始化数据库、获取模型列表、预热上次使用的模型
+    startup = StartupOrchestrator(ollama_readiness).start()
     
     # 新增: 模型选择
-    # 必须在 Ollama 启动后调用，以便获取模型列表
+    # 窗口会等待后台检测完成后再刷新模型列表
     print("正在启动模型选择窗口...")
-    selected_model = show_model_selection()
+    selected_model = show_model_selection(ollama_readiness, startup)
     
     if not selected_model:
         print("用户取消了模型选择，程序退出。")
@@ -88,13 +51,18 @@ if __name__ == "__main__":
     # 设置环境变量，供子进程 (AI Worker) 使用
     os.environ['OLLAMA_MODEL'] = selected_model
     print(f"已选择 AI 模型: {selected_model}")
+    # 记住选择；若与预热的模型不同，立即改为预热所选模型
+    startup.select_model(selected_model)
     
     # 1. 创建进程间通信队列 (用于 AI 进程向 UI 进程发送状态)
     msg_queue = multiprocessing.Queue()
     
-    # 新增: AI 占用标志 (True=忙碌, False=空闲)
-    # 使用 'b' (boolean) 或 'i' (int) 类型
-    ai_busy_flag = multiprocessing.Value('b', False)
+    # 跨进程 LLM 调度器 (实时检测 > 聊天 > 报告，按模型限制并发)
+    llm_scheduler = LLMScheduler()
+    
+    # UI → AI 进程的命令通道 (重置专注计时、切换模式、暂停、调整参数，带确认)
+    command_channel = CommandChannel()
+    install_command_channel(command_channel)
     
     # 2. 创建运行标志事件 (控制进程退出)
     running_event = multiprocessing.Event()
@@ -103,7 +71,8 @@ if __name__ == "__main__":
     # 3. 启动 AI 监控进程
     ai_process = multiprocessing.Process(
         target=ai_monitor_worker, 
-        args=(msg_queue, running_event, ai_busy_flag),
+        args=(msg_queue, running_event, llm_scheduler),
+        kwargs={'command_channel': command_channel},
         name="AI_Monitor_Process"
     )
     ai_process.daemon = True  # 关键：设置为守护进程
@@ -112,7 +81,7 @@ if __name__ == "__main__":
     # 4. 启动 Web 服务进程 (完全独立，不需要 Queue)
     web_process = multiprocessing.Process(
         target=run_server, 
-        kwargs={'port': 8080, 'ai_busy_flag': ai_busy_flag},
+        kwargs={'port': 8080, 'llm_scheduler': llm_scheduler},
         name="Web_Server_Process"
     )
     web_process.daemon = True  # 关键：设置为守护进程